@@ -0,0 +1,34 @@
+"""
+Admin Routes
+Owner-only views of stored request profiles (see profiler). Loaded on the
+first /api/admin request (see lazy_routes).
+"""
+
+from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import PlainTextResponse
+
+from server import db, get_current_user, User, UserRole, TimedRoute
+
+router = APIRouter(prefix="/api", route_class=TimedRoute)
+
+# Routes - Admin Profiles
+@router.get("/admin/profiles")
+async def get_profiles(current_user: User = Depends(get_current_user)):
+    if current_user.role != UserRole.OWNER:
+        raise HTTPException(status_code=403, detail="Only owner can view profiles")
+    profiles = await db.profiles.find(
+        {}, {"_id": 0, "collapsed": 0, "top_functions": 0, "expires_at": 0}
+    ).sort("created_at", -1).to_list(50)
+    return profiles
+
+@router.get("/admin/profiles/{profile_id}")
+async def get_profile(profile_id: str, format: str = "json", current_user: User = Depends(get_current_user)):
+    """Stored request profile; format=collapsed returns flamegraph-ready stacks"""
+    if current_user.role != UserRole.OWNER:
+        raise HTTPException(status_code=403, detail="Only owner can view profiles")
+    profile = await db.profiles.find_one({"id": profile_id}, {"_id": 0, "expires_at": 0})
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "collapsed":
+        return PlainTextResponse(profile['collapsed'])
+    return profile
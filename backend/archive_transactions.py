@@ -0,0 +1,119 @@
+"""
+Transaction Archiver
+Moves transactions older than the hot horizon out of `transactions` into
+monthly archive collections (or gzipped NDJSON files), keeping the hot
+collection and its indexes small enough to stay in RAM. Run it nightly from
+cron; the API keeps serving archived months through transaction_archive.
+
+Usage:
+    python archive_transactions.py run                        # older than ARCHIVE_HORIZON_DAYS (90)
+    python archive_transactions.py run --horizon-days 180 --dry-run
+    python archive_transactions.py run --to-ndjson archive/   # files instead of collections
+    python archive_transactions.py restore 2023-01            # NDJSON month back into a collection
+    python archive_transactions.py status
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from cache_bus import VERSIONS_COLLECTION
+from transaction_archive import (
+    HOT_COLLECTION, MONTHS_COLLECTION, ArchiveError, archive_transactions, restore_month
+)
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+# MongoDB connection
+mongo_url = os.environ.get('MONGO_URL', 'mongodb://127.0.0.1:27017')
+db_name = os.environ.get('DB_NAME', 'carwash_db')
+
+client = AsyncIOMotorClient(mongo_url)
+db = client[db_name]
+
+
+async def publish_months():
+    """Let running servers reload the archived month list (see cache_bus)"""
+    await db[VERSIONS_COLLECTION].update_one({"_id": MONTHS_COLLECTION}, {"$inc": {"version": 1}}, upsert=True)
+
+
+async def run(args):
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=args.horizon_days)).replace(
+        hour=0, minute=0, second=0, microsecond=0
+    )
+    print(f"📦 Archiving transactions created before {cutoff.date()} ({args.horizon_days} day horizon)")
+    print(f"📂 Database Name: {db_name}")
+    print("=" * 60)
+
+    if args.dry_run:
+        months = await db[HOT_COLLECTION].aggregate([
+            {"$match": {"created_at": {"$lt": cutoff.isoformat()}}},
+            {"$group": {"_id": {"$substrCP": ["$created_at", 0, 7]}, "count": {"$sum": 1}}},
+            {"$sort": {"_id": 1}}
+        ]).to_list(None)
+        for month in months:
+            print(f"  {month['_id']}  {month['count']:>10}")
+        print(f"\n🔍 {sum(m['count'] for m in months)} transactions would be archived (dry run)")
+        return
+
+    started = time.perf_counter()
+    directory = Path(args.to_ndjson).resolve() if args.to_ndjson else None
+    try:
+        moved = await archive_transactions(db, cutoff, args.batch_size, directory)
+    finally:
+        await publish_months()
+    for month, count in sorted(moved.items()):
+        print(f"  {month}  {count:>10}")
+    print(f"\n✅ {sum(moved.values())} transactions archived in {time.perf_counter() - started:.1f}s")
+
+
+async def restore(args):
+    count = await restore_month(db, args.month)
+    await publish_months()
+    print(f"✅ {args.month}: {count} transactions restored to a collection")
+
+
+async def status(args):
+    stats = await db.command("collStats", HOT_COLLECTION)
+    print(f"🔥 {HOT_COLLECTION}: {stats.get('count', 0)} docs, "
+          f"{stats.get('size', 0) / 1e6:.1f} MB data, {stats.get('totalIndexSize', 0) / 1e6:.1f} MB indexes")
+    months = await db[MONTHS_COLLECTION].find({}).sort("_id", 1).to_list(None)
+    print(f"🧊 {len(months)} archived month(s)")
+    for month in months:
+        where = month.get("collection") or month.get("path")
+        print(f"  {month['_id']}  {month['count']:>10}  {month['storage']:<10}  {where}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive old transactions out of the hot collection")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Archive transactions older than the horizon")
+    run_parser.add_argument("--horizon-days", type=int, default=int(os.environ.get('ARCHIVE_HORIZON_DAYS', '90')))
+    run_parser.add_argument("--to-ndjson", metavar="DIR", help="Write gzipped NDJSON files here instead of collections")
+    run_parser.add_argument("--batch-size", type=int, default=1000)
+    run_parser.add_argument("--dry-run", action="store_true", help="Only count what would be archived")
+
+    restore_parser = commands.add_parser("restore", help="Load an NDJSON month back into a collection")
+    restore_parser.add_argument("month", help="YYYY-MM")
+
+    commands.add_parser("status", help="Hot collection size and archived months")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run({"run": run, "restore": restore, "status": status}[args.command](args))
+    except ArchiveError as e:
+        print(f"❌ {e}")
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Domain Benchmarks
+Micro-benchmarks for the pure functions in domain.py, with stored baselines
+so a change that slows them down is caught before it ships.
+
+Usage:
+    python bench_domain.py run                  # print timings
+    python bench_domain.py save                 # record bench_baseline.json
+    python bench_domain.py compare              # exit 1 on a >25% regression
+    python bench_domain.py compare --threshold 0.1 --only receipt
+
+Each case is also divided by a fixed pure-Python calibration loop timed in
+the same run; compare uses that ratio, which is far less sensitive to CPU
+speed and background load than raw microseconds. Baselines are still best
+saved on the machine that compares.
+"""
+
+import argparse
+import json
+import platform
+import sys
+import timeit
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import domain
+from promotion_engine import PromotionEngine
+
+ROOT_DIR = Path(__file__).parent
+BASELINE_PATH = ROOT_DIR / 'bench_baseline.json'
+
+NOW = datetime(2026, 1, 15, 10, 0, tzinfo=timezone.utc)
+
+
+def membership_docs(count=1000):
+    """Stored memberships spread from expired to a year out"""
+    return [{
+        "id": str(i),
+        "start_date": (NOW - timedelta(days=30)).isoformat(),
+        "end_date": (NOW + timedelta(days=(i % 400) - 30)).isoformat(),
+        "created_at": (NOW - timedelta(days=30)).isoformat(),
+        "last_used": (NOW - timedelta(days=1)).isoformat() if i % 2 else None,
+        "status": "active"
+    } for i in range(count)]
+
+
+def cart_items(count=5):
+    return [{
+        "service_id": f"svc-{i}", "service_name": f"Service {i}", "price": 50000 + i * 25000, "quantity": 1 + i % 2
+    } for i in range(count)] + [{"product_id": "prod-1", "product_name": "Pengharum", "price": 25000, "quantity": 2}]
+
+
+def build_cases():
+    """
+    name -> zero-argument callable; fixtures are built once, outside the timed
+    loop. Each case does ~1000 calls so timer noise stays small.
+    """
+    docs = membership_docs()
+    end_dates = [domain.parse_datetime(d["end_date"]) for d in docs]
+    rates = {f"svc-{i}": 10.0 for i in range(5)}
+    items = cart_items()
+
+    engine = PromotionEngine()
+    engine.load([{
+        "id": "p1", "code": "HEMAT20", "promotion_type": "percentage", "value": 20, "max_discount": 50000,
+        "min_purchase": 100000, "start_date": (NOW - timedelta(days=10)).isoformat(),
+        "end_date": (NOW + timedelta(days=10)).isoformat(), "usage_limit": None, "is_active": True
+    }])
+
+    transaction = {"invoice_number": "INV-20260115-0042", "total": 275000, "payment_method": "qr"}
+    receipt_items = [{"name": f"Service {i}", "quantity": 1 + i % 2, "price": 50000 + i * 25000} for i in range(5)]
+
+    def membership_status_1k():
+        for end_date in end_dates:
+            domain.membership_status(end_date, NOW)
+            domain.days_remaining(end_date, NOW)
+
+    def refresh_membership_1k():
+        for doc in docs:
+            domain.refresh_membership(dict(doc), NOW)
+
+    def commissions_cart_1k():
+        for _ in range(1000):
+            domain.apply_commissions(items, rates)
+
+    def promotion_validate_1k():
+        for _ in range(1000):
+            engine.validate("HEMAT20", 250000, NOW)
+
+    def promotion_discount_1k():
+        for _ in range(1000):
+            domain.promotion_discount(True, 20, 250000, 50000)
+
+    def receipt_1k():
+        for _ in range(1000):
+            domain.format_receipt(transaction, receipt_items, NOW)
+
+    return {
+        "membership_status_1k": membership_status_1k,
+        "refresh_membership_1k": refresh_membership_1k,
+        "commissions_cart_1k": commissions_cart_1k,
+        "promotion_validate_1k": promotion_validate_1k,
+        "promotion_discount_1k": promotion_discount_1k,
+        "receipt_1k": receipt_1k,
+    }
+
+
+def calibration():
+    total = 0
+    for i in range(10000):
+        total += i * i % 7
+    return total
+
+
+def measure(func, repeat=7):
+    """Best-of-repeat time per case run, in microseconds"""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e6
+
+
+def run_cases(only=None):
+    """Raw microseconds and calibration-relative cost per case"""
+    results, relative = {}, {}
+    for name, func in build_cases().items():
+        if only and only not in name:
+            continue
+        # Calibrate next to each case so both see the same machine conditions
+        reference = measure(calibration)
+        results[name] = measure(func)
+        relative[name] = results[name] / reference
+        print(f"  {name:<26}{results[name]:>12.1f} µs{relative[name]:>10.3f} x calibration")
+    return results, relative
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the domain module")
+    parser.add_argument("command", choices=["run", "save", "compare"])
+    parser.add_argument("--baseline", default=str(BASELINE_PATH))
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown as a fraction (0.25 = 25%%)")
+    parser.add_argument("--only", help="Run cases whose name contains this text")
+    args = parser.parse_args()
+
+    print("⏱️  Domain benchmarks (µs per case)")
+    results, relative = run_cases(args.only)
+
+    if args.command == "save":
+        Path(args.baseline).write_text(json.dumps({
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "results_us": {name: round(value, 1) for name, value in results.items()},
+            "relative": {name: round(value, 4) for name, value in relative.items()}
+        }, indent=2) + "\n")
+        print(f"✅ Baseline saved to {args.baseline}")
+
+    elif args.command == "compare":
+        baseline = json.loads(Path(args.baseline).read_text())["relative"]
+        print(f"\n{'Case':<26}{'baseline':>12}{'current':>12}{'change':>10}")
+        regressions = []
+        for name, current in relative.items():
+            if name not in baseline:
+                print(f"{name:<26}{'-':>12}{current:>12.3f}{'new':>10}")
+                continue
+            change = current / baseline[name] - 1
+            flag = " ❌" if change > args.threshold else ""
+            print(f"{name:<26}{baseline[name]:>12.3f}{current:>12.3f}{change:>+10.1%}{flag}")
+            if change > args.threshold:
+                regressions.append(name)
+        if regressions:
+            print(f"\n❌ {len(regressions)} case(s) slower than baseline by more than {args.threshold:.0%}")
+            sys.exit(1)
+        print(f"\n✅ No regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Cache Bus Module
+Propagates cache invalidations between worker processes. Every process tails
+a MongoDB change stream on the cached collections and evicts its own caches;
+when change streams are unavailable (standalone mongod) it falls back to
+polling per-collection version stamps that writers bump.
+"""
+
+import asyncio
+import logging
+from typing import Callable, Dict, List, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import OperationFailure, PyMongoError
+
+VERSIONS_COLLECTION = "cache_versions"
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidationBus:
+    """Routes collection changes to local cache eviction handlers"""
+
+    def __init__(self, db, poll_interval: float = 5.0, use_change_streams: bool = True):
+        self.db = db
+        self.poll_interval = poll_interval
+        self.use_change_streams = use_change_streams
+        self.mode: Optional[str] = None  # "change_stream" or "polling" once started
+        self._handlers: Dict[str, List[Callable[[], None]]] = {}
+        self._versions: Dict[str, int] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def register(self, collection: str, handler: Callable[[], None]):
+        """Call handler whenever documents in collection change"""
+        self._handlers.setdefault(collection, []).append(handler)
+
+    @property
+    def collections(self) -> List[str]:
+        return list(self._handlers)
+
+    def evict(self, collection: str):
+        for handler in self._handlers.get(collection, []):
+            try:
+                handler()
+            except Exception as e:
+                logger.error(f"Cache eviction for {collection} failed: {e}")
+
+    def evict_all(self):
+        for collection in self._handlers:
+            self.evict(collection)
+
+    async def publish(self, collection: str):
+        """
+        Announce a write to collection
+
+        Evicts local caches immediately; other workers learn about it from the
+        change stream, or from the bumped version stamp when polling.
+        """
+        self.evict(collection)
+        if self.mode == "polling" and self.db is not None:
+            result = await self.db[VERSIONS_COLLECTION].find_one_and_update(
+                {"_id": collection},
+                {"$inc": {"version": 1}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            if result:
+                self._versions[collection] = result['version']
+
+    async def start(self):
+        if self.db is None or self._task is not None:
+            return
+        if self.use_change_streams and await self._change_streams_supported():
+            self.mode = "change_stream"
+            self._task = asyncio.get_running_loop().create_task(self._watch())
+        else:
+            self.mode = "polling"
+            await self._poll_once(initial=True)
+            self._task = asyncio.get_running_loop().create_task(self._poll())
+        logger.info(f"Cache invalidation bus started ({self.mode})")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _change_streams_supported(self) -> bool:
+        try:
+            async with self.db.watch(self._pipeline(), max_await_time_ms=1):
+                return True
+        except OperationFailure as e:
+            logger.info(f"Change streams unavailable, polling version stamps instead: {e}")
+            return False
+        except PyMongoError as e:
+            logger.warning(f"Could not open change stream: {e}")
+            return False
+
+    def _pipeline(self) -> list:
+        return [{"$match": {"ns.coll": {"$in": self.collections}}}]
+
+    async def _watch(self):
+        resume_token = None
+        while True:
+            try:
+                async with self.db.watch(self._pipeline(), resume_after=resume_token) as stream:
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        self.evict(change['ns']['coll'])
+            except asyncio.CancelledError:
+                raise
+            except PyMongoError as e:
+                # Events may have been missed while disconnected
+                logger.warning(f"Change stream interrupted, evicting all caches: {e}")
+                self.evict_all()
+                resume_token = None
+                await asyncio.sleep(self.poll_interval)
+
+    async def _poll(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self._poll_once()
+            except asyncio.CancelledError:
+                raise
+            except PyMongoError as e:
+                logger.warning(f"Cache version poll failed: {e}")
+
+    async def _poll_once(self, initial: bool = False):
+        stamps = await self.db[VERSIONS_COLLECTION].find(
+            {"_id": {"$in": self.collections}}
+        ).to_list(len(self.collections))
+        for stamp in stamps:
+            collection = stamp['_id']
+            if not initial and self._versions.get(collection) != stamp['version']:
+                self.evict(collection)
+            self._versions[collection] = stamp['version']
@@ -0,0 +1,60 @@
+"""
+Cache Helper Module
+Small in-process caches for expensive read endpoints.
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class TTLCache:
+    """
+    Per-key cache with a short time-to-live and single-flight loading
+
+    Concurrent requests for a key that is not cached share one computation
+    instead of each running it. Invalidating while a computation is in flight
+    detaches it: its (possibly stale) result goes only to the callers already
+    waiting for it, is not cached, and later callers start a fresh load.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._entries: Dict[Hashable, tuple] = {}
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._generation = 0
+
+    async def get_or_compute(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(key, compute))
+            self._inflight[key] = task
+        # Shield so one caller disconnecting does not cancel the shared load
+        return await asyncio.shield(task)
+
+    async def _load(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        generation = self._generation
+        task = asyncio.current_task()
+        try:
+            value = await compute()
+            if generation == self._generation:
+                self._entries[key] = (time.monotonic() + self.ttl, value)
+            return value
+        finally:
+            # Unless invalidate() detached it and a newer load took its place
+            if self._inflight.get(key) is task:
+                del self._inflight[key]
+
+    def invalidate(self, key: Hashable = None):
+        """Drop one key, or everything when no key is given"""
+        self._generation += 1
+        if key is None:
+            self._entries.clear()
+            self._inflight.clear()
+        else:
+            self._entries.pop(key, None)
+            self._inflight.pop(key, None)
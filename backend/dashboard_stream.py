@@ -0,0 +1,254 @@
+"""
+Dashboard Stream Module
+Keeps per-outlet dashboard state in memory and pushes updates to connected
+dashboards over Server-Sent Events, so open dashboards do not poll the
+database.
+
+The state lives in each worker process. Writes made in this worker are
+applied straight away; those made in other workers arrive through the cache
+bus (see server) and are picked up by a coalesced reload.
+"""
+
+import asyncio
+import copy
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Set
+
+RECENT_LIMIT = 5
+REFRESH_DELAY = 1.0  # seconds; coalesces bursts of stock/membership changes
+QUEUE_SIZE = 100
+
+# Outlet key used by owners/managers without an assigned outlet (all outlets)
+ALL_OUTLETS = None
+
+
+def today_key() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+
+def summarize_transaction(txn: Dict) -> Dict:
+    """Small view of a transaction for the recent transactions list"""
+    created_at = txn.get('created_at')
+    return {
+        "id": txn.get('id'),
+        "invoice_number": txn.get('invoice_number'),
+        "customer_name": txn.get('customer_name'),
+        "kasir_name": txn.get('kasir_name'),
+        "total": txn.get('total', 0),
+        "items_count": len(txn.get('items', [])),
+        "created_at": created_at.isoformat() if isinstance(created_at, datetime) else created_at
+    }
+
+
+def format_event(event: str, data: Dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+class DashboardState:
+    """Today's dashboard numbers for one outlet, plus its subscribers"""
+
+    def __init__(self, outlet_id: Optional[str], stats: Dict, recent: list):
+        self.outlet_id = outlet_id
+        self.day = today_key()
+        self.stats = stats
+        self.recent = recent
+        self.subscribers = set()
+
+    def snapshot(self) -> Dict:
+        return {"stats": self.stats, "recent_transactions": self.recent}
+
+    def publish(self, delta: Dict):
+        message = format_event("delta", delta)
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Slow client: deltas carry absolute values, so skipping one is safe
+                pass
+
+
+class DashboardHub:
+    """
+    Registry of live dashboard states
+
+    State for an outlet is loaded once when its first dashboard connects and
+    then updated incrementally; it is dropped when the last one disconnects.
+    """
+
+    def __init__(self):
+        self._states: Dict[Optional[str], DashboardState] = {}
+        self._loading: Dict[Optional[str], asyncio.Lock] = {}
+        self._pending: Dict[str, asyncio.Task] = {}
+        self._dirty: Dict[str, Set[Optional[str]]] = {}
+
+    @property
+    def active(self) -> bool:
+        return bool(self._states)
+
+    @property
+    def outlets(self) -> list:
+        """Outlet keys with an open dashboard"""
+        return list(self._states)
+
+    async def subscribe(self, outlet_id: Optional[str], loader: Callable[[Optional[str]], Awaitable[Dict]]):
+        """
+        Register a subscriber for an outlet
+
+        Returns:
+            (queue receiving formatted SSE messages, current snapshot)
+        """
+        lock = self._loading.setdefault(outlet_id, asyncio.Lock())
+        async with lock:
+            state = self._states.get(outlet_id)
+            if state is None or state.day != today_key():
+                # Copy: the loader may hand out cached data we must not mutate
+                loaded = copy.deepcopy(await loader(outlet_id))
+                subscribers = state.subscribers if state else set()
+                state = DashboardState(outlet_id, loaded['stats'], loaded['recent_transactions'])
+                state.subscribers = subscribers
+                self._states[outlet_id] = state
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        state.subscribers.add(queue)
+        return queue, state.snapshot()
+
+    def unsubscribe(self, outlet_id: Optional[str], queue: asyncio.Queue):
+        state = self._states.get(outlet_id)
+        if state is None:
+            return
+        state.subscribers.discard(queue)
+        if not state.subscribers:
+            del self._states[outlet_id]
+
+    def record_transaction(self, outlet_id: Optional[str], txn: Dict):
+        """Apply a committed transaction to its outlet and the all-outlets view"""
+        keys = {outlet_id, ALL_OUTLETS}
+        for key in keys:
+            state = self._states.get(key)
+            if state is None:
+                continue
+            if state.day != today_key():
+                # New day: start today's counters from zero
+                state.day = today_key()
+                state.stats.update(today_revenue=0, today_transactions=0, kasir_performance={})
+                state.recent = []
+
+            stats = state.stats
+            total = txn.get('total', 0)
+            stats['today_revenue'] += total
+            stats['today_transactions'] += 1
+
+            kasir_name = txn.get('kasir_name', 'Unknown')
+            performance = stats['kasir_performance'].setdefault(kasir_name, {'count': 0, 'revenue': 0})
+            performance['count'] += 1
+            performance['revenue'] += total
+
+            state.recent = [summarize_transaction(txn)] + state.recent[:RECENT_LIMIT - 1]
+
+            state.publish({
+                "stats": {
+                    "today_revenue": stats['today_revenue'],
+                    "today_transactions": stats['today_transactions'],
+                    "kasir_performance": stats['kasir_performance']
+                },
+                "recent_transactions": state.recent
+            })
+
+    def update_stats(self, values: Dict):
+        """Apply outlet-independent stats (memberships) to every state"""
+        for state in self._states.values():
+            state.stats.update(values)
+            state.publish({"stats": values})
+
+    def update_outlet_stats(self, outlet_id: Optional[str], values: Dict):
+        """Apply stats computed for one outlet (or all outlets) to its state"""
+        state = self._states.get(outlet_id)
+        if state is None or all(state.stats.get(k) == v for k, v in values.items()):
+            return
+        state.stats.update(values)
+        state.publish({"stats": values})
+
+    def schedule_refresh(self, name: str, refresh: Callable[[], Awaitable[Dict]]):
+        """
+        Recompute a group of stats shortly, once, if any dashboard is open
+
+        Several changes within REFRESH_DELAY share a single database query.
+        """
+        if not self.active or name in self._pending:
+            return
+
+        async def run():
+            try:
+                await asyncio.sleep(REFRESH_DELAY)
+                values = await refresh()
+                self.update_stats(values)
+            except Exception as e:
+                logging.error(f"Dashboard refresh '{name}' failed: {e}")
+            finally:
+                self._pending.pop(name, None)
+
+        self._pending[name] = asyncio.get_running_loop().create_task(run())
+
+    def schedule_outlet_refresh(self, name: str, outlet_ids: Iterable[Optional[str]],
+                                refresh: Callable[[Optional[str]], Awaitable[Dict]]):
+        """
+        Recompute a group of per-outlet stats (low stock) shortly for the
+        outlets that changed and the all-outlets view
+
+        Outlets changed within REFRESH_DELAY are collected and each open one
+        is refreshed once, with refresh(outlet_id).
+        """
+        if not self.active:
+            return
+        dirty = self._dirty.setdefault(name, set())
+        dirty.update(outlet_ids)
+        dirty.add(ALL_OUTLETS)
+        if name in self._pending:
+            return
+
+        async def run():
+            await asyncio.sleep(REFRESH_DELAY)
+            # Changes from here on schedule a new refresh
+            self._pending.pop(name, None)
+            for outlet_id in self._dirty.pop(name, set()):
+                if outlet_id not in self._states:
+                    continue
+                try:
+                    self.update_outlet_stats(outlet_id, await refresh(outlet_id))
+                except Exception as e:
+                    logging.error(f"Dashboard refresh '{name}' for outlet {outlet_id} failed: {e}")
+
+        self._pending[name] = asyncio.get_running_loop().create_task(run())
+
+    def schedule_reload(self, loader: Callable[[Optional[str]], Awaitable[Dict]]):
+        """
+        Reload every open state from the database shortly, once
+
+        Used for writes made by other worker processes, which this hub cannot
+        apply incrementally; several within REFRESH_DELAY share one reload.
+        """
+        if not self.active or "reload" in self._pending:
+            return
+
+        async def run():
+            await asyncio.sleep(REFRESH_DELAY)
+            self._pending.pop("reload", None)
+            for outlet_id, state in list(self._states.items()):
+                try:
+                    loaded = copy.deepcopy(await loader(outlet_id))
+                except Exception as e:
+                    logging.error(f"Dashboard reload for outlet {outlet_id} failed: {e}")
+                    continue
+                if loaded == state.snapshot():
+                    continue
+                state.day = today_key()
+                state.stats = loaded['stats']
+                state.recent = loaded['recent_transactions']
+                state.publish(state.snapshot())
+
+        self._pending["reload"] = asyncio.get_running_loop().create_task(run())
+
+
+# Global instance
+dashboard_hub = DashboardHub()
@@ -0,0 +1,150 @@
+"""
+DB Pool Module
+MongoDB connection pool settings from the environment, a pool listener that
+tracks open and in-use connections, and a warm-up that fills the pool to
+minPoolSize before the instance reports ready.
+
+Environment (unset values keep the driver defaults):
+    MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE, MONGO_MAX_IDLE_TIME_MS,
+    MONGO_MAX_CONNECTING, MONGO_WAIT_QUEUE_TIMEOUT_MS, MONGO_CONNECT_TIMEOUT_MS,
+    MONGO_SOCKET_TIMEOUT_MS, MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    MONGO_COMPRESSORS (e.g. "zstd,snappy,zlib"), MONGO_ZLIB_LEVEL
+"""
+
+import asyncio
+import os
+import threading
+from typing import Dict, Mapping
+
+from pymongo import monitoring
+
+from metrics import Counter, Gauge, registry
+
+# env var -> (client option, type)
+POOL_ENV = {
+    "MONGO_MAX_POOL_SIZE": ("maxPoolSize", int),
+    "MONGO_MIN_POOL_SIZE": ("minPoolSize", int),
+    "MONGO_MAX_IDLE_TIME_MS": ("maxIdleTimeMS", int),
+    "MONGO_MAX_CONNECTING": ("maxConnecting", int),
+    "MONGO_WAIT_QUEUE_TIMEOUT_MS": ("waitQueueTimeoutMS", int),
+    "MONGO_CONNECT_TIMEOUT_MS": ("connectTimeoutMS", int),
+    "MONGO_SOCKET_TIMEOUT_MS": ("socketTimeoutMS", int),
+    "MONGO_SERVER_SELECTION_TIMEOUT_MS": ("serverSelectionTimeoutMS", int),
+    "MONGO_COMPRESSORS": ("compressors", str),
+    "MONGO_ZLIB_LEVEL": ("zlibCompressionLevel", int),
+}
+
+# Driver defaults, reported by /readyz when not overridden
+DEFAULT_MAX_POOL_SIZE = 100
+DEFAULT_MIN_POOL_SIZE = 0
+
+pool_connections = registry.register(Gauge(
+    "mongodb_pool_connections", "MongoDB pool connections by state", ("state",)))
+pool_checkout_failures = registry.register(Counter(
+    "mongodb_pool_checkout_failures_total", "Connection check-outs that failed or timed out", ("reason",)))
+pool_cleared = registry.register(Counter(
+    "mongodb_pool_cleared_total", "Times a connection pool was cleared after an error"))
+
+
+def client_options_from_env(environ: Mapping[str, str] = os.environ) -> Dict:
+    """AsyncIOMotorClient keyword arguments for the pool variables that are set"""
+    options = {}
+    for env_name, (option, cast) in POOL_ENV.items():
+        value = environ.get(env_name)
+        if value not in (None, ""):
+            options[option] = cast(value)
+    return options
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """Counts open, in-use and waiting connections across all pools"""
+
+    def __init__(self):
+        self.open = 0
+        self.in_use = 0
+        self.waiting = 0
+        self.checkout_failures = 0
+        self.cleared = 0
+        self._lock = threading.Lock()
+
+    def _update(self, open_delta=0, in_use_delta=0, waiting_delta=0):
+        # Pool events arrive on driver threads
+        with self._lock:
+            self.open += open_delta
+            self.in_use += in_use_delta
+            self.waiting += waiting_delta
+            pool_connections.set(self.open, "open")
+            pool_connections.set(self.in_use, "in_use")
+            pool_connections.set(self.waiting, "waiting")
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "open": self.open,
+                "in_use": self.in_use,
+                "waiting": self.waiting,
+                "checkout_failures": self.checkout_failures,
+                "cleared": self.cleared
+            }
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.cleared += 1
+        pool_cleared.inc()
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._update(open_delta=1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._update(open_delta=-1)
+
+    def connection_check_out_started(self, event):
+        self._update(waiting_delta=1)
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.checkout_failures += 1
+        pool_checkout_failures.inc(str(event.reason))
+        self._update(waiting_delta=-1)
+
+    def connection_checked_out(self, event):
+        self._update(in_use_delta=1, waiting_delta=-1)
+
+    def connection_checked_in(self, event):
+        self._update(in_use_delta=-1)
+
+
+async def warm_pool(db, listener: PoolStatsListener, min_size: int, timeout: float = 10.0) -> bool:
+    """
+    Ping the server, then open connections until min_size are pooled
+
+    Concurrent pings each check out their own connection; the driver's
+    background maintenance tops the pool up to minPoolSize as well.
+    Returns whether the pool reached min_size within timeout.
+    """
+    await db.command("ping")
+    if min_size <= 1:
+        return True
+    await asyncio.gather(*[db.command("ping") for _ in range(min_size)], return_exceptions=True)
+    deadline = asyncio.get_running_loop().time() + timeout
+    while listener.open < min_size:
+        if asyncio.get_running_loop().time() > deadline:
+            return False
+        await asyncio.sleep(0.05)
+    return True
+
+
+# Global instance
+pool_listener = PoolStatsListener()
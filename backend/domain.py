@@ -0,0 +1,130 @@
+"""
+Domain Module
+Pure business rules used by the API routes: membership status, commission,
+promotion discount and receipt text. Nothing here touches the database or
+the network, so every function can be unit-tested and benchmarked directly.
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# Memberships ending within this many days are flagged as expiring soon
+EXPIRING_SOON_DAYS = 7
+
+
+def parse_datetime(value):
+    """Stored dates are ISO strings; pass datetimes and None through"""
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+
+# Membership
+
+def membership_status(end_date: datetime, now: datetime) -> str:
+    """'expired', 'expiring_soon' or 'active' for a membership ending at end_date"""
+    if end_date < now:
+        return "expired"
+    if (end_date - now).days <= EXPIRING_SOON_DAYS:
+        return "expiring_soon"
+    return "active"
+
+
+def days_remaining(end_date: datetime, now: datetime) -> int:
+    """Whole days left on a membership, never negative"""
+    return max((end_date - now).days, 0)
+
+
+def is_membership_active(end_date: datetime, now: datetime) -> bool:
+    return end_date >= now
+
+
+def refresh_membership(membership: Dict, now: datetime) -> Dict:
+    """Parse a stored membership's dates and recompute its status in place"""
+    for field in ('start_date', 'end_date', 'created_at', 'last_used'):
+        if isinstance(membership.get(field), str):
+            membership[field] = datetime.fromisoformat(membership[field])
+    membership['status'] = membership_status(membership['end_date'], now)
+    return membership
+
+
+# Commission
+
+def item_commission(price: float, quantity: float, commission_rate: float) -> float:
+    """Commission on one line item: price * quantity * rate%, before any transaction discount"""
+    if commission_rate <= 0:
+        return 0.0
+    return (price * quantity) * (commission_rate / 100)
+
+
+def apply_commissions(items: List[Dict], commission_rates: Dict[str, float]) -> float:
+    """
+    Set commission_amount on each item and return the transaction total
+
+    Args:
+        items: Cart items; service lines carry service_id, price and quantity
+        commission_rates: service id -> commission rate (%)
+    """
+    total_commission = 0.0
+    for item in items:
+        commission_amount = 0.0
+        if item.get('service_id'):
+            commission_amount = item_commission(
+                item['price'], item['quantity'], commission_rates.get(item['service_id'], 0)
+            )
+        item['commission_amount'] = commission_amount
+        total_commission += commission_amount
+    return total_commission
+
+
+# Promotion
+
+def promotion_discount(is_percentage: bool, value: float, subtotal: float,
+                       max_discount: Optional[float] = None) -> float:
+    """Discount for a subtotal, capped by max_discount (percentage promos) and the subtotal"""
+    if is_percentage:
+        discount_amount = (value / 100) * subtotal
+        if max_discount:
+            discount_amount = min(discount_amount, max_discount)
+    else:
+        discount_amount = value
+    return min(discount_amount, subtotal)
+
+
+# Receipt
+
+def format_receipt(transaction: Dict, items: List[Dict], now: Optional[datetime] = None) -> str:
+    """
+    Format a transaction receipt for WhatsApp
+
+    Args:
+        transaction: Transaction data
+        items: Receipt lines with name, quantity and price
+        now: Time printed on the receipt (defaults to the current local time)
+    """
+    date_str = (now or datetime.now()).strftime("%d/%m/%Y %H:%M")
+    lines = [
+        "🧼 *OTOPIA CAR WASH*",
+        "━━━━━━━━━━━━━━━━━━━━",
+        "",
+        f"📅 {date_str}",
+        f"🎫 Invoice: {transaction.get('invoice_number', 'N/A')}",
+        "",
+        "*LAYANAN:*",
+    ]
+    for item in items:
+        qty = item.get('quantity', 1)
+        lines.append(f"• {item.get('name', 'Unknown')} x{qty}")
+        lines.append(f"  Rp {item.get('price', 0) * qty:,.0f}")
+
+    lines += [
+        "",
+        "━━━━━━━━━━━━━━━━━━━━",
+        f"*TOTAL:* Rp {transaction.get('total', 0):,.0f}",
+        f"💳 Pembayaran: {transaction.get('payment_method', 'cash').upper()}",
+        "",
+        "Terima kasih atas kunjungan Anda!",
+        "Simpan struk ini sebagai bukti.",
+        "",
+        "📍 Jl. Sukun Raya No.47C, Semarang",
+        "📞 0822-2702-5335",
+    ]
+    return "\n".join(lines)
@@ -0,0 +1,190 @@
+"""
+Forecast Module
+Daily consumption per inventory item and reorder suggestions, computed for
+the whole catalog at once with NumPy:
+
+    usage (days x items) = sales (days x sellables) @ bom (sellables x items)
+                           + stock taken out by hand (days x items)
+
+Sellables are services (their BOM) and products (one unit of their linked
+item). Sales come from transactions, hot and archived, plus membership
+washes; hand adjustments come from inventory_logs.
+
+Reorder suggestions per item, with d = weighted mean daily usage and
+s = its standard deviation over the window:
+    reorder_point = d * lead_time + z(service_level) * s * sqrt(lead_time)
+    order_up_to   = reorder_point + d * cover_days
+    suggested_order = order_up_to - current_stock, once stock is at or below reorder_point
+
+Needs numpy (pip install numpy).
+"""
+
+import math
+from datetime import datetime, timedelta, timezone
+from statistics import NormalDist
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from transaction_archive import HOT_COLLECTION, union_pipeline
+
+# Recent days weigh more: a day's weight halves every HALF_LIFE_DAYS
+HALF_LIFE_DAYS = 28
+
+
+def day_range(start: datetime, days: int) -> List[str]:
+    return [(start + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(days)]
+
+
+def scatter(rows: List[Tuple[str, str, float]], days: Dict[str, int], columns: Dict[str, int]) -> np.ndarray:
+    """days x columns matrix from (day, column key, quantity) rows; unknown keys are dropped"""
+    matrix = np.zeros((len(days), len(columns)))
+    rows = [(days[d], columns[k], q) for d, k, q in rows if d in days and k in columns]
+    if rows:
+        day_idx, col_idx, quantity = zip(*rows)
+        np.add.at(matrix, (np.array(day_idx), np.array(col_idx)), np.array(quantity, dtype=float))
+    return matrix
+
+
+def bom_matrix(sellables: Dict[str, int], items: Dict[str, int],
+               lines: List[Tuple[str, str, float]]) -> np.ndarray:
+    """sellables x items quantity per unit sold, from (sellable key, inventory id, quantity) lines"""
+    bom = np.zeros((len(sellables), len(items)))
+    for sellable, inventory_id, quantity in lines:
+        if sellable in sellables and inventory_id in items:
+            bom[sellables[sellable], items[inventory_id]] += quantity
+    return bom
+
+
+def daily_usage(sales: np.ndarray, bom: np.ndarray, adjustments: np.ndarray) -> np.ndarray:
+    return sales @ bom + adjustments
+
+
+def reorder_plan(usage: np.ndarray, current_stock: np.ndarray, lead_time_days: float = 7,
+                 cover_days: float = 14, service_level: float = 0.95,
+                 half_life_days: float = HALF_LIFE_DAYS) -> Dict[str, np.ndarray]:
+    """Per-item arrays (one entry per usage column) of demand statistics and suggestions"""
+    n_days = usage.shape[0]
+    age = np.arange(n_days - 1, -1, -1, dtype=float)
+    weights = 0.5 ** (age / half_life_days)
+    weights /= weights.sum()
+
+    mean = weights @ usage
+    std = np.sqrt(weights @ (usage - mean) ** 2)
+    z = NormalDist().inv_cdf(service_level)
+
+    reorder_point = mean * lead_time_days + z * std * math.sqrt(lead_time_days)
+    order_up_to = reorder_point + mean * cover_days
+    with np.errstate(divide="ignore", invalid="ignore"):
+        days_of_cover = np.where(mean > 0, current_stock / mean, np.inf)
+    suggested = np.where(current_stock <= reorder_point, np.ceil(np.maximum(order_up_to - current_stock, 0)), 0)
+
+    return {
+        "avg_daily_usage": mean,
+        "usage_std": std,
+        "days_of_cover": days_of_cover,
+        "reorder_point": reorder_point,
+        "order_up_to": order_up_to,
+        "suggested_order": suggested
+    }
+
+
+# Loading history
+
+async def sales_rows(db, start: str, end: str, scope: Dict) -> List[Tuple[str, str, float]]:
+    """(day, sellable key, quantity) from transactions and membership washes"""
+    pipeline = await union_pipeline(db, dict(scope), start, end)
+    pipeline += [
+        {"$unwind": "$items"},
+        {"$group": {
+            "_id": {
+                "day": {"$substrCP": ["$created_at", 0, 10]},
+                "service_id": "$items.service_id",
+                "product_id": "$items.product_id"
+            },
+            "quantity": {"$sum": "$items.quantity"}
+        }}
+    ]
+    rows = []
+    async for row in db[HOT_COLLECTION].aggregate(pipeline):
+        key = row["_id"]
+        if key.get("service_id"):
+            rows.append((key["day"], f"service:{key['service_id']}", row["quantity"]))
+        elif key.get("product_id"):
+            rows.append((key["day"], f"product:{key['product_id']}", row["quantity"]))
+
+    washes = db.membership_usage.aggregate([
+        {"$match": {"used_at": {"$gte": start, "$lt": end}, **scope}},
+        {"$group": {"_id": {"day": {"$substrCP": ["$used_at", 0, 10]}, "service_id": "$service_id"}, "count": {"$sum": 1}}}
+    ])
+    async for row in washes:
+        rows.append((row["_id"]["day"], f"service:{row['_id']['service_id']}", row["count"]))
+    return rows
+
+
+async def adjustment_rows(db, start: str, end: str, inventory_ids: List[str]) -> List[Tuple[str, str, float]]:
+    """(day, inventory id, quantity) taken out of stock by hand (waste, own use)"""
+    rows = db.inventory_logs.aggregate([
+        {"$match": {"created_at": {"$gte": start, "$lt": end}, "change_amount": {"$lt": 0},
+                    "inventory_id": {"$in": inventory_ids}}},
+        {"$group": {"_id": {"day": {"$substrCP": ["$created_at", 0, 10]}, "inventory_id": "$inventory_id"},
+                    "quantity": {"$sum": {"$multiply": ["$change_amount", -1]}}}}
+    ])
+    return [(row["_id"]["day"], row["_id"]["inventory_id"], row["quantity"]) async for row in rows]
+
+
+async def bom_lines(db) -> Tuple[List[str], List[Tuple[str, str, float]]]:
+    """Sellable keys and their (sellable, inventory id, quantity per unit) lines"""
+    sellables, lines = [], []
+    async for service in db.services.find({}, {"_id": 0, "id": 1, "bom": 1}):
+        key = f"service:{service['id']}"
+        sellables.append(key)
+        lines += [(key, line["inventory_id"], line["quantity"]) for line in service.get("bom") or []]
+    async for product in db.products.find({"inventory_id": {"$ne": None}}, {"_id": 0, "id": 1, "inventory_id": 1}):
+        key = f"product:{product['id']}"
+        sellables.append(key)
+        lines.append((key, product["inventory_id"], 1.0))
+    return sellables, lines
+
+
+async def forecast_reorders(db, scope: Dict, days: int = 90, lead_time_days: float = 7,
+                            cover_days: float = 14, service_level: float = 0.95,
+                            now: Optional[datetime] = None) -> Dict:
+    """Reorder suggestions for the items in scope from the last `days` full days of usage"""
+    end_day = (now or datetime.now(timezone.utc)).replace(hour=0, minute=0, second=0, microsecond=0)
+    start_day = end_day - timedelta(days=days)
+    start, end = start_day.isoformat(), end_day.isoformat()
+
+    items = await db.inventory.find(
+        {**scope, "is_active": {"$ne": False}},
+        {"_id": 0, "id": 1, "sku": 1, "name": 1, "unit": 1, "current_stock": 1, "min_stock": 1, "max_stock": 1}
+    ).to_list(None)
+    item_index = {item["id"]: i for i, item in enumerate(items)}
+    day_index = {day: i for i, day in enumerate(day_range(start_day, days))}
+    sellables, lines = await bom_lines(db)
+    sellable_index = {key: i for i, key in enumerate(sellables)}
+
+    usage = daily_usage(
+        scatter(await sales_rows(db, start, end, scope), day_index, sellable_index),
+        bom_matrix(sellable_index, item_index, lines),
+        scatter(await adjustment_rows(db, start, end, list(item_index)), day_index, item_index)
+    )
+    current = np.array([item.get("current_stock", 0) for item in items], dtype=float)
+    plan = reorder_plan(usage, current, lead_time_days, cover_days, service_level)
+
+    columns = {name: values.round(2).tolist() for name, values in plan.items()}
+    suggestions = []
+    for i, item in enumerate(items):
+        row = {**item, **{name: values[i] for name, values in columns.items()}}
+        if math.isinf(row["days_of_cover"]):
+            row["days_of_cover"] = None
+        suggestions.append(row)
+    suggestions.sort(key=lambda row: (row["days_of_cover"] is None, row["days_of_cover"] or 0))
+
+    return {
+        "window": {"start": start, "end": end, "days": days},
+        "lead_time_days": lead_time_days,
+        "cover_days": cover_days,
+        "service_level": service_level,
+        "items": suggestions
+    }
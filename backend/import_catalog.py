@@ -1,8 +1,50 @@
+"""
+Catalog Importer
+Bulk-imports inventory, services, products and BOM lines from CSV, XLSX,
+JSON or NDJSON files. Rows are read as a stream, validated against the API's
+Pydantic models and written with batched bulk_write upserts keyed by SKU
+and outlet (inventory) or name (services, products). A dry run prints the diff against
+the database without writing anything.
+
+Usage:
+    python import_catalog.py inventory.csv services.csv products.csv bom.csv --dry-run
+    python import_catalog.py catalog.xlsx            # sheets: inventory, services, products, bom
+    python import_catalog.py catalog.json            # {"inventory": [...], "services": [...], ...}
+    python import_catalog.py                         # built-in service catalog below
+
+The kind of a CSV/NDJSON file or JSON list comes from its file name
+(e.g. services.csv, 2024_bom.csv) or --kind. Columns match the create models:
+  inventory: sku, name, category, unit, current_stock, min_stock, max_stock, unit_cost, supplier, outlet_id
+  services:  name, description, price, duration_minutes, category, commission_rate, image_url
+  products:  name, description, price, category, inventory_sku, image_url, min_stock_level
+  bom:       service_name, inventory_sku, quantity
+A service's BOM is replaced by the lines given for it. Stock levels are only
+set when an inventory item is first created; re-imports never overwrite
+counted stock. Columns left out of a file keep their stored values, and an
+inventory row without outlet_id updates that SKU in every outlet that has it.
+
+XLSX files need openpyxl (pip install openpyxl).
+"""
+
+import argparse
 import asyncio
-from motor.motor_asyncio import AsyncIOMotorClient
+import csv
+import json
 import os
-from datetime import datetime, timezone
+import sys
+import time
 import uuid
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pydantic import ValidationError
+from pymongo import UpdateMany, UpdateOne
+
+from cache_bus import VERSIONS_COLLECTION
+from stock_alerts import stock_alerts
+from stock_ledger import OPENING, movement, record_movements
+from server import BOMItem, InventoryItemCreate, ProductCreate, ServiceCreate
 
 # MongoDB connection
 mongo_url = os.environ.get('MONGO_URL', 'mongodb://127.0.0.1:27017')
@@ -11,6 +53,11 @@ db_name = os.environ.get('DB_NAME', 'carwash_db')
 client = AsyncIOMotorClient(mongo_url)
 db = client[db_name]
 
+# Import order matters: products and BOM lines refer to inventory by SKU
+KINDS = ("inventory", "services", "products", "bom")
+COLLECTIONS = {"inventory": "inventory", "services": "services", "products": "products", "bom": "services"}
+KEY_FIELDS = {"inventory": "sku", "services": "name", "products": "name", "bom": "name"}
+
 # Catalog data from WhatsApp (extracted from image)
 catalog_services = [
     {
@@ -105,33 +152,400 @@ catalog_services = [
     },
 ]
 
-async def import_catalog():
-    print("🚀 Starting catalog import...")
-    
-    imported = 0
-    skipped = 0
-    
-    for service_data in catalog_services:
-        # Check if service already exists
-        existing = await db.services.find_one({"name": service_data["name"]}, {"_id": 0})
-        
-        if existing:
-            print(f"⏭️  Skipped: {service_data['name']} (already exists)")
-            skipped += 1
+
+class CatalogError(Exception):
+    """A row that cannot be imported"""
+
+
+# ========================================
+# Readers - each yields (kind, source, row_number, row)
+# ========================================
+
+def kind_from_name(name: str) -> Optional[str]:
+    name = name.lower()
+    for kind in KINDS:
+        if kind.rstrip("s") in name:
+            return kind
+    return None
+
+
+def clean_row(row: Dict) -> Dict:
+    """Drop blank cells so model defaults apply; trim text"""
+    cleaned = {}
+    for key, value in row.items():
+        if key is None:
+            continue
+        if isinstance(value, str):
+            value = value.strip()
+        if value is None or value == "":
             continue
-        
-        # Add metadata
-        service_data["id"] = str(uuid.uuid4())
-        service_data["bom"] = []
-        
-        await db.services.insert_one(service_data)
-        print(f"✅ Imported: {service_data['name']} - Rp {service_data['price']:,}")
-        imported += 1
-    
-    print(f"\n🎉 Import complete!")
-    print(f"   ✅ Imported: {imported} services")
-    print(f"   ⏭️  Skipped: {skipped} services (already exist)")
-    print(f"\n💡 Total services in catalog: {len(catalog_services)}")
+        cleaned[str(key).strip().lower()] = value
+    return cleaned
+
+
+def read_csv(path: Path, kind: str) -> Iterator[Tuple[str, str, int, Dict]]:
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for row_number, row in enumerate(csv.DictReader(f), start=2):
+            yield kind, path.name, row_number, clean_row(row)
+
+
+def read_ndjson(path: Path, kind: str) -> Iterator[Tuple[str, str, int, Dict]]:
+    with open(path, encoding="utf-8") as f:
+        for row_number, line in enumerate(f, start=1):
+            if line.strip():
+                yield kind, path.name, row_number, clean_row(json.loads(line))
+
+
+def read_json(path: Path, kind: Optional[str]) -> Iterator[Tuple[str, str, int, Dict]]:
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    sections = data.items() if isinstance(data, dict) else [(kind, data)]
+    for section, rows in sections:
+        if section not in KINDS:
+            raise CatalogError(f"{path.name}: unknown section '{section}' (expected {', '.join(KINDS)})")
+        for row_number, row in enumerate(rows, start=1):
+            yield section, f"{path.name}[{section}]", row_number, clean_row(row)
+
+
+def read_xlsx(path: Path, kind: Optional[str]) -> Iterator[Tuple[str, str, int, Dict]]:
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise CatalogError("Reading .xlsx files needs openpyxl: pip install openpyxl")
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            sheet_kind = kind_from_name(sheet.title) or (kind if len(workbook.worksheets) == 1 else None)
+            if sheet_kind is None:
+                print(f"⏭️  Skipped sheet '{sheet.title}' in {path.name} (not one of {', '.join(KINDS)})")
+                continue
+            rows = sheet.iter_rows(values_only=True)
+            headers = next(rows, None)
+            if not headers:
+                continue
+            for row_number, values in enumerate(rows, start=2):
+                if any(v is not None for v in values):
+                    yield sheet_kind, f"{path.name}[{sheet.title}]", row_number, clean_row(dict(zip(headers, values)))
+    finally:
+        workbook.close()
+
+
+def read_file(path: Path, kind: Optional[str]) -> Iterator[Tuple[str, str, int, Dict]]:
+    suffix = path.suffix.lower()
+    if suffix == ".xlsx":
+        return read_xlsx(path, kind)
+    if suffix == ".json":
+        return read_json(path, kind or kind_from_name(path.stem))
+    kind = kind or kind_from_name(path.stem)
+    if kind is None:
+        raise CatalogError(f"{path.name}: cannot tell the catalog kind from the file name; use --kind")
+    if suffix == ".csv":
+        return read_csv(path, kind)
+    if suffix in (".jsonl", ".ndjson"):
+        return read_ndjson(path, kind)
+    raise CatalogError(f"{path.name}: unsupported file type (use .csv, .xlsx, .json or .jsonl)")
+
+
+# ========================================
+# Row preparation - validated fields to $set and to $setOnInsert
+# ========================================
+
+def split_defaults(model) -> Tuple[Dict, Dict]:
+    """
+    Columns the row supplied, to $set, and model defaults for the rest, only
+    for new documents: a column left out of the file never overwrites data
+    """
+    data = model.model_dump(exclude_unset=True)
+    defaults = {k: v for k, v in model.model_dump().items() if k not in data}
+    return data, defaults
+
+
+def inventory_key(sku: str, outlet_id: Optional[str]) -> str:
+    """A SKU can exist once per outlet; rows without outlet_id address the SKU in every outlet"""
+    return f"{sku}@{outlet_id}" if outlet_id else sku
+
+
+def prepare_inventory(row: Dict, index: Dict) -> Tuple[str, Dict, Dict]:
+    data, defaults = split_defaults(InventoryItemCreate(**row))
+    # Counted stock is operational data; only seed it for new items
+    stock = data.pop("current_stock")
+    key = inventory_key(data["sku"], data.get("outlet_id"))
+    return key, data, {**defaults, "id": str(uuid.uuid4()), "current_stock": stock, "is_active": True}
+
+
+def prepare_service(row: Dict, index: Dict) -> Tuple[str, Dict, Dict]:
+    # BOM usually comes from bom lines; without a bom column, keep whatever the service has
+    data, defaults = split_defaults(ServiceCreate(**row))
+    return data["name"], data, {**defaults, "id": str(uuid.uuid4()), "is_active": True}
+
+
+def prepare_product(row: Dict, index: Dict) -> Tuple[str, Dict, Dict]:
+    sku = row.pop("inventory_sku", None)
+    if sku is not None:
+        if sku not in index:
+            raise CatalogError(f"unknown inventory_sku '{sku}'")
+        row["inventory_id"] = index[sku]["id"]
+    data, defaults = split_defaults(ProductCreate(**row))
+    return data["name"], data, {**defaults, "id": str(uuid.uuid4()), "is_active": True}
+
+
+PREPARE = {"inventory": prepare_inventory, "services": prepare_service, "products": prepare_product}
+
+
+def bom_line(row: Dict, index: Dict) -> Tuple[str, Dict]:
+    for column in ("service_name", "inventory_sku", "quantity"):
+        if column not in row:
+            raise CatalogError(f"missing {column}")
+    item = index.get(row["inventory_sku"])
+    if item is None:
+        raise CatalogError(f"unknown inventory_sku '{row['inventory_sku']}'")
+    line = BOMItem(inventory_id=item["id"], inventory_name=item["name"],
+                   quantity=row["quantity"], unit=row.get("unit", item["unit"]))
+    return row["service_name"], line.model_dump()
+
+
+# ========================================
+# Import
+# ========================================
+
+def batched(rows: Iterable, size: int) -> Iterator[List]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def describe(value) -> str:
+    text = json.dumps(value, default=str, ensure_ascii=False)
+    return text if len(text) <= 60 else text[:57] + "..."
+
+
+class CatalogImport:
+    """Diffs prepared rows against the database and writes the differences"""
+
+    def __init__(self, dry_run: bool, batch_size: int, show: int):
+        self.dry_run = dry_run
+        self.batch_size = batch_size
+        self.show = show
+        self.stats = {kind: {"new": 0, "changed": 0, "unchanged": 0, "invalid": 0} for kind in KINDS}
+        self.shown = {kind: 0 for kind in KINDS}
+        self.inventory_index: Dict[str, Dict] = {}  # sku -> id, name, unit (of one outlet's item)
+        self.keys = {kind: set() for kind in KINDS}  # keys seen in this import
+        self.touched = set()
+
+    async def load_inventory_index(self):
+        async for item in db.inventory.find({}, {"_id": 0, "id": 1, "sku": 1, "name": 1, "unit": 1}):
+            self.inventory_index[item["sku"]] = item
+
+    def report(self, kind: str, symbol: str, key: str, detail: str = ""):
+        if self.shown[kind] < self.show:
+            print(f"  {symbol} {key}{'  ' + detail if detail else ''}")
+        self.shown[kind] += 1
+
+    def invalid(self, kind: str, source: str, row_number: int, error: Exception):
+        self.stats[kind]["invalid"] += 1
+        if isinstance(error, ValidationError):
+            error = "; ".join(f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in error.errors())
+        print(f"  ❌ {source}:{row_number}: {error}")
+
+    @staticmethod
+    def key_filter(kind: str, key: str, fields: Dict) -> Dict:
+        if kind == "inventory":
+            # outlet_id only narrows the match when the row names an outlet
+            return {"sku": fields["sku"], **({"outlet_id": fields["outlet_id"]} if "outlet_id" in fields else {})}
+        return {KEY_FIELDS[kind]: key}
+
+    async def find_existing(self, kind: str, prepared: Dict[str, Tuple[Dict, Dict]]) -> Dict[str, List[Dict]]:
+        """key -> documents the key's row would update"""
+        key_field = KEY_FIELDS[kind]
+        projection = {"_id": 0, "id": 1, key_field: 1, "outlet_id": 1,
+                      **{f: 1 for fields, _ in prepared.values() for f in fields}}
+        if kind == "inventory":
+            values = list({fields["sku"] for fields, _ in prepared.values()})
+        else:
+            values = list(prepared)
+        docs = await db[COLLECTIONS[kind]].find({key_field: {"$in": values}}, projection).to_list(None)
+
+        existing: Dict[str, List[Dict]] = {}
+        for key, (fields, _) in prepared.items():
+            match = self.key_filter(kind, key, fields)
+            existing[key] = [doc for doc in docs if all(doc.get(f) == v for f, v in match.items())]
+        return existing
+
+    async def write_batch(self, kind: str, prepared: Dict[str, Tuple[Dict, Dict]]):
+        """prepared: key -> ($set fields, $setOnInsert fields); last row wins for repeated keys"""
+        collection = db[COLLECTIONS[kind]]
+        existing = await self.find_existing(kind, prepared)
+
+        operations = []
+        opening = {}  # operation index -> new inventory item, for its opening stock movement
+        for key, (fields, on_insert) in prepared.items():
+            self.keys[kind].add(key)
+            match = self.key_filter(kind, key, fields)
+            current = existing[key][0] if existing[key] else None
+            if current is None and kind == "bom":
+                # BOM of a service created by this (dry) run
+                self.stats[kind]["new"] += 1
+                self.report(kind, "+", key, f"{len(fields['bom'])} lines")
+                continue
+            if current is None:
+                self.stats[kind]["new"] += 1
+                self.report(kind, "+", key)
+                if kind == "inventory":
+                    opening[len(operations)] = on_insert
+                operations.append(UpdateOne(match, {"$set": fields, "$setOnInsert": on_insert}, upsert=True))
+                doc_id = on_insert.get("id")
+            else:
+                # An outlet-less inventory row updates the SKU in every outlet that has it
+                changes = {
+                    f: (doc.get(f), v) for doc in existing[key] for f, v in fields.items() if doc.get(f) != v
+                }
+                doc_id = current["id"]
+                if not changes:
+                    self.stats[kind]["unchanged"] += 1
+                else:
+                    self.stats[kind]["changed"] += 1
+                    self.report(kind, "~", key, ", ".join(
+                        f"{f}: {describe(old)} → {describe(new)}" for f, (old, new) in changes.items()))
+                    operations.append(UpdateMany(match, {"$set": fields}))
+            if kind == "inventory":
+                # Products and BOM lines refer to inventory by SKU
+                self.inventory_index[fields["sku"]] = {
+                    "id": doc_id, "sku": fields["sku"], "name": fields["name"], "unit": fields["unit"]
+                }
+
+        if operations and not self.dry_run:
+            result = await collection.bulk_write(operations, ordered=False)
+            self.touched.add(COLLECTIONS[kind])
+            # Stock of items this batch created goes on the stock ledger
+            await record_movements(db, [
+                movement(opening[index]["id"], opening[index].get("current_stock", 0), OPENING, note="Catalog import")
+                for index in result.upserted_ids if index in opening
+            ], apply=False)
+            if kind == "inventory":
+                # min_stock or new items may have moved items across their low-stock threshold
+                await stock_alerts.refresh_flags(db, {"sku": {"$in": [fields["sku"] for fields, _ in prepared.values()]}})
+
+    async def import_rows(self, kind: str, rows: Iterable[Tuple[str, int, Dict]]):
+        prepare = PREPARE[kind]
+        for batch in batched(rows, self.batch_size):
+            prepared = {}
+            for source, row_number, row in batch:
+                try:
+                    key, fields, on_insert = prepare(row, self.inventory_index)
+                except (ValidationError, CatalogError) as e:
+                    self.invalid(kind, source, row_number, e)
+                    continue
+                prepared[key] = (fields, on_insert)
+            if prepared:
+                await self.write_batch(kind, prepared)
+
+    async def import_bom(self, rows: Iterable[Tuple[str, int, Dict]]):
+        """Group lines per service, then replace each listed service's BOM"""
+        boms: Dict[str, List[Dict]] = {}
+        for source, row_number, row in rows:
+            try:
+                service_name, line = bom_line(row, self.inventory_index)
+            except (ValidationError, CatalogError) as e:
+                self.invalid("bom", source, row_number, e)
+                continue
+            boms.setdefault(service_name, []).append(line)
+
+        for names in batched(list(boms), self.batch_size):
+            known = self.keys["services"] | {
+                doc["name"] async for doc in db.services.find({"name": {"$in": names}}, {"_id": 0, "name": 1})
+            }
+            for name in names:
+                if name not in known:
+                    self.stats["bom"]["invalid"] += len(boms[name])
+                    print(f"  ❌ BOM for unknown service '{name}' skipped")
+            prepared = {name: ({"bom": boms[name]}, {}) for name in names if name in known}
+            if prepared:
+                await self.write_batch("bom", prepared)
+
+
+async def run_import(args):
+    print("🔍 Catalog dry run (nothing will be written)" if args.dry_run else "🚀 Importing catalog")
+    print(f"📂 Database Name: {db_name}")
+    print("=" * 60)
+    started = time.perf_counter()
+
+    # Files holding a single kind, plus xlsx/json files that may hold several ("*")
+    sources = {kind: [] for kind in (*KINDS, "*")}
+    if args.files:
+        for path in map(Path, args.files):
+            if not path.exists():
+                raise CatalogError(f"{path}: file not found")
+            if args.kind:
+                sources[args.kind].append(path)
+            elif path.suffix.lower() in (".xlsx", ".json"):
+                sources["*"].append(path)
+            elif kind_from_name(path.stem):
+                sources[kind_from_name(path.stem)].append(path)
+            else:
+                raise CatalogError(f"{path.name}: cannot tell the catalog kind from the file name; use --kind")
+    else:
+        print("📋 No files given; importing the built-in service catalog")
+
+    def rows_for(kind):
+        if not args.files and kind == "services":
+            for row_number, service in enumerate(catalog_services, start=1):
+                yield "built-in catalog", row_number, clean_row(service)
+        for path in sources[kind]:
+            for _, source, row_number, row in read_file(path, kind):
+                yield source, row_number, row
+        # Multi-section files are streamed once per kind, keeping that kind's rows
+        for path in sources["*"]:
+            for row_kind, source, row_number, row in read_file(path, None):
+                if row_kind == kind:
+                    yield source, row_number, row
+
+    importer = CatalogImport(args.dry_run, args.batch_size, args.show)
+    await importer.load_inventory_index()
+    for kind in KINDS:
+        print(f"\n📦 {kind}")
+        if kind == "bom":
+            await importer.import_bom(rows_for(kind))
+        else:
+            await importer.import_rows(kind, rows_for(kind))
+        hidden = importer.shown[kind] - args.show
+        if hidden > 0:
+            print(f"  ... and {hidden} more")
+
+    # Let running servers drop their cached catalog (see cache_bus)
+    for collection in importer.touched:
+        await db[VERSIONS_COLLECTION].update_one({"_id": collection}, {"$inc": {"version": 1}}, upsert=True)
+
+    print("\n" + "=" * 60)
+    print(f"{'':<12}{'new':>8}{'changed':>9}{'same':>8}{'invalid':>9}")
+    for kind, counts in importer.stats.items():
+        print(f"{kind:<12}{counts['new']:>8}{counts['changed']:>9}{counts['unchanged']:>8}{counts['invalid']:>9}")
+    print(f"\n⏱️  {time.perf_counter() - started:.1f}s" + ("  (dry run, nothing written)" if args.dry_run else ""))
+    return sum(counts["invalid"] for counts in importer.stats.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import catalog files into the car wash database")
+    parser.add_argument("files", nargs="*", help=".csv, .xlsx, .json or .jsonl catalog files")
+    parser.add_argument("--kind", choices=KINDS, help="Catalog kind for all files (default: from file/sheet name)")
+    parser.add_argument("--dry-run", action="store_true", help="Print the diff without writing")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Rows per bulk_write")
+    parser.add_argument("--show", type=int, default=50, help="Diff lines to print per kind")
+    args = parser.parse_args()
+
+    try:
+        invalid = asyncio.run(run_import(args))
+    except CatalogError as e:
+        print(f"❌ {e}")
+        sys.exit(2)
+    if invalid:
+        print(f"⚠️  {invalid} invalid row(s) were skipped")
+        sys.exit(1)
+
 
 if __name__ == "__main__":
-    asyncio.run(import_catalog())
+    main()
@@ -0,0 +1,85 @@
+"""
+Indexes Module
+Index definitions for the API's hot query paths. Applied at startup and by
+the query plan tests (tests/test_query_plans.py), so both see the same set.
+"""
+
+from pymongo import ASCENDING, DESCENDING
+
+
+async def ensure_indexes(db):
+    """Create every index the API relies on; existing ones are left as they are"""
+    # Lookups by document id
+    for collection in ("shifts", "transactions", "customers", "memberships"):
+        await db[collection].create_index("id")
+
+    # Open shift by kasir (shift open/current, checkout)
+    await db.shifts.create_index([("kasir_id", ASCENDING), ("status", ASCENDING)])
+
+    # Transactions by shift (shift close/summary)
+    await db.transactions.create_index("shift_id")
+
+    # Outlet-scoped lists and reports (see server.outlet_scope): outlet_id leads,
+    # so a branch's query reads only that branch's keys however many outlets exist
+    await db.shifts.create_index([("outlet_id", ASCENDING), ("opened_at", DESCENDING)])
+    await db.transactions.create_index([("outlet_id", ASCENDING), ("created_at", DESCENDING)])
+    await db.transactions.create_index([("outlet_id", ASCENDING), ("kasir_id", ASCENDING), ("created_at", DESCENDING)])
+    await db.transactions.create_index([("outlet_id", ASCENDING), ("customer_id", ASCENDING), ("created_at", DESCENDING)])
+    await db.expenses.create_index([("outlet_id", ASCENDING), ("date", DESCENDING)])
+    await db.inventory.create_index([("outlet_id", ASCENDING), ("name", ASCENDING)])
+    # Catalog import: a SKU per outlet
+    await db.inventory.create_index([("sku", ASCENDING), ("outlet_id", ASCENDING)])
+
+    # Commission report: only transactions with a technician on an item are indexed
+    # under a technician key (multikey over items), per outlet or for all
+    await db.transactions.create_index(
+        [("items.technician_id", ASCENDING), ("outlet_id", ASCENDING), ("created_at", DESCENDING)]
+    )
+    await db.payouts.create_index([("date", DESCENDING)])
+    await db.payouts.create_index([("user_id", ASCENDING), ("date", DESCENDING)])
+    # Profit and loss per outlet or for all outlets (transactions and usage are covered above)
+    await db.payouts.create_index([("outlet_id", ASCENDING), ("date", DESCENDING)])
+    await db.expenses.create_index([("date", DESCENDING)])
+
+    # The same lists for owners viewing every outlet
+    await db.transactions.create_index([("created_at", DESCENDING)])
+    await db.transactions.create_index([("kasir_id", ASCENDING), ("created_at", DESCENDING)])
+    await db.transactions.create_index([("customer_id", ASCENDING), ("created_at", DESCENDING)])
+
+    # Member scan: customer by phone, then their memberships
+    await db.customers.create_index("phone")
+    await db.memberships.create_index("customer_id")
+
+    # One membership usage per membership per day; older records without
+    # usage_day are left out of the constraint
+    await db.membership_usage.create_index(
+        [("membership_id", ASCENDING), ("usage_day", ASCENDING)],
+        unique=True,
+        partialFilterExpression={"usage_day": {"$exists": True}}
+    )
+    # Usage history; the partial index above cannot serve queries without usage_day
+    await db.membership_usage.create_index([("membership_id", ASCENDING), ("used_at", DESCENDING)])
+    # Usage over a period (reorder forecast), per outlet or for all
+    await db.membership_usage.create_index([("outlet_id", ASCENDING), ("used_at", ASCENDING)])
+    await db.membership_usage.create_index([("used_at", ASCENDING)])
+    # Manual stock removals over a period, per item
+    await db.inventory_logs.create_index([("inventory_id", ASCENDING), ("created_at", ASCENDING)])
+
+    # Stock ledger: movements after a snapshot, per item or for all items
+    await db.stock_movements.create_index([("created_at", ASCENDING)])
+    await db.stock_movements.create_index([("inventory_id", ASCENDING), ("created_at", ASCENDING)])
+    await db.stock_snapshots.create_index([("taken_at", DESCENDING)])
+
+    # Low-stock lists and counts (see stock_alerts): only flagged items are indexed,
+    # so both are served from a handful of keys
+    await db.inventory.create_index(
+        [("is_low_stock", ASCENDING), ("outlet_id", ASCENDING)],
+        partialFilterExpression={"is_low_stock": True}
+    )
+    await db.stock_alerts.create_index([("created_at", DESCENDING)])
+    await db.stock_alerts.create_index("expires_at", expireAfterSeconds=0)
+
+    await db.promotions.create_index("code")
+
+    await db.profiles.create_index("id")
+    await db.profiles.create_index("expires_at", expireAfterSeconds=0)
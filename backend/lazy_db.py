@@ -0,0 +1,50 @@
+"""
+Lazy Database Module
+Stands in for the Motor database until it is first used. Importing the app
+(a serverless cold start) then pays neither for importing Motor nor for
+building the client; the first query does, once.
+"""
+
+from typing import Dict
+
+
+class LazyDatabase:
+    """Creates the AsyncIOMotorClient and database on first attribute access"""
+
+    def __init__(self, mongo_url: str, name: str, **client_kwargs):
+        self.mongo_url = mongo_url
+        self.name = name
+        self.client_kwargs: Dict = client_kwargs
+        self._client = None
+        self._database = None
+
+    @property
+    def created(self) -> bool:
+        return self._client is not None
+
+    @property
+    def client(self):
+        if self._client is None:
+            from motor.motor_asyncio import AsyncIOMotorClient
+            self._client = AsyncIOMotorClient(self.mongo_url, **self.client_kwargs)
+            self._database = self._client[self.name]
+        return self._client
+
+    def get_database(self):
+        if self._database is None:
+            self.client
+        return self._database
+
+    def __getattr__(self, name: str):
+        # Only called for attributes not set in __init__: collections, command, watch, ...
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(self.get_database(), name)
+
+    def __getitem__(self, name: str):
+        return self.get_database()[name]
+
+    def close(self):
+        """Close the client if it was ever created"""
+        if self._client is not None:
+            self._client.close()
@@ -0,0 +1,63 @@
+"""
+Lazy Routes Module
+Route groups that live in their own module and are imported on the first
+request under their path prefix. Long-running servers load them all at
+startup; serverless cold starts only pay for the groups a request needs.
+"""
+
+import importlib
+from typing import List
+
+from starlette.routing import BaseRoute, Match
+
+
+class LazyRoutes(BaseRoute):
+    """
+    Matches every request under path_prefix and hands it to the `router`
+    defined in module_name, importing that module the first time
+    """
+
+    def __init__(self, path_prefix: str, module_name: str):
+        self.path_prefix = path_prefix.rstrip("/")
+        self.module_name = module_name
+        self._router = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._router is not None
+
+    def load(self):
+        if self._router is None:
+            self._router = importlib.import_module(self.module_name).router
+        return self._router
+
+    def matches(self, scope):
+        if scope["type"] == "http":
+            path = scope["path"]
+            if path == self.path_prefix or path.startswith(self.path_prefix + "/"):
+                return Match.FULL, {}
+        return Match.NONE, {}
+
+    def url_path_for(self, name: str, /, **path_params):
+        return self.load().url_path_for(name, **path_params)
+
+    async def handle(self, scope, receive, send):
+        await self.load()(scope, receive, send)
+
+
+def add_lazy_routes(app, groups: List[LazyRoutes]):
+    """Register route groups on the app; each loads on its first request"""
+    for group in groups:
+        app.router.routes.append(group)
+
+
+def load_all(app, groups: List[LazyRoutes]):
+    """Import every group now and list its routes in the OpenAPI schema"""
+    included = []
+    for group in groups:
+        router = group.load()
+        # Several prefixes may share one module
+        if router not in included:
+            app.include_router(router)
+            included.append(router)
+    app.openapi_schema = None
@@ -0,0 +1,254 @@
+"""
+POS Load Test
+Drives the backend with realistic cashier and manager traffic and reports
+latency percentiles and throughput per endpoint.
+
+Each simulated terminal logs in as its own kasir, opens a shift, runs a
+series of checkouts with the occasional membership scan, checks the shift
+summary and closes the shift. Managers poll the dashboard and reports while
+the terminals are busy.
+
+Usage (spawns uvicorn on a throwaway database against a local mongod):
+    python load_test.py --terminals 10 --checkouts 50 --managers 3
+
+Against an already running server:
+    python load_test.py --url http://127.0.0.1:8000 --terminals 10
+
+Requires httpx (pip install httpx).
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+from pathlib import Path
+
+try:
+    import httpx
+except ImportError:
+    print("❌ load_test.py needs httpx: pip install httpx")
+    sys.exit(1)
+
+ROOT_DIR = Path(__file__).parent
+
+
+class LatencyRecorder:
+    """Collects request latencies and failures per endpoint"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def request(self, client, name, method, url, expected=(200,), **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.errors[name] += 1
+            return None
+        self.latencies[name].append(time.perf_counter() - start)
+        if response.status_code not in expected:
+            self.errors[name] += 1
+        return response
+
+    def report(self, wall_time):
+        print(f"\n{'Endpoint':<34}{'count':>7}{'err':>6}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        print("-" * 86)
+        total = 0
+        for name in sorted(self.latencies):
+            samples = sorted(self.latencies[name])
+            total += len(samples)
+            print(f"{name:<34}{len(samples):>7}{self.errors[name]:>6}{len(samples) / wall_time:>9.1f}"
+                  f"{percentile(samples, 50):>10.1f}{percentile(samples, 95):>10.1f}{percentile(samples, 99):>10.1f}")
+        print("-" * 86)
+        print(f"{'TOTAL':<34}{total:>7}{sum(self.errors.values()):>6}{total / wall_time:>9.1f}")
+        print(f"\n⏱️  Wall time: {wall_time:.1f}s")
+
+
+def percentile(sorted_samples, pct):
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, int(round(pct / 100 * (len(sorted_samples) - 1))))
+    return sorted_samples[index] * 1000
+
+
+async def register_and_login(client, username, role, full_name):
+    password = "loadtest123"
+    await client.post("/api/auth/register", json={
+        "username": username, "password": password, "full_name": full_name, "role": role
+    })
+    response = await client.post("/api/auth/login", json={"username": username, "password": password})
+    response.raise_for_status()
+    data = response.json()
+    return {"Authorization": f"Bearer {data['token']}"}, data["user"]
+
+
+async def prepare_catalog(client, headers):
+    """Make sure there are services (with a BOM) to sell"""
+    services = (await client.get("/api/services", headers=headers)).json()
+    if services:
+        return services
+
+    item = (await client.post("/api/inventory", headers=headers, json={
+        "sku": f"LT-{uuid.uuid4().hex[:6]}", "name": "Load Test Shampoo", "category": "chemicals",
+        "unit": "liter", "current_stock": 1_000_000, "min_stock": 10, "max_stock": 2_000_000, "unit_cost": 50000
+    })).json()
+    for i, price in enumerate([50000, 75000, 100000, 160000, 350000]):
+        await client.post("/api/services", headers=headers, json={
+            "name": f"Load Test Wash {i + 1}", "price": price, "duration_minutes": 30, "category": "exterior",
+            "commission_rate": 10.0,
+            "bom": [{"inventory_id": item["id"], "inventory_name": item["name"], "quantity": 0.1, "unit": "liter"}]
+        })
+    return (await client.get("/api/services", headers=headers)).json()
+
+
+async def create_members(client, headers, count):
+    """Customers with monthly memberships; each can be scanned once today"""
+    phones = []
+    for _ in range(count):
+        phone = f"08{random.randint(10**9, 10**10 - 1)}"
+        customer = (await client.post("/api/customers", headers=headers, json={
+            "name": f"Load Test Member {phone[-4:]}", "phone": phone
+        })).json()
+        await client.post("/api/memberships", headers=headers, json={
+            "customer_id": customer["id"], "membership_type": "monthly", "price": 500000
+        })
+        phones.append(phone)
+    return phones
+
+
+async def run_terminal(client, recorder, index, services, member_phones, args):
+    headers, user = await register_and_login(client, f"loadtest_kasir_{index}", "kasir", f"Load Test Kasir {index}")
+
+    # A previous aborted run may have left a shift open
+    current = (await client.get("/api/shifts/current", headers=headers)).json()
+    if current:
+        await client.post("/api/shifts/close", headers=headers, json={"shift_id": current["id"], "closing_balance": 0})
+
+    response = await recorder.request(client, "POST /shifts/open", "POST", "/api/shifts/open", headers=headers,
+                                      json={"kasir_id": user["id"], "opening_balance": 500000})
+    if response is None or response.status_code != 200:
+        return
+    shift = response.json()
+
+    for _ in range(args.checkouts):
+        if member_phones and random.random() < args.member_ratio:
+            await recorder.request(client, "POST /memberships/use", "POST", "/api/memberships/use", headers=headers,
+                                   json={"phone": member_phones.pop(), "service_id": random.choice(services)["id"]})
+            continue
+
+        chosen = random.sample(services, k=min(len(services), random.randint(1, 3)))
+        items = [{"service_id": s["id"], "service_name": s["name"], "price": s["price"], "quantity": 1} for s in chosen]
+        total = sum(item["price"] for item in items)
+        await recorder.request(client, "POST /transactions", "POST", "/api/transactions", headers=headers, json={
+            "items": items, "payment_method": random.choice(["cash", "card", "qr"]), "payment_received": total
+        })
+        if args.think_time:
+            await asyncio.sleep(random.uniform(0, args.think_time))
+
+    await recorder.request(client, "GET /shifts/{id}/summary", "GET", f"/api/shifts/{shift['id']}/summary", headers=headers)
+    await recorder.request(client, "POST /shifts/close", "POST", "/api/shifts/close", headers=headers,
+                           json={"shift_id": shift["id"], "closing_balance": 500000})
+
+
+async def run_manager(client, recorder, index, done, args):
+    headers, _ = await register_and_login(client, f"loadtest_manager_{index}", "manager", f"Load Test Manager {index}")
+    reads = [
+        ("GET /dashboard/stats", "/api/dashboard/stats"),
+        ("GET /transactions/today", "/api/transactions/today"),
+        ("GET /transactions", "/api/transactions"),
+        ("GET /shifts", "/api/shifts"),
+        ("GET /inventory/low-stock", "/api/inventory/low-stock"),
+        ("GET /memberships", "/api/memberships"),
+        ("GET /expenses", "/api/expenses"),
+    ]
+    while not done.is_set():
+        name, url = random.choice(reads)
+        await recorder.request(client, name, "GET", url, headers=headers)
+        await asyncio.sleep(args.manager_interval)
+
+
+async def run_load_test(base_url, args):
+    limits = httpx.Limits(max_connections=args.terminals + args.managers + 5)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        print("🔧 Preparing catalog and members...")
+        setup_headers, _ = await register_and_login(client, "loadtest_manager_setup", "manager", "Load Test Setup")
+        services = await prepare_catalog(client, setup_headers)
+        member_phones = await create_members(client, setup_headers, args.members)
+
+        print(f"🚀 Running {args.terminals} terminals x {args.checkouts} checkouts, {args.managers} managers...")
+        recorder = LatencyRecorder()
+        done = asyncio.Event()
+        start = time.perf_counter()
+        managers = [asyncio.create_task(run_manager(client, recorder, i, done, args)) for i in range(args.managers)]
+        await asyncio.gather(*[
+            run_terminal(client, recorder, i, services, member_phones, args) for i in range(args.terminals)
+        ])
+        done.set()
+        await asyncio.gather(*managers)
+        recorder.report(time.perf_counter() - start)
+
+
+async def wait_for_server(base_url, timeout=30):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get("/")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.25)
+    raise RuntimeError(f"Server at {base_url} did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the car wash POS backend")
+    parser.add_argument("--url", help="Base URL of a running server (default: spawn one)")
+    parser.add_argument("--mongo-url", default=os.environ.get("MONGO_URL", "mongodb://127.0.0.1:27017"))
+    parser.add_argument("--db-name", default="carwash_loadtest", help="Database for the spawned server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the spawned server")
+    parser.add_argument("--terminals", type=int, default=10, help="Concurrent cashier terminals")
+    parser.add_argument("--checkouts", type=int, default=30, help="Checkouts per terminal")
+    parser.add_argument("--managers", type=int, default=2, help="Concurrent manager dashboards")
+    parser.add_argument("--members", type=int, default=20, help="Memberships available for scans")
+    parser.add_argument("--member-ratio", type=float, default=0.1, help="Share of checkouts that are member scans")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Max seconds between checkouts")
+    parser.add_argument("--manager-interval", type=float, default=0.2, help="Seconds between manager requests")
+    parser.add_argument("--keep-data", action="store_true", help="Do not drop the spawned server's database")
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.url
+    if base_url is None:
+        base_url = f"http://127.0.0.1:{args.port}"
+        env = dict(os.environ, MONGO_URL=args.mongo_url, DB_NAME=args.db_name)
+        print(f"🔌 Starting server on {base_url} (db: {args.db_name})")
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "server:app", "--port", str(args.port),
+             "--workers", str(args.workers), "--log-level", "warning"],
+            cwd=ROOT_DIR, env=env
+        )
+
+    try:
+        if server is not None:
+            asyncio.run(wait_for_server(base_url))
+        asyncio.run(run_load_test(base_url, args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+            if not args.keep_data:
+                from motor.motor_asyncio import AsyncIOMotorClient
+                asyncio.run(AsyncIOMotorClient(args.mongo_url).drop_database(args.db_name))
+                print(f"🧹 Dropped {args.db_name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Loop Monitor Module
+Measures event-loop lag continuously and reports callbacks that block the
+loop. A watchdog thread logs the loop thread's stack whenever the loop stops
+ticking for longer than a threshold. In debug mode, known blocking calls
+(bcrypt, requests, time.sleep, print) are flagged when made from the loop.
+"""
+
+import asyncio
+import builtins
+import functools
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+from metrics import Counter, Gauge, Histogram, registry
+
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+event_loop_lag = registry.register(Histogram(
+    "event_loop_lag_seconds", "Delay between scheduled and actual loop wake-ups", buckets=LAG_BUCKETS))
+event_loop_lag_last = registry.register(Gauge(
+    "event_loop_lag_last_seconds", "Most recent event loop lag measurement"))
+event_loop_blocked = registry.register(Counter(
+    "event_loop_blocked_total", "Times the event loop was blocked beyond the threshold"))
+blocking_calls = registry.register(Counter(
+    "event_loop_blocking_calls_total", "Known blocking calls made from the event loop thread", ("call",)))
+
+logger = logging.getLogger("loop_monitor")
+
+
+class LoopMonitor:
+    """Samples loop lag every interval and watches for stalls beyond threshold"""
+
+    def __init__(self, interval: float = 0.5, threshold: float = 0.1):
+        self.interval = interval
+        self.threshold = threshold
+        self._loop_thread_id: Optional[int] = None
+        self._last_tick = time.monotonic()
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    def start(self):
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._last_tick = time.monotonic()
+        self._stop_event.clear()
+        self._task = asyncio.get_running_loop().create_task(self._measure())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        self._stop_event.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _measure(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            self._last_tick = now
+            event_loop_lag.observe(lag)
+            event_loop_lag_last.set(lag)
+
+    def _watch(self):
+        reported_tick = None
+        # Check often enough to catch a stall shortly after it crosses the threshold
+        while not self._stop_event.wait(min(self.threshold, self.interval) / 2):
+            last_tick = self._last_tick
+            stalled = time.monotonic() - last_tick - self.interval
+            if stalled > self.threshold and reported_tick != last_tick:
+                reported_tick = last_tick
+                event_loop_blocked.inc()
+                frame = sys._current_frames().get(self._loop_thread_id)
+                stack = "".join(traceback.format_stack(frame)) if frame is not None else "<unavailable>"
+                logger.warning(f"Event loop blocked for over {stalled * 1000:.0f}ms; loop thread stack:\n{stack}")
+
+
+def _on_loop_thread() -> bool:
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+def _flag_blocking(name: str, func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _on_loop_thread():
+            blocking_calls.inc(name)
+            caller = "".join(traceback.format_stack(limit=6)[:-1])
+            logger.warning(f"Blocking call {name} made from the event loop thread:\n{caller}")
+        return func(*args, **kwargs)
+    wrapper._loop_monitor_original = func
+    return wrapper
+
+
+def install_blocking_call_detector():
+    """Debug mode: wrap known blocking calls so uses on the loop thread are logged"""
+    import bcrypt
+    targets = [(bcrypt, "hashpw"), (bcrypt, "checkpw"), (time, "sleep"), (builtins, "print")]
+    try:
+        import requests
+        targets.append((requests.Session, "request"))
+    except ImportError:
+        pass
+
+    for owner, attribute in targets:
+        func = getattr(owner, attribute)
+        if hasattr(func, "_loop_monitor_original"):
+            continue
+        name = f"{getattr(owner, '__name__', owner)}.{attribute}"
+        setattr(owner, attribute, _flag_blocking(name, func))
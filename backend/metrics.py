@@ -0,0 +1,209 @@
+"""
+Metrics Module
+Minimal Prometheus-compatible metrics: per-route HTTP latency histograms,
+status counters, in-flight gauge, and per-collection MongoDB command timings
+collected by a pymongo CommandListener.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+from pymongo import monitoring
+
+# Seconds; tuned for an API whose requests mostly take 1ms - 1s
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# ASGI scope of the request being served; Motor copies the context into its
+# executor threads, so command listeners can see which request issued a command
+current_scope: ContextVar[Optional[dict]] = ContextVar("current_scope", default=None)
+
+
+def current_route() -> str:
+    """Route template of the request issuing the current code, if any"""
+    scope = current_scope.get()
+    if scope is None:
+        return "-"
+    route = scope.get("route")
+    return getattr(route, "path", None) or scope.get("path", "-")
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    parts = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{name}="{escaped}"')
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, description: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        for label_values, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {value}")
+        return "\n".join(lines)
+
+
+class Gauge(Counter):
+    def dec(self, *label_values, amount: float = 1):
+        self.inc(*label_values, amount=-amount)
+
+    def set(self, value: float, *label_values):
+        with self._lock:
+            self._values[label_values] = value
+
+    def render(self) -> str:
+        return super().render().replace(f"# TYPE {self.name} counter", f"# TYPE {self.name} gauge")
+
+
+class Histogram:
+    def __init__(self, name: str, description: str, labels: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {k: (list(v[0]), v[1], v[2]) for k, v in self._series.items()}
+        for label_values, (counts, total, count) in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                labels = _format_labels(self.labels, label_values, 'le="%s"' % le)
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, label_values)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, label_values)} {count}")
+        return "\n".join(lines)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+
+registry = Registry()
+
+http_requests_total = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route and status", ("method", "route", "status")))
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route")))
+http_requests_in_progress = registry.register(Gauge(
+    "http_requests_in_progress", "HTTP requests currently being served"))
+mongodb_command_duration = registry.register(Histogram(
+    "mongodb_command_duration_seconds", "MongoDB command latency by collection", ("collection", "command")))
+mongodb_command_failures = registry.register(Counter(
+    "mongodb_command_failures_total", "Failed MongoDB commands by collection", ("collection", "command")))
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency, status and in-flight requests per route
+
+    exclude_paths are passed through unrecorded: a long-lived stream (SSE)
+    would count as one request in flight for hours and skew the latency
+    percentiles.
+    """
+
+    def __init__(self, app, exclude_paths: Tuple[str, ...] = ()):
+        self.app = app
+        self.exclude_paths = frozenset(exclude_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        status_holder = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder[0] = message["status"]
+            await send(message)
+
+        token = current_scope.set(scope)
+        http_requests_in_progress.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            current_scope.reset(token)
+            http_requests_in_progress.dec()
+            route = scope.get("route")
+            # Use the route template, not the raw path, to bound label cardinality
+            route_path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            http_request_duration.observe(duration, method, route_path)
+            http_requests_total.inc(method, route_path, str(status_holder[0]))
+
+
+def command_collection(command_name: str, command: Dict) -> str:
+    """Collection a command targets; most CRUD commands name it as their first value"""
+    if command_name == "getMore":
+        return command.get("collection", "-")
+    value = command.get(command_name)
+    if isinstance(value, str):
+        return value
+    return "-"  # e.g. ping
+
+
+class CommandMetricsListener(monitoring.CommandListener):
+    """Times MongoDB commands per collection; register on the client via event_listeners"""
+
+    def __init__(self):
+        self._pending: Dict[Tuple, str] = {}
+
+    def started(self, event):
+        self._pending[(event.connection_id, event.request_id)] = command_collection(event.command_name, event.command)
+
+    def succeeded(self, event):
+        collection = self._pending.pop((event.connection_id, event.request_id), "-")
+        mongodb_command_duration.observe(event.duration_micros / 1e6, collection, event.command_name)
+
+    def failed(self, event):
+        collection = self._pending.pop((event.connection_id, event.request_id), "-")
+        mongodb_command_duration.observe(event.duration_micros / 1e6, collection, event.command_name)
+        mongodb_command_failures.inc(collection, event.command_name)
+
+
+command_listener = CommandMetricsListener()
@@ -0,0 +1,139 @@
+"""
+Outlet Backfill Migration
+Stamps outlet_id on shifts, transactions, expenses, commission payouts,
+membership usage and inventory created before those documents carried it, so outlet-scoped lists,
+reports and the outlet_id-led indexes cover the whole history.
+
+Where the outlet comes from:
+  shifts:            the kasir's outlet
+  transactions:      their shift's outlet, else the kasir's outlet
+  membership_usage:  the kasir's outlet
+  expenses:          the outlet of the user who recorded them (created_by is a full name)
+  payouts:           the paid technician's outlet
+  inventory:         --default-outlet (stock items are not tied to a user)
+Whatever is still unassigned gets --default-outlet when it is given.
+Documents that already have an outlet_id are never changed, so the
+migration can be re-run safely.
+
+Usage:
+    python migrate_outlets.py --dry-run
+    python migrate_outlets.py
+    python migrate_outlets.py --default-outlet <outlet id>
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateMany
+
+from cache_bus import VERSIONS_COLLECTION
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+# MongoDB connection
+mongo_url = os.environ.get('MONGO_URL', 'mongodb://127.0.0.1:27017')
+db_name = os.environ.get('DB_NAME', 'carwash_db')
+
+client = AsyncIOMotorClient(mongo_url)
+db = client[db_name]
+
+COLLECTIONS = ("shifts", "transactions", "membership_usage", "expenses", "payouts", "inventory")
+
+# Matches both documents without the field and ones stamped with null
+UNASSIGNED = {"outlet_id": None}
+
+
+async def count_unassigned():
+    return {name: await db[name].count_documents(UNASSIGNED) for name in COLLECTIONS}
+
+
+async def stamp_by(collection, field, outlets_by_key, batch_size):
+    """One UpdateMany per key (kasir id, user name) -> that user's outlet"""
+    ops = [
+        UpdateMany({field: key, **UNASSIGNED}, {"$set": {"outlet_id": outlet_id}})
+        for key, outlet_id in outlets_by_key.items()
+    ]
+    for start in range(0, len(ops), batch_size):
+        await db[collection].bulk_write(ops[start:start + batch_size], ordered=False)
+
+
+async def publish_changes():
+    """Let running servers drop cached outlet P&Ls that now gain expenses and payouts (see cache_bus)"""
+    for collection in ("expenses", "payouts"):
+        await db[VERSIONS_COLLECTION].update_one({"_id": collection}, {"$inc": {"version": 1}}, upsert=True)
+
+
+async def stamp_transactions_from_shifts():
+    """Copy each shift's outlet_id onto its transactions, server-side"""
+    await db.transactions.aggregate([
+        {"$match": UNASSIGNED},
+        {"$lookup": {"from": "shifts", "localField": "shift_id", "foreignField": "id", "as": "shift"}},
+        {"$project": {"outlet_id": {"$first": "$shift.outlet_id"}}},
+        {"$match": {"outlet_id": {"$type": "string"}}},
+        {"$merge": {"into": "transactions", "on": "_id", "whenMatched": "merge", "whenNotMatched": "discard"}}
+    ]).to_list(None)
+
+
+async def run_migration(args):
+    print("🔍 Outlet backfill dry run (nothing will be written)" if args.dry_run else "🚀 Backfilling outlet_id")
+    print(f"📂 Database Name: {db_name}")
+    print("=" * 60)
+    started = time.perf_counter()
+
+    if args.default_outlet and not await db.outlets.find_one({"id": args.default_outlet}, {"_id": 1}):
+        print(f"❌ Outlet {args.default_outlet} not found")
+        return 2
+
+    users = await db.users.find(
+        {"outlet_id": {"$nin": [None, ""]}}, {"_id": 0, "id": 1, "full_name": 1, "outlet_id": 1}
+    ).to_list(None)
+    by_user_id = {u['id']: u['outlet_id'] for u in users}
+    by_user_name = {u['full_name']: u['outlet_id'] for u in users}
+    print(f"👥 {len(users)} users assigned to an outlet")
+
+    before = await count_unassigned()
+    if args.dry_run:
+        print(f"\n{'collection':<20}{'unassigned':>12}")
+        for name, count in before.items():
+            print(f"{name:<20}{count:>12}")
+        return 0
+
+    await stamp_by("shifts", "kasir_id", by_user_id, args.batch_size)
+    await stamp_transactions_from_shifts()
+    await stamp_by("transactions", "kasir_id", by_user_id, args.batch_size)
+    await stamp_by("membership_usage", "kasir_id", by_user_id, args.batch_size)
+    await stamp_by("expenses", "created_by", by_user_name, args.batch_size)
+    await stamp_by("payouts", "user_id", by_user_id, args.batch_size)
+    if args.default_outlet:
+        for name in COLLECTIONS:
+            await db[name].update_many(UNASSIGNED, {"$set": {"outlet_id": args.default_outlet}})
+    await publish_changes()
+
+    after = await count_unassigned()
+    print(f"\n{'collection':<20}{'stamped':>10}{'left':>10}")
+    for name in COLLECTIONS:
+        print(f"{name:<20}{before[name] - after[name]:>10}{after[name]:>10}")
+    print(f"\n⏱️  {time.perf_counter() - started:.1f}s")
+    if any(after.values()) and not args.default_outlet:
+        print("⚠️  Some documents have no outlet yet; re-run with --default-outlet to assign them")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill outlet_id on operational documents")
+    parser.add_argument("--dry-run", action="store_true", help="Only count unassigned documents")
+    parser.add_argument("--default-outlet", help="Outlet id for documents that cannot be traced to a user")
+    parser.add_argument("--batch-size", type=int, default=500, help="Updates per bulk_write")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run_migration(args)))
+
+
+if __name__ == "__main__":
+    main()
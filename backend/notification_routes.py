@@ -0,0 +1,170 @@
+"""
+Notification Routes
+WhatsApp receipts, membership expiry reminders and WhatsApp service status.
+Loaded on the first /api/notifications or /api/whatsapp request (see
+lazy_routes), so the WhatsApp helper and `requests` stay off the cold path.
+"""
+
+import logging
+from datetime import datetime, timezone, timedelta
+
+from fastapi import APIRouter, HTTPException, Depends
+from pydantic import BaseModel
+
+from server import db, get_current_user, User, TimedRoute
+from transaction_archive import find_transaction
+
+try:
+    from whatsapp_helper import whatsapp
+except Exception as e:
+    print(f"WARNING: WhatsApp helper could not be loaded: {e}")
+    class MockWhatsApp:
+        def get_status(self): return {"status": "offline", "whatsapp_ready": False}
+        def send_receipt(self, *args, **kwargs): return {"success": False, "error": "WhatsApp service unavailable"}
+        def send_message(self, *args, **kwargs): return {"success": False, "error": "WhatsApp service unavailable"}
+    whatsapp = MockWhatsApp()
+
+router = APIRouter(prefix="/api", route_class=TimedRoute)
+
+class NotificationService:
+    @staticmethod
+    async def send_whatsapp(phone: str, message: str):
+        # In production this would call an API like Twilio or WA Gateway
+        print(f"==========================================")
+        print(f"SIMULATED WA SEND to {phone}:")
+        print(f"{message}")
+        print(f"==========================================")
+        return True
+
+class SendReceiptRequest(BaseModel):
+    transaction_id: str
+    phone: str
+
+# Routes - Notifications (WhatsApp)
+@router.post("/notifications/send-receipt")
+async def send_receipt_notification(request: SendReceiptRequest, current_user: User = Depends(get_current_user)):
+    transaction = await find_transaction(db, {"id": request.transaction_id})
+    if not transaction:
+        raise HTTPException(status_code=404, detail="Transaction not found")
+    
+    # Format message
+    items_str = "\n".join([f"- {item.get('name', 'Item')} x{item['quantity']}" for item in transaction['items']])
+    message = f"""*OTOPIA Car Wash*
+Invoice: {transaction['invoice_number']}
+Tanggal: {transaction['created_at'].strftime('%d/%m/%Y %H:%M') if isinstance(transaction['created_at'], datetime) else transaction['created_at']}
+
+Detail:
+{items_str}
+
+Total: Rp {transaction['total']:,}
+Metode: {transaction['payment_method']}
+
+Terima kasih atas kunjungan Anda!"""
+
+    await NotificationService.send_whatsapp(request.phone, message)
+    return {"message": "Receipt sent to WhatsApp"}
+
+@router.post("/notifications/check-expiring")
+async def check_expiring_memberships_notification(current_user: User = Depends(get_current_user)):
+    # Find memberships expiring in exactly 3 days
+    now = datetime.now(timezone.utc)
+    target_date = now + timedelta(days=3)
+    start_of_day = target_date.replace(hour=0, minute=0, second=0, microsecond=0)
+    end_of_day = target_date.replace(hour=23, minute=59, second=59, microsecond=999)
+    
+    # This query is simplified; in reality stored dates might be strings or objects
+    # Assuming ISO format strings for simplicity based on previous code
+    
+    memberships = await db.memberships.find({
+        "status": "active",
+        "end_date": {"$gte": start_of_day.isoformat(), "$lte": end_of_day.isoformat()}
+    }).to_list(100)
+    
+    count = 0
+    for m in memberships:
+        customer = await db.customers.find_one({"id": m['customer_id']}, {"_id": 0})
+        if customer and customer.get('phone'):
+            msg = f"Halo {customer['name']}, Membership {m['membership_type']} Anda di OTOPIA akan berakhir pada {m['end_date']}. Segera perpanjang!"
+            await NotificationService.send_whatsapp(customer['phone'], msg)
+            count += 1
+            
+    return {"message": f"Sent {count} reminders"}
+
+# ============================================
+# WhatsApp Endpoints
+# ============================================
+
+@router.get("/whatsapp/status")
+async def get_whatsapp_status(current_user: User = Depends(get_current_user)):
+    """Get WhatsApp service connection status"""
+    try:
+        status = whatsapp.get_status()
+        return status
+    except Exception as e:
+        return {
+            "status": "error",
+            "whatsapp_ready": False,
+            "error": str(e)
+        }
+
+@router.post("/whatsapp/send-test")
+async def send_test_whatsapp(
+    phone: str,
+    message: str = "Test message from OTOPIA Car Wash POS",
+    current_user: User = Depends(get_current_user)
+):
+    """Send test WhatsApp message"""
+    if current_user.role not in ['owner', 'manager']:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    
+    try:
+        result = whatsapp.send_message(phone, message)
+        return result
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Duplicate return statement issue (line 1877), keeping only the latest config_data return
+# Removed: return {"message": f"Sent reminders to {count} customers"}
+
+# ============================================
+# Notifications Endpoints
+# ============================================
+
+@router.post("/notifications/send-receipt")
+async def send_receipt_notification(
+    request: SendReceiptRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """Send WhatsApp receipt for a transaction"""
+    try:
+        # Get transaction details
+        transaction = await find_transaction(db, {"id": request.transaction_id})
+        if not transaction:
+            raise HTTPException(status_code=404, detail="Transaction not found")
+        
+        # Prepare items for receipt
+        receipt_items = []
+        for item in transaction.get('items', []):
+            receipt_items.append({
+                'name': item.get('service_name', 'Unknown'),
+                'quantity': item.get('quantity', 1),
+                'price': item.get('price', 0)
+            })
+        
+        # Send via WhatsApp
+        result = whatsapp.send_receipt(
+            phone=request.phone,
+            transaction=transaction,
+            items=receipt_items
+        )
+        
+        if result.get('success'):
+            return {"success": True, "message": f"Receipt sent to {request.phone}"}
+        else:
+            raise HTTPException(status_code=500, detail=result.get('error', 'Failed to send WhatsApp'))
+            
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Failed to send receipt: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,137 @@
+"""
+Profiler Module
+On-demand request profiling. A request carrying `X-Profile: 1` from an
+authorized user runs under a sampling profiler that records the event-loop
+thread's stack every few milliseconds. The result is stored in collapsed-stack
+format ("frame;frame;frame count" lines), which flamegraph.pl and speedscope
+read directly. Requests without the header only pay for one header lookup.
+"""
+
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, Optional
+
+PROFILE_HEADER = b"x-profile"
+
+
+def frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler(threading.Thread):
+    """
+    Samples one thread's Python stack at a fixed interval
+
+    The event loop is shared, so samples can include other requests that ran
+    while this one was awaiting; profile on a quiet instance when possible.
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.002):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.sample_count = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(frame_label(frame))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(labels))] += 1
+            self.sample_count += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+    def top_functions(self, limit: int = 20) -> list:
+        """Leaf frames with the most samples (self time)"""
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return [{"function": name, "samples": count} for name, count in leaves.most_common(limit)]
+
+
+def _bearer_token(scope) -> Optional[str]:
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer":
+                return token
+    return None
+
+
+class ProfilerMiddleware:
+    """
+    ASGI middleware that profiles requests sending `X-Profile: 1`
+
+    authorize(token) returns the user id allowed to profile, or None.
+    store(profile) persists the finished profile document.
+    """
+
+    def __init__(self, app, authorize: Callable[[str], Optional[str]],
+                 store: Callable[[Dict], Awaitable[None]], interval: float = 0.002):
+        self.app = app
+        self.authorize = authorize
+        self.store = store
+        self.interval = interval
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not any(
+                name == PROFILE_HEADER and value == b"1" for name, value in scope["headers"]):
+            await self.app(scope, receive, send)
+            return
+
+        token = _bearer_token(scope)
+        user_id = self.authorize(token) if token else None
+        if user_id is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = str(uuid.uuid4())
+        status_holder = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder[0] = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        sampler = StackSampler(threading.get_ident(), self.interval)
+        sampler.start()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            sampler.stop()
+            route = scope.get("route")
+            await self.store({
+                "id": profile_id,
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": getattr(route, "path", None),
+                "status": status_holder[0],
+                "user_id": user_id,
+                "duration_ms": round(duration * 1000, 2),
+                "interval_ms": self.interval * 1000,
+                "sample_count": sampler.sample_count,
+                "top_functions": sampler.top_functions(),
+                "collapsed": sampler.collapsed(),
+                "created_at": datetime.now(timezone.utc)
+            })
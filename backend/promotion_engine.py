@@ -0,0 +1,114 @@
+"""
+Promotion Engine Module
+In-memory index of active promotions keyed by code, so validating a promo
+code at the POS does not need a database round trip or date parsing.
+"""
+
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional, Tuple
+
+from domain import promotion_discount
+
+
+class PromotionError(Exception):
+    """Raised when a promotion code cannot be applied"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _parse_date(value) -> datetime:
+    date = datetime.fromisoformat(value) if isinstance(value, str) else value
+    # Stored dates are UTC; treat naive values as UTC as well
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return date
+
+
+class CompiledPromotion:
+    """Promotion document with dates and limits pre-parsed for fast checks"""
+
+    __slots__ = ('doc', 'id', 'code', 'start_date', 'end_date', 'usage_limit',
+                 'usage_count', 'min_purchase', 'is_percentage', 'value', 'max_discount')
+
+    def __init__(self, doc: Dict):
+        self.doc = doc
+        self.id = doc['id']
+        self.code = doc['code']
+        self.start_date = _parse_date(doc['start_date'])
+        self.end_date = _parse_date(doc['end_date'])
+        self.usage_limit = doc.get('usage_limit')
+        self.usage_count = doc.get('usage_count', 0)
+        self.min_purchase = doc.get('min_purchase', 0)
+        self.is_percentage = doc['promotion_type'] == 'percentage'
+        self.value = doc['value']
+        self.max_discount = doc.get('max_discount')
+
+    def discount_for(self, subtotal: float) -> float:
+        return promotion_discount(self.is_percentage, self.value, subtotal, self.max_discount)
+
+
+class PromotionEngine:
+    """Holds compiled active promotions; reloaded whenever promotions change"""
+
+    def __init__(self):
+        self._by_code: Dict[str, CompiledPromotion] = {}
+        self.loaded = False
+
+    def load(self, docs: Iterable[Dict]):
+        """Replace the index with the given active promotion documents"""
+        by_code = {}
+        for doc in docs:
+            if doc.get('is_active', True):
+                by_code[doc['code']] = CompiledPromotion(doc)
+        self._by_code = by_code
+        self.loaded = True
+
+    def invalidate(self):
+        """Force a reload on next use"""
+        self.loaded = False
+
+    def get(self, code: str) -> Optional[CompiledPromotion]:
+        return self._by_code.get(code)
+
+    def record_usage(self, code: str, usage_count: int):
+        """Sync the cached usage count after a redemption"""
+        promo = self._by_code.get(code)
+        if promo:
+            promo.usage_count = usage_count
+            promo.doc['usage_count'] = usage_count
+
+    def validate(self, code: str, subtotal: float, now: Optional[datetime] = None) -> Tuple[Dict, float]:
+        """
+        Validate a promo code against a subtotal
+
+        Returns:
+            (promotion document, discount amount)
+
+        Raises:
+            PromotionError with the HTTP status and message to report
+        """
+        promo = self._by_code.get(code)
+        if promo is None:
+            raise PromotionError(404, "Invalid promotion code")
+
+        now = now or datetime.now(timezone.utc)
+        if now < promo.start_date:
+            raise PromotionError(400, "Promotion has not started yet")
+        if now > promo.end_date:
+            raise PromotionError(400, "Promotion expired")
+
+        # Check limit (authoritative check happens at redemption)
+        if promo.usage_limit is not None and promo.usage_count >= promo.usage_limit:
+            raise PromotionError(400, "Promotion usage limit reached")
+
+        if subtotal < promo.min_purchase:
+            raise PromotionError(400, f"Minimum purchase Rp {promo.min_purchase} required")
+
+        return promo.doc, promo.discount_for(subtotal)
+
+
+# Global instance
+promotion_engine = PromotionEngine()
@@ -0,0 +1,199 @@
+"""
+Query Log Module
+Logs MongoDB commands slower than a threshold, with collection, filter shape,
+duration and the API route that issued them. A sample of slow commands can be
+re-run through explain() to record whether they used an index (IXSCAN) or
+scanned the collection (COLLSCAN).
+"""
+
+import asyncio
+import json
+import logging
+import random
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import monitoring
+
+from metrics import command_collection, current_route
+
+# Commands whose plan can be inspected with explain
+EXPLAINABLE = {"find", "aggregate", "count", "distinct", "findAndModify", "update", "delete"}
+
+# Driver/session fields that must not be passed back into explain
+INTERNAL_FIELDS = {"lsid", "$db", "$clusterTime", "txnNumber", "$readPreference",
+                   "readConcern", "writeConcern", "autocommit", "startTransaction", "apiVersion"}
+
+
+def shape_of(value):
+    """Replace literal values with '?' so queries group by structure"""
+    if isinstance(value, dict):
+        return {k: shape_of(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [shape_of(v) for v in value[:3]]
+    return "?"
+
+
+def command_filter(command_name: str, command: Dict):
+    if command_name == "find":
+        return command.get("filter", {})
+    if command_name in ("count", "distinct", "findAndModify"):
+        return command.get("query", {})
+    if command_name == "aggregate":
+        return command.get("pipeline", [])
+    if command_name == "update":
+        return [u.get("q", {}) for u in command.get("updates", [])[:1]]
+    if command_name == "delete":
+        return [d.get("q", {}) for d in command.get("deletes", [])[:1]]
+    return None
+
+
+def plan_stages(explain_result) -> List[str]:
+    """Stage names of every winning plan found in an explain result"""
+    stages = []
+
+    def walk_plan(plan):
+        if isinstance(plan, dict):
+            if "stage" in plan:
+                stages.append(plan["stage"])
+            for key in ("inputStage", "queryPlan"):
+                walk_plan(plan.get(key))
+            for child in plan.get("inputStages", []):
+                walk_plan(child)
+
+    def find_winning(node):
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if key == "winningPlan":
+                    walk_plan(value)
+                else:
+                    find_winning(value)
+        elif isinstance(node, list):
+            for item in node:
+                find_winning(item)
+
+    find_winning(explain_result)
+    return stages
+
+
+def create_file_logger(path: str, max_bytes: int = 5 * 1024 * 1024, backup_count: int = 3) -> logging.Logger:
+    logger = logging.getLogger("slow_queries")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    if not logger.handlers:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count)
+        handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
+        logger.addHandler(handler)
+    return logger
+
+
+class SlowQueryListener(monitoring.CommandListener):
+    """Logs commands slower than threshold_ms; register on the client via event_listeners"""
+
+    def __init__(self, threshold_ms: float, explain_rate: float = 0.0, log_path: str = "slow_queries.log"):
+        self.threshold_ms = threshold_ms
+        self.explain_rate = explain_rate
+        self.log_path = log_path
+        self.logger: Optional[logging.Logger] = None
+        self._pending: Dict[Tuple, tuple] = {}
+        self._db = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._explain_queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold_ms > 0
+
+    def start(self, db):
+        """Open the log and, if sampling explains, start the explain worker"""
+        if not self.enabled:
+            return
+        self.logger = create_file_logger(self.log_path)
+        if self.explain_rate > 0 and db is not None and self._task is None:
+            self._db = db
+            self._loop = asyncio.get_running_loop()
+            self._explain_queue = asyncio.Queue(maxsize=100)
+            self._task = self._loop.create_task(self._explain_worker())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def started(self, event):
+        if not self.enabled or event.command_name == "explain":
+            return
+        # Change stream getMores wait on purpose; they are not slow queries
+        if event.command_name == "getMore" and "maxTimeMS" in event.command:
+            return
+        self._pending[(event.connection_id, event.request_id)] = (
+            event.command, event.database_name, current_route()
+        )
+
+    def succeeded(self, event):
+        self._finish(event, failed=False)
+
+    def failed(self, event):
+        self._finish(event, failed=True)
+
+    def _finish(self, event, failed: bool):
+        pending = self._pending.pop((event.connection_id, event.request_id), None)
+        if pending is None or self.logger is None:
+            return
+        duration_ms = event.duration_micros / 1000
+        if duration_ms < self.threshold_ms:
+            return
+
+        command, database_name, route = pending
+        command_name = event.command_name
+        entry = {
+            "type": "slow_command",
+            "collection": command_collection(command_name, command),
+            "command": command_name,
+            "duration_ms": round(duration_ms, 2),
+            "route": route,
+            "filter_shape": shape_of(command_filter(command_name, command)),
+            "failed": failed
+        }
+        self.logger.info(json.dumps(entry, default=str))
+
+        if (self._explain_queue is not None and command_name in EXPLAINABLE
+                and random.random() < self.explain_rate):
+            explain_command = {k: v for k, v in command.items() if k not in INTERNAL_FIELDS}
+            # Listener callbacks run on driver threads; hand off to the event loop
+            self._loop.call_soon_threadsafe(self._enqueue, (explain_command, database_name, entry))
+
+    def _enqueue(self, item):
+        try:
+            self._explain_queue.put_nowait(item)
+        except asyncio.QueueFull:
+            pass
+
+    async def _explain_worker(self):
+        while True:
+            explain_command, database_name, entry = await self._explain_queue.get()
+            try:
+                result = await self._db.client[database_name].command(
+                    {"explain": explain_command, "verbosity": "queryPlanner"}
+                )
+                stages = plan_stages(result)
+                self.logger.info(json.dumps({
+                    "type": "explain",
+                    "collection": entry["collection"],
+                    "command": entry["command"],
+                    "route": entry["route"],
+                    "filter_shape": entry["filter_shape"],
+                    "stages": stages,
+                    "collscan": "COLLSCAN" in stages
+                }, default=str))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.info(json.dumps({"type": "explain_error", "command": entry["command"], "error": str(e)}))
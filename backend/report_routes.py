@@ -0,0 +1,106 @@
+"""
+Report Routes
+Manager reports computed in the database (and, for forecasts, NumPy) instead
+of in the browser. Loaded on the first /api/reports request (see lazy_routes).
+"""
+
+from datetime import datetime, timezone
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Depends
+
+from server import db, get_current_user, outlet_scope, query_datetime, User, UserRole, TimedRoute
+from reports import PERIODS, commission_report, profit_and_loss
+from transaction_archive import ArchiveError, month_bounds
+
+router = APIRouter(prefix="/api", route_class=TimedRoute)
+
+MAX_FORECAST_DAYS = 366
+
+def require_manager(current_user: User):
+    if current_user.role not in [UserRole.OWNER, UserRole.MANAGER]:
+        raise HTTPException(status_code=403, detail="Only owner or manager can view reports")
+
+def report_range(start: Optional[str], end: Optional[str]):
+    """[start, end) from the query, defaulting to the current month"""
+    month_start, month_end = month_bounds(datetime.now(timezone.utc).strftime("%Y-%m"))
+    start = query_datetime(start) if start else month_start
+    end = query_datetime(end) if end else month_end
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    return start, end
+
+def check_period(period: str):
+    if period not in PERIODS:
+        raise HTTPException(status_code=400, detail=f"period must be one of: {', '.join(PERIODS)}")
+
+# Routes - Reports
+@router.get("/reports/reorder")
+async def get_reorder_plan(
+    days: int = 90,
+    lead_time_days: float = 7,
+    cover_days: float = 14,
+    service_level: float = 0.95,
+    current_user: User = Depends(get_current_user),
+    scope: dict = Depends(outlet_scope)
+):
+    """
+    Days of cover and suggested order quantities per item, from the last
+    `days` of sales, membership washes and manual stock removals
+    """
+    require_manager(current_user)
+    if not 0.5 <= service_level < 1:
+        raise HTTPException(status_code=400, detail="service_level must be between 0.5 and 1")
+    if lead_time_days < 0 or cover_days < 0:
+        raise HTTPException(status_code=400, detail="lead_time_days and cover_days cannot be negative")
+    try:
+        from forecast import forecast_reorders
+    except ImportError:
+        raise HTTPException(status_code=503, detail="Reorder planning needs numpy: pip install numpy")
+    try:
+        return await forecast_reorders(
+            db, scope, max(7, min(days, MAX_FORECAST_DAYS)), lead_time_days, cover_days, service_level
+        )
+    except ArchiveError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@router.get("/reports/commissions")
+async def get_commission_report(
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    period: str = "month",
+    technician_id: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    scope: dict = Depends(outlet_scope)
+):
+    """Commission earned per technician and period, less payouts made (default: this month)"""
+    # Technicians only see their own commission
+    if current_user.role == UserRole.TEKNISI:
+        technician_id = current_user.id
+    else:
+        require_manager(current_user)
+    check_period(period)
+    start, end = report_range(start, end)
+    try:
+        return await commission_report(db, start, end, period, scope, technician_id)
+    except ArchiveError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@router.get("/reports/profit-and-loss")
+async def get_profit_and_loss(
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    period: str = "month",
+    current_user: User = Depends(get_current_user),
+    scope: dict = Depends(outlet_scope)
+):
+    """Revenue, COGS (fixed at sale time), expenses and payouts per period (default: this month)"""
+    require_manager(current_user)
+    check_period(period)
+    start, end = report_range(start, end)
+    try:
+        return await profit_and_loss(
+            db, datetime.fromisoformat(start), datetime.fromisoformat(end), period, scope
+        )
+    except ArchiveError as e:
+        raise HTTPException(status_code=409, detail=str(e))
@@ -0,0 +1,261 @@
+"""
+Reports Module
+Aggregation pipelines behind report_routes. Dates are stored as ISO strings
+(UTC), so periods are cut from the string itself (day, month) or, for
+weeks, from the parsed date truncated to Monday.
+"""
+
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from cache_helper import TTLCache
+from transaction_archive import HOT_COLLECTION, union_pipeline
+
+PERIODS = ("day", "week", "month")
+
+# Expenses recorded for a commission payout (older ones only by their
+# description); the P&L counts those under payouts instead
+PAYOUT_EXPENSES = [{"payout_id": {"$ne": None}}, {"description": {"$regex": "^Commission Payout for"}}]
+
+# P&L rows of periods that have ended; evicted early when expenses or
+# payouts are written (see server cache_bus), since those can be backdated
+closed_periods_cache = TTLCache(ttl=3600)
+
+
+def period_start(moment: datetime, period: str) -> datetime:
+    """Start of the (UTC) day, week or month containing moment"""
+    start = moment.astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == "month":
+        return start.replace(day=1)
+    if period == "week":
+        return start - timedelta(days=start.weekday())
+    return start
+
+
+def next_period(start: datetime, period: str) -> datetime:
+    if period == "month":
+        return start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+    return start + timedelta(days=7 if period == "week" else 1)
+
+
+def period_key(start: datetime, period: str) -> str:
+    """The key period_expr gives for dates in the period starting at start"""
+    return start.strftime("%Y-%m" if period == "month" else "%Y-%m-%d")
+
+
+def period_expr(field: str, period: str) -> Dict:
+    """Aggregation expression for the period key (YYYY-MM-DD or YYYY-MM) of an ISO date field"""
+    if period == "month":
+        return {"$substrCP": [f"${field}", 0, 7]}
+    if period == "week":
+        return {"$dateToString": {"format": "%Y-%m-%d", "date": {
+            "$dateTrunc": {"date": {"$toDate": f"${field}"}, "unit": "week", "startOfWeek": "monday"}
+        }}}
+    return {"$substrCP": [f"${field}", 0, 10]}
+
+
+async def commission_report(db, start: str, end: str, period: str = "month", scope: Optional[Dict] = None,
+                            technician_id: Optional[str] = None) -> Dict:
+    """
+    Commission earned per technician and period in [start, end), less the
+    payouts made to them in the same range
+    """
+    # Served by the (items.technician_id, outlet_id, created_at) index
+    technician = technician_id if technician_id else {"$type": "string"}
+    pipeline = await union_pipeline(db, {"items.technician_id": technician, **(scope or {})}, start, end)
+    pipeline += [
+        {"$project": {"_id": 0, "created_at": 1, "items.technician_id": 1, "items.commission_amount": 1,
+                      "items.price": 1, "items.quantity": 1}},
+        {"$unwind": "$items"},
+        {"$match": {"items.technician_id": technician}},
+        {"$group": {
+            "_id": {"technician_id": "$items.technician_id", "period": period_expr("created_at", period)},
+            "earned": {"$sum": {"$ifNull": ["$items.commission_amount", 0]}},
+            "revenue": {"$sum": {"$multiply": ["$items.price", "$items.quantity"]}},
+            "items": {"$sum": "$items.quantity"}
+        }}
+    ]
+    earned = await db[HOT_COLLECTION].aggregate(pipeline).to_list(None)
+
+    # Older payouts carry no outlet; within an outlet, count its technicians' payouts
+    payout_match = {"date": {"$gte": start, "$lt": end}}
+    if technician_id:
+        payout_match["user_id"] = technician_id
+    elif scope:
+        payout_match["user_id"] = {"$in": list({row["_id"]["technician_id"] for row in earned})}
+    paid = await db.payouts.aggregate([
+        {"$match": payout_match},
+        {"$group": {"_id": {"technician_id": "$user_id", "period": period_expr("date", period)},
+                    "paid": {"$sum": "$amount"}}}
+    ]).to_list(None)
+
+    periods: Dict[str, Dict[str, Dict]] = defaultdict(dict)
+    for row in earned:
+        periods[row["_id"]["technician_id"]][row["_id"]["period"]] = {
+            "period": row["_id"]["period"], "earned": row["earned"], "revenue": row["revenue"],
+            "items": row["items"], "paid": 0.0
+        }
+    for row in paid:
+        entry = periods[row["_id"]["technician_id"]].setdefault(row["_id"]["period"], {
+            "period": row["_id"]["period"], "earned": 0.0, "revenue": 0.0, "items": 0, "paid": 0.0
+        })
+        entry["paid"] = row["paid"]
+
+    names = {
+        user["id"]: user.get("full_name")
+        async for user in db.users.find({"id": {"$in": list(periods)}}, {"_id": 0, "id": 1, "full_name": 1})
+    }
+    technicians: List[Dict] = []
+    for tech_id, by_period in periods.items():
+        rows = [by_period[key] for key in sorted(by_period)]
+        earned_total = round(sum(r["earned"] for r in rows), 2)
+        paid_total = round(sum(r["paid"] for r in rows), 2)
+        technicians.append({
+            "technician_id": tech_id,
+            "technician_name": names.get(tech_id),
+            "earned": earned_total,
+            "paid": paid_total,
+            "balance": round(earned_total - paid_total, 2),
+            "periods": rows
+        })
+    technicians.sort(key=lambda t: -t["balance"])
+
+    return {
+        "start": start,
+        "end": end,
+        "period": period,
+        "technicians": technicians,
+        "totals": {
+            "earned": round(sum(t["earned"] for t in technicians), 2),
+            "paid": round(sum(t["paid"] for t in technicians), 2),
+            "balance": round(sum(t["balance"] for t in technicians), 2)
+        }
+    }
+
+
+# Profit and loss
+
+async def profit_and_loss_rows(db, start: str, end: str, period: str, scope: Dict) -> Dict[str, Dict]:
+    """
+    Period key -> revenue, COGS, expenses and payouts in [start, end), from
+    one pipeline: transactions (hot and archived), membership washes,
+    expenses and payouts are unioned into one stream, then $facet groups
+    it per period and per expense category
+    """
+    def dated(field: str) -> Dict:
+        return {field: {"$gte": start, "$lt": end}, **scope}
+
+    pipeline = await union_pipeline(db, dict(scope), start, end)
+    pipeline += [
+        {"$project": {"_id": 0, "at": "$created_at", "revenue": "$total", "discounts": "$discount_amount",
+                      "cogs": "$cogs", "transactions": {"$literal": 1}}},
+        # COGS of membership washes; their revenue is the membership sale
+        {"$unionWith": {"coll": "membership_usage", "pipeline": [
+            {"$match": dated("used_at")},
+            {"$project": {"_id": 0, "at": "$used_at", "cogs": "$cogs", "washes": {"$literal": 1}}}
+        ]}},
+        {"$unionWith": {"coll": "expenses", "pipeline": [
+            {"$match": {**dated("date"), "$nor": PAYOUT_EXPENSES}},
+            {"$project": {"_id": 0, "at": "$date", "expenses": "$amount", "category": 1}}
+        ]}},
+        {"$unionWith": {"coll": "payouts", "pipeline": [
+            {"$match": dated("date")},
+            {"$project": {"_id": 0, "at": "$date", "payouts": "$amount"}}
+        ]}},
+        {"$set": {"period": period_expr("at", period)}},
+        {"$facet": {
+            "periods": [{"$group": {
+                "_id": "$period",
+                "revenue": {"$sum": "$revenue"},
+                "discounts": {"$sum": "$discounts"},
+                "cogs": {"$sum": "$cogs"},
+                "expenses": {"$sum": "$expenses"},
+                "payouts": {"$sum": "$payouts"},
+                "transactions": {"$sum": "$transactions"},
+                "washes": {"$sum": "$washes"}
+            }}],
+            "expense_categories": [
+                {"$match": {"expenses": {"$exists": True}}},
+                {"$group": {"_id": {"period": "$period", "category": "$category"}, "amount": {"$sum": "$expenses"}}}
+            ]
+        }}
+    ]
+    result = (await db[HOT_COLLECTION].aggregate(pipeline).to_list(None))[0]
+
+    rows = {}
+    for row in result["periods"]:
+        key = row.pop("_id")
+        rows[key] = {**row, "expense_categories": {}}
+    for row in result["expense_categories"]:
+        rows[row["_id"]["period"]]["expense_categories"][row["_id"]["category"] or "Lainnya"] = row["amount"]
+    return rows
+
+
+def profit_and_loss_line(row: Dict) -> Dict:
+    revenue, cogs = row.get("revenue", 0), row.get("cogs", 0)
+    expenses, payouts = row.get("expenses", 0), row.get("payouts", 0)
+    return {
+        "revenue": round(revenue, 2),
+        "discounts": round(row.get("discounts", 0), 2),
+        "cogs": round(cogs, 2),
+        "gross_profit": round(revenue - cogs, 2),
+        "expenses": round(expenses, 2),
+        "payouts": round(payouts, 2),
+        "net_profit": round(revenue - cogs - expenses - payouts, 2),
+        "transactions": row.get("transactions", 0),
+        "washes": row.get("washes", 0),
+        "expense_categories": dict(row.get("expense_categories", {}))
+    }
+
+
+async def profit_and_loss(db, start: datetime, end: datetime, period: str = "month",
+                          scope: Optional[Dict] = None, now: Optional[datetime] = None) -> Dict:
+    """
+    P&L per period over whole periods covering [start, end). Periods that
+    have ended are served from closed_periods_cache; only the current one
+    is aggregated on every request.
+
+    Outlet P&Ls include payouts recorded with that outlet; older payouts
+    get the paid technician's outlet from migrate_outlets.
+    """
+    scope = scope or {}
+    first = period_start(start, period)
+    last = period_start(end, period)
+    if last < end:
+        last = next_period(last, period)
+    closed_until = min(last, period_start(now or datetime.now(timezone.utc), period))
+
+    rows: Dict[str, Dict] = {}
+    if first < closed_until:
+        cache_key = (scope.get("outlet_id"), period, first.isoformat(), closed_until.isoformat())
+        rows.update(await closed_periods_cache.get_or_compute(
+            cache_key, lambda: profit_and_loss_rows(db, first.isoformat(), closed_until.isoformat(), period, scope)
+        ))
+    open_from = max(first, closed_until)
+    if open_from < last:
+        rows.update(await profit_and_loss_rows(db, open_from.isoformat(), last.isoformat(), period, scope))
+
+    periods = []
+    moment = first
+    while moment < last:
+        key = period_key(moment, period)
+        periods.append({"period": key, "closed": moment < closed_until, **profit_and_loss_line(rows.get(key, {}))})
+        moment = next_period(moment, period)
+
+    totals = defaultdict(int)
+    categories: Dict[str, float] = defaultdict(float)
+    for row in rows.values():
+        for field in ("revenue", "discounts", "cogs", "expenses", "payouts", "transactions", "washes"):
+            totals[field] += row.get(field, 0)
+        for category, amount in row["expense_categories"].items():
+            categories[category] += amount
+    totals["expense_categories"] = dict(categories)
+
+    return {
+        "start": first.isoformat(),
+        "end": last.isoformat(),
+        "period": period,
+        "periods": periods,
+        "totals": profit_and_loss_line(totals)
+    }
@@ -0,0 +1,102 @@
+"""
+Production Server Launcher
+Runs server:app under uvicorn with one worker process per core, the fastest
+event loop and HTTP parser that are installed, graceful draining on shutdown
+and worker recycling after a number of requests.
+
+Usage:
+    python run_server.py                        # one worker per CPU core on :8000
+    python run_server.py --workers 4 --port 8080
+    WEB_CONCURRENCY=4 MAX_REQUESTS=10000 python run_server.py
+
+Every worker imports the app and runs its own startup hooks (indexes,
+promotion cache, cache bus, pool warm-up) and owns its own MongoDB pool, so
+the database sees up to workers x MONGO_MAX_POOL_SIZE connections.
+Live dashboards are held per worker too; a sale, membership or stock alert
+recorded by one worker reaches dashboards connected to the others through
+the cache bus, about a second later (plus CACHE_POLL_INTERVAL when MongoDB
+has no change streams).
+
+SIGTERM/SIGINT stop accepting connections, let in-flight requests finish for
+up to --graceful-timeout seconds, then run the shutdown hooks. SIGHUP
+restarts the workers one by one; SIGTTIN/SIGTTOU add or remove a worker.
+"""
+
+import argparse
+import importlib.util
+import os
+import sys
+from pathlib import Path
+
+import uvicorn
+
+ROOT_DIR = Path(__file__).parent
+
+
+def fastest_loop() -> str:
+    """uvloop where it is installed (it does not support Windows)"""
+    if sys.platform != "win32" and importlib.util.find_spec("uvloop"):
+        return "uvloop"
+    return "asyncio"
+
+
+def fastest_http() -> str:
+    return "httptools" if importlib.util.find_spec("httptools") else "h11"
+
+
+def env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the car wash POS backend with multiple workers")
+    parser.add_argument("--host", default=os.environ.get("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=env_int("PORT", 8000))
+    parser.add_argument("--workers", type=int, default=env_int("WEB_CONCURRENCY", os.cpu_count() or 1),
+                        help="Worker processes (default: WEB_CONCURRENCY or the CPU count)")
+    parser.add_argument("--max-requests", type=int, default=env_int("MAX_REQUESTS", 0),
+                        help="Recycle a worker after this many requests (0 = never)")
+    parser.add_argument("--max-requests-jitter", type=int, default=env_int("MAX_REQUESTS_JITTER", 0),
+                        help="Random extra requests per worker so they do not all recycle at once")
+    parser.add_argument("--graceful-timeout", type=int, default=env_int("GRACEFUL_TIMEOUT", 30),
+                        help="Seconds in-flight requests get to finish on shutdown")
+    parser.add_argument("--keep-alive", type=int, default=env_int("KEEP_ALIVE", 5),
+                        help="Seconds to hold idle keep-alive connections")
+    parser.add_argument("--backlog", type=int, default=env_int("BACKLOG", 2048))
+    parser.add_argument("--log-level", default=os.environ.get("LOG_LEVEL", "info"))
+    parser.add_argument("--no-access-log", action="store_true", help="Skip per-request access log lines")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    loop, http = fastest_loop(), fastest_http()
+    workers = max(args.workers, 1)
+
+    print(f"🚀 Starting OTOPIA Car Wash Backend on {args.host}:{args.port}")
+    print(f"   {workers} worker(s), loop={loop}, http={http}, "
+          f"max_requests={args.max_requests or 'unlimited'}, graceful_timeout={args.graceful_timeout}s")
+
+    uvicorn.run(
+        "server:app",
+        app_dir=str(ROOT_DIR),
+        host=args.host,
+        port=args.port,
+        workers=workers,
+        loop=loop,
+        http=http,
+        lifespan="on",
+        limit_max_requests=args.max_requests or None,
+        limit_max_requests_jitter=args.max_requests_jitter,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        timeout_keep_alive=args.keep_alive,
+        backlog=args.backlog,
+        proxy_headers=True,
+        log_level=args.log_level,
+        access_log=not args.no_access_log,
+    )
+
+
+if __name__ == "__main__":
+    main()
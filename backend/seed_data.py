@@ -1,3 +1,4 @@
+import argparse
 import asyncio
 from motor.motor_asyncio import AsyncIOMotorClient
 import bcrypt
@@ -258,6 +259,7 @@ async def seed_data():
     for item in inventory_items:
         existing = await db.inventory.find_one({"sku": item["sku"]})
         if not existing:
+            item["is_low_stock"] = item["current_stock"] <= item["min_stock"]
             await db.inventory.insert_one(item)
             print(f"✅ Inventory item created: {item['name']}")
             # Save IDs
@@ -1059,5 +1061,433 @@ async def seed_data():
     print("  🟠 Pengharum Coffee: 5 pcs (min 10 pcs)")
     print("\n" + "=" * 60)
 
+# ========================================
+# SYNTHETIC HISTORY GENERATOR (benchmarking)
+# ========================================
+
+FIRST_NAMES = ["Andi", "Budi", "Citra", "Dewi", "Eko", "Fajar", "Gita", "Hadi", "Indah", "Joko",
+               "Kartika", "Lukman", "Maya", "Nanda", "Oki", "Putri", "Rizky", "Sari", "Teguh", "Wulan"]
+LAST_NAMES = ["Wijaya", "Santoso", "Pratama", "Saputra", "Kusuma", "Hidayat", "Lestari", "Nugroho",
+              "Setiawan", "Permana", "Halim", "Gunawan", "Siregar", "Sihombing", "Utami"]
+VEHICLE_TYPES = ["sedan", "suv", "mpv", "pickup", "hatchback"]
+PAYMENT_METHODS = ["cash", "card", "qr"]
+PAYMENT_WEIGHTS = [55, 15, 30]
+MEMBERSHIP_PLANS = {  # type: (days, price)
+    "monthly": (30, 500000),
+    "quarterly": (90, 1350000),
+    "biannual": (180, 2500000),
+    "annual": (365, 4500000),
+}
+MEMBERSHIP_WEIGHTS = [50, 25, 15, 10]
+EXPENSE_CATEGORIES = ["utilities", "supplies", "maintenance", "rent", "marketing"]
+SHIFT_HOURS = [(7, 15), (15, 22)]  # one shift per kasir per day, local time
+WIB = timezone(timedelta(hours=7))
+
+
+def seeded_id(rng: random.Random) -> str:
+    """uuid4-shaped id drawn from the generator's RNG, so reruns produce the same ids"""
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def utc_iso(moment: datetime) -> str:
+    return moment.astimezone(timezone.utc).isoformat()
+
+
+class BatchWriter:
+    """
+    Buffers generated documents per collection and writes them with
+    insert_many in fixed-size batches, keeping up to `parallel` batches in
+    flight. Generation waits while every writer is busy, so memory stays flat.
+    """
+
+    def __init__(self, database, batch_size: int = 5000, parallel: int = 4):
+        self.db = database
+        self.batch_size = batch_size
+        self.buffers = {}
+        self.counts = {}
+        self.error = None
+        self.queue = asyncio.Queue(maxsize=parallel)
+        self.workers = [asyncio.create_task(self._worker()) for _ in range(parallel)]
+
+    async def add(self, collection: str, doc: dict):
+        if self.error is not None:
+            raise self.error
+        buffer = self.buffers.setdefault(collection, [])
+        buffer.append(doc)
+        if len(buffer) >= self.batch_size:
+            self.buffers[collection] = []
+            await self.queue.put((collection, buffer))
+
+    async def _worker(self):
+        while True:
+            item = await self.queue.get()
+            if item is None:
+                return
+            if self.error is not None:
+                continue  # keep draining so producers never block on a dead writer
+            collection, docs = item
+            try:
+                await self.db[collection].insert_many(docs, ordered=False)
+                self.counts[collection] = self.counts.get(collection, 0) + len(docs)
+            except Exception as e:
+                self.error = e
+
+    async def close(self):
+        for collection, docs in self.buffers.items():
+            if docs:
+                await self.queue.put((collection, docs))
+        self.buffers = {}
+        for _ in self.workers:
+            await self.queue.put(None)
+        await asyncio.gather(*self.workers)
+        if self.error is not None:
+            raise self.error
+
+
+async def load_catalog():
+    """Active services (with BOM cost) and products created by the regular seed"""
+    unit_costs = {
+        item["id"]: item.get("unit_cost", 0)
+        for item in await db.inventory.find({}, {"_id": 0, "id": 1, "unit_cost": 1}).to_list(None)
+    }
+    services = [
+        {
+            "id": s["id"], "name": s["name"], "price": s["price"],
+            "commission_rate": s.get("commission_rate", 0),
+            "cost": sum(unit_costs.get(b["inventory_id"], 0) * b["quantity"] for b in s.get("bom", []))
+        }
+        for s in await db.services.find({"is_active": True}, {"_id": 0}).to_list(None)
+    ]
+    products = [
+        {"id": p["id"], "name": p["name"], "price": p["price"], "cost": unit_costs.get(p.get("inventory_id"), 0)}
+        for p in await db.products.find({"is_active": True}, {"_id": 0}).to_list(None)
+    ]
+    return services, products
+
+
+async def generate_outlets(writer, rng, count, created_at):
+    """Outlets, each staffed by two kasir (one per shift) and three teknisi"""
+    password_hash = hash_password("bench123")
+    outlets = []
+    for o in range(count):
+        outlet = {
+            "id": seeded_id(rng),
+            "name": f"OTOPIA Bench {o + 1:02d}",
+            "address": f"Jl. Benchmark No. {o + 1}, Jakarta",
+            "phone": f"021-7{o:06d}",
+            "manager_name": f"Manager Bench {o + 1}",
+            "is_active": True,
+            "created_at": created_at
+        }
+        await writer.add("outlets", dict(outlet))
+        for role, per_outlet in (("kasir", len(SHIFT_HOURS)), ("teknisi", 3)):
+            outlet[role] = []
+            for k in range(per_outlet):
+                user = {
+                    "id": seeded_id(rng),
+                    "username": f"bench_{role}_{o + 1}_{k + 1}",
+                    "password_hash": password_hash,
+                    "full_name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                    "email": None,
+                    "role": role,
+                    "phone": None,
+                    "outlet_id": outlet["id"],
+                    "outlet_name": outlet["name"],
+                    "is_active": True,
+                    "created_at": created_at
+                }
+                await writer.add("users", user)
+                outlet[role].append({"id": user["id"], "name": user["full_name"]})
+        outlets.append(outlet)
+    return outlets
+
+
+def new_customers(rng, count):
+    """Customers kept as parallel lists; dicts for hundreds of thousands would dominate memory"""
+    return {
+        "id": [seeded_id(rng) for _ in range(count)],
+        "name": [f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}" for _ in range(count)],
+        "visits": [0] * count,
+        "spending": [0.0] * count,
+        "first_seen": [None] * count
+    }
+
+
+async def generate_day(writer, rng, day, outlets, services, products, customers, tx_per_day):
+    """One day of shifts, transactions and expenses for every outlet"""
+    invoice_prefix = day.strftime("%Y%m%d")
+    invoice_seq = 0
+    transactions = 0
+    for outlet in outlets:
+        for kasir, (open_hour, close_hour) in zip(outlet["kasir"], SHIFT_HOURS):
+            shift_id = seeded_id(rng)
+            opened_at = day.replace(hour=open_hour)
+            opening_balance = 500000
+            cash_sales = 0.0
+            per_shift = tx_per_day / len(SHIFT_HOURS)
+            for _ in range(rng.randint(int(per_shift * 0.6), int(per_shift * 1.4))):
+                created_at = opened_at + timedelta(seconds=rng.randrange((close_hour - open_hour) * 3600))
+                technician = rng.choice(outlet["teknisi"])
+                items = []
+                cogs = 0.0
+                for service in rng.sample(services, k=min(len(services), rng.choices([1, 2, 3], [70, 22, 8])[0])):
+                    items.append({
+                        "type": "service",
+                        "service_id": service["id"],
+                        "service_name": service["name"],
+                        "price": service["price"],
+                        "quantity": 1,
+                        "subtotal": service["price"],
+                        "technician_id": technician["id"],
+                        "technician_name": technician["name"],
+                        "commission_amount": service["price"] * service["commission_rate"] / 100
+                    })
+                    cogs += service["cost"]
+                if products and rng.random() < 0.15:
+                    product = rng.choice(products)
+                    quantity = rng.randint(1, 2)
+                    items.append({
+                        "type": "product",
+                        "product_id": product["id"],
+                        "product_name": product["name"],
+                        "price": product["price"],
+                        "quantity": quantity,
+                        "subtotal": product["price"] * quantity,
+                        "commission_amount": 0.0
+                    })
+                    cogs += product["cost"] * quantity
+
+                total = sum(item["subtotal"] for item in items)
+                payment_method = rng.choices(PAYMENT_METHODS, PAYMENT_WEIGHTS)[0]
+                payment_received = -(-total // 50000) * 50000 if payment_method == "cash" else total
+                if payment_method == "cash":
+                    cash_sales += total
+
+                customer_id = customer_name = None
+                if rng.random() < 0.6:
+                    c = rng.randrange(len(customers["id"]))
+                    customer_id, customer_name = customers["id"][c], customers["name"][c]
+                    customers["visits"][c] += 1
+                    customers["spending"][c] += total
+                    if customers["first_seen"][c] is None:
+                        customers["first_seen"][c] = created_at
+
+                invoice_seq += 1
+                await writer.add("transactions", {
+                    "id": seeded_id(rng),
+                    "invoice_number": f"INV-{invoice_prefix}-{str(invoice_seq).zfill(4)}",
+                    "kasir_id": kasir["id"],
+                    "kasir_name": kasir["name"],
+                    "outlet_id": outlet["id"],
+                    "customer_id": customer_id,
+                    "customer_name": customer_name,
+                    "shift_id": shift_id,
+                    "items": items,
+                    "subtotal": total,
+                    "total": total,
+                    "payment_method": payment_method,
+                    "payment_received": payment_received,
+                    "change_amount": payment_received - total,
+                    "cogs": cogs,
+                    "gross_margin": total - cogs,
+                    "total_commission": sum(item["commission_amount"] for item in items),
+                    "promo_code": None,
+                    "discount_amount": 0.0,
+                    "notes": None,
+                    "created_at": utc_iso(created_at)
+                })
+                transactions += 1
+
+            petty_cash = rng.choice([0, 0, 0, 20000, 50000])
+            expected_balance = opening_balance + cash_sales - petty_cash
+            closing_balance = expected_balance + rng.choice([0, 0, 0, 0, -5000, 5000, -10000])
+            await writer.add("shifts", {
+                "id": shift_id,
+                "kasir_id": kasir["id"],
+                "kasir_name": kasir["name"],
+                "outlet_id": outlet["id"],
+                "opening_balance": opening_balance,
+                "opening_denominations": None,
+                "closing_balance": closing_balance,
+                "closing_denominations": None,
+                "petty_cash_total": petty_cash,
+                "cash_drop_total": 0,
+                "expected_balance": expected_balance,
+                "variance": closing_balance - expected_balance,
+                "opened_at": utc_iso(opened_at),
+                "closed_at": utc_iso(day.replace(hour=close_hour)),
+                "status": "closed",
+                "notes": None
+            })
+
+        if rng.random() < 0.3:
+            await writer.add("expenses", {
+                "id": seeded_id(rng),
+                "date": utc_iso(day.replace(hour=12)),
+                "category": rng.choice(EXPENSE_CATEGORIES),
+                "amount": rng.randrange(50000, 2000000, 10000),
+                "description": f"Pengeluaran {outlet['name']}",
+                "payment_method": rng.choice(["transfer", "cash"]),
+                "created_by": outlet["manager_name"],
+                "outlet_id": outlet["id"]
+            })
+    return transactions
+
+
+async def generate_memberships(writer, rng, outlets, services, customers, count, start, end, usage_rate):
+    """Memberships spread over the period, each with its daily usage log"""
+    period_seconds = int((end - start).total_seconds())
+    for _ in range(count):
+        c = rng.randrange(len(customers["id"]))
+        membership_id = seeded_id(rng)
+        membership_type = rng.choices(list(MEMBERSHIP_PLANS), MEMBERSHIP_WEIGHTS)[0]
+        days, price = MEMBERSHIP_PLANS[membership_type]
+        start_date = start + timedelta(seconds=rng.randrange(period_seconds))
+        end_date = start_date + timedelta(days=days)
+        outlet = rng.choice(outlets)
+        if customers["first_seen"][c] is None or start_date < customers["first_seen"][c]:
+            customers["first_seen"][c] = start_date
+
+        usage_count = 0
+        last_used = None
+        day = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
+        while day < min(end_date, end):
+            if rng.random() < usage_rate:
+                used_at = day.replace(hour=rng.randint(7, 21), minute=rng.randrange(60))
+                service = rng.choice(services)
+                kasir = rng.choice(outlet["kasir"])
+                await writer.add("membership_usage", {
+                    "id": seeded_id(rng),
+                    "membership_id": membership_id,
+                    "customer_id": customers["id"][c],
+                    "customer_name": customers["name"][c],
+                    "service_id": service["id"],
+                    "service_name": service["name"],
+                    "kasir_id": kasir["id"],
+                    "kasir_name": kasir["name"],
+                    "outlet_id": outlet["id"],
+                    "used_at": utc_iso(used_at),
+                    "usage_day": used_at.astimezone(timezone.utc).strftime("%Y-%m-%d"),
+                    # BOM cost, as the server records it for the P&L
+                    "cogs": service["cost"]
+                })
+                usage_count += 1
+                last_used = used_at
+            day += timedelta(days=1)
+
+        if end_date < end:
+            status = "expired"
+        elif end_date - end <= timedelta(days=7):
+            status = "expiring_soon"
+        else:
+            status = "active"
+        await writer.add("memberships", {
+            "id": membership_id,
+            "customer_id": customers["id"][c],
+            "customer_name": customers["name"][c],
+            "membership_type": membership_type,
+            "start_date": utc_iso(start_date),
+            "end_date": utc_iso(end_date),
+            "status": status,
+            "usage_count": usage_count,
+            "last_used": utc_iso(last_used) if last_used else None,
+            "price": price,
+            "notes": None,
+            "created_at": utc_iso(start_date)
+        })
+
+
+async def generate_customers(writer, rng, customers, start):
+    for c in range(len(customers["id"])):
+        join_date = customers["first_seen"][c] or start + timedelta(days=rng.randrange(30))
+        await writer.add("customers", {
+            "id": customers["id"][c],
+            "name": customers["name"][c],
+            "phone": f"0899{c:08d}",
+            "email": None,
+            "vehicle_number": f"B {rng.randint(1000, 9999)} {rng.choice('ABCDEFGHJKLMNPRSTUVWXYZ')}{rng.choice('ABCDEFGHJKLMNPRSTUVWXYZ')}",
+            "vehicle_type": rng.choice(VEHICLE_TYPES),
+            "join_date": utc_iso(join_date),
+            "total_visits": customers["visits"][c],
+            "total_spending": customers["spending"][c]
+        })
+
+
+async def generate_history(args):
+    """
+    Benchmark-scale history: several years of multi-outlet shifts, transactions,
+    expenses, customers, memberships and usage logs in the same document shapes
+    the API writes. Runs on top of the regular seed's catalog. The same --seed
+    and --end-date always produce the same data.
+    """
+    print("🏭 Generating synthetic history...")
+    print("=" * 60)
+    print(f"📂 Database Name: {db_name}")
+    print(f"🎲 Seed: {args.seed}  📅 {args.years} years to {args.end_date or 'today'}  🏪 {args.outlets} outlets")
+    print("=" * 60)
+
+    services, products = await load_catalog()
+    if not services:
+        print("❌ No active services found. Run `python seed_data.py` first to create the catalog.")
+        return
+    if await db.users.find_one({"username": "bench_kasir_1_1"}):
+        print("❌ This database already has generated history. Use a fresh DB_NAME.")
+        return
+
+    rng = random.Random(args.seed)
+    if args.end_date:
+        end = datetime.strptime(args.end_date, "%Y-%m-%d").replace(tzinfo=WIB)
+    else:
+        end = datetime.now(WIB).replace(hour=0, minute=0, second=0, microsecond=0)
+    days = int(args.years * 365)
+    start = end - timedelta(days=days)
+    started = datetime.now()
+
+    writer = BatchWriter(db, batch_size=args.batch_size, parallel=args.parallel)
+    try:
+        outlets = await generate_outlets(writer, rng, args.outlets, utc_iso(start))
+        customers = new_customers(rng, args.customers)
+
+        print(f"\n🧾 Generating {days} days of transactions...")
+        transactions = 0
+        for d in range(days):
+            day = start + timedelta(days=d)
+            transactions += await generate_day(writer, rng, day, outlets, services, products, customers, args.tx_per_day)
+            if day.day == 1 or d == days - 1:
+                print(f"  {day.strftime('%Y-%m')}: {transactions:,} transactions")
+
+        print(f"\n👑 Generating {args.memberships:,} memberships with usage logs...")
+        await generate_memberships(writer, rng, outlets, services, customers, args.memberships,
+                                   start, end, args.usage_rate)
+
+        print(f"\n👥 Writing {args.customers:,} customers...")
+        await generate_customers(writer, rng, customers, start)
+    finally:
+        await writer.close()
+
+    elapsed = (datetime.now() - started).total_seconds()
+    print("\n" + "=" * 60)
+    print(f"🎉 SYNTHETIC HISTORY GENERATED in {elapsed:.0f}s")
+    print("=" * 60)
+    for collection, count in sorted(writer.counts.items()):
+        print(f"  ✅ {collection}: {count:,}")
+    print("\n🔑 Generated staff log in with bench_kasir_<outlet>_<n> / bench123")
+
+
 if __name__ == "__main__":
-    asyncio.run(seed_data())
+    parser = argparse.ArgumentParser(description="Seed the car wash database")
+    parser.add_argument("--generate", action="store_true",
+                        help="Generate multi-year synthetic history for benchmarking (run the plain seed first)")
+    parser.add_argument("--years", type=float, default=3, help="Years of history")
+    parser.add_argument("--end-date", help="Last day of history, YYYY-MM-DD (default: today)")
+    parser.add_argument("--outlets", type=int, default=5)
+    parser.add_argument("--tx-per-day", type=int, default=300, help="Average transactions per outlet per day")
+    parser.add_argument("--customers", type=int, default=200000)
+    parser.add_argument("--memberships", type=int, default=100000)
+    parser.add_argument("--usage-rate", type=float, default=0.2, help="Chance a member uses the membership on a given day")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=5000, help="Documents per insert_many")
+    parser.add_argument("--parallel", type=int, default=4, help="insert_many batches in flight")
+    args = parser.parse_args()
+
+    asyncio.run(generate_history(args) if args.generate else seed_data())
@@ -1,8 +1,11 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Request, status
+from fastapi.routing import APIRoute
+from fastapi.responses import JSONResponse, StreamingResponse, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 import os
 import logging
 from pathlib import Path
@@ -10,18 +13,32 @@ from pydantic import BaseModel, Field, ConfigDict, EmailStr
 from typing import List, Optional
 import uuid
 from datetime import datetime, timezone, timedelta
+import asyncio
 import bcrypt
 import jwt
 from enum import Enum
 
-try:
-    from whatsapp_helper import whatsapp
-except Exception as e:
-    print(f"WARNING: WhatsApp helper could not be loaded: {e}")
-    class MockWhatsApp:
-        def send_receipt(self, *args, **kwargs): return {"success": False, "error": "WhatsApp service unavailable"}
-        def send_message(self, *args, **kwargs): return {"success": False, "error": "WhatsApp service unavailable"}
-    whatsapp = MockWhatsApp()
+from promotion_engine import promotion_engine, PromotionError
+from indexes import ensure_indexes
+from domain import apply_commissions, days_remaining, is_membership_active, membership_status, parse_datetime, refresh_membership
+from dashboard_stream import dashboard_hub, format_event, summarize_transaction, RECENT_LIMIT
+from cache_helper import TTLCache
+from cache_bus import InvalidationBus
+from metrics import MetricsMiddleware, command_listener, registry as metrics_registry, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from query_log import SlowQueryListener
+from server_timing import ServerTimingMiddleware, timing_listener, timed_endpoint, timed_section
+from profiler import ProfilerMiddleware
+from loop_monitor import LoopMonitor, install_blocking_call_detector
+from lazy_db import LazyDatabase
+from stock_ledger import (
+    ADJUSTMENT, CORRECTION, MEMBERSHIP_USAGE, OPENING, SALE,
+    LedgerError, SnapshotScheduler, movement, record_movements, stock_on, weekly_consumption
+)
+from stock_alerts import ALERTS_COLLECTION, stock_alerts
+from reports import closed_periods_cache
+from transaction_archive import MONTHS_COLLECTION as ARCHIVE_MONTHS, find_transaction, find_transactions, months_cache
+from db_pool import DEFAULT_MAX_POOL_SIZE, DEFAULT_MIN_POOL_SIZE, client_options_from_env, pool_listener, warm_pool
+from lazy_routes import LazyRoutes, add_lazy_routes, load_all
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -31,27 +48,72 @@ load_dotenv(ROOT_DIR / '.env')
 mongo_url = os.environ.get('MONGO_URL')
 db_name = os.environ.get('DB_NAME', 'carwash_db')
 
+# Serverless mode (set by vercel_entry.py): optional route groups are
+# imported on their first request instead of at startup
+SERVERLESS = os.environ.get('SERVERLESS', 'false').lower() == 'true'
+
+# Slow command log (0 disables); optionally explain a sample of slow commands
+slow_query_listener = SlowQueryListener(
+    threshold_ms=float(os.environ.get('SLOW_QUERY_MS', '100')),
+    explain_rate=float(os.environ.get('SLOW_QUERY_EXPLAIN_RATE', '0')),
+    log_path=os.environ.get('SLOW_QUERY_LOG', str(ROOT_DIR / 'logs' / 'slow_queries.log'))
+)
+
 if not mongo_url:
     print("WARNING: MONGO_URL not found in environment variables! DB connection disabled.")
-    client = None
     db = None
 else:
-    try:
-        client = AsyncIOMotorClient(mongo_url)
-        db = client[db_name]
-        print(f"Connected to MongoDB: {db_name}")
-    except Exception as e:
-        print(f"Failed to connect to MongoDB: {e}")
-        client = None
-        db = None
+    # The Motor client is created on first use (see lazy_db); pool sizing,
+    # timeouts and compression come from MONGO_* variables (see db_pool)
+    db = LazyDatabase(
+        mongo_url, db_name,
+        event_listeners=[command_listener, slow_query_listener, timing_listener, pool_listener],
+        **client_options_from_env()
+    )
+
+# Readiness: /readyz fails until the pool holds minPoolSize connections
+READY_TIMEOUT = float(os.environ.get('READY_TIMEOUT', '2'))
+POOL_WARMUP_TIMEOUT = float(os.environ.get('POOL_WARMUP_TIMEOUT', '10'))
+pool_state = {"warm": SERVERLESS}
 
 # JWT Config
 JWT_SECRET = os.environ.get('JWT_SECRET', 'carwash-pos-secret-key-change-in-production')
 JWT_ALGORITHM = 'HS256'
 JWT_EXPIRATION = 24  # hours
+# The dashboard stream authenticates with a token in its URL (EventSource
+# cannot send headers); that token only opens the stream and expires quickly
+STREAM_PATH = "/api/dashboard/stream"
+STREAM_TOKEN_PURPOSE = "dashboard_stream"
+STREAM_TOKEN_SECONDS = 60
 
 security = HTTPBearer()
 
+# Dashboard stats are cached briefly per outlet; writes invalidate them
+DASHBOARD_CACHE_TTL = float(os.environ.get('DASHBOARD_CACHE_TTL', '5'))
+dashboard_cache = TTLCache(ttl=DASHBOARD_CACHE_TTL)
+
+# Rarely-changing data cached per process; the invalidation bus evicts these
+# in every worker when the underlying collection changes
+CACHE_TTL = float(os.environ.get('CACHE_TTL', '60'))
+catalog_cache = TTLCache(ttl=CACHE_TTL)
+user_cache = TTLCache(ttl=CACHE_TTL)
+landing_cache = TTLCache(ttl=CACHE_TTL)
+
+cache_bus = InvalidationBus(
+    db,
+    poll_interval=float(os.environ.get('CACHE_POLL_INTERVAL', '5')),
+    use_change_streams=os.environ.get('CACHE_CHANGE_STREAMS', 'true').lower() == 'true'
+)
+cache_bus.register("services", lambda: catalog_cache.invalidate("services"))
+cache_bus.register("products", lambda: catalog_cache.invalidate("products"))
+cache_bus.register("users", user_cache.invalidate)
+cache_bus.register("promotions", promotion_engine.invalidate)
+cache_bus.register("landing_config", landing_cache.invalidate)
+cache_bus.register(ARCHIVE_MONTHS, months_cache.invalidate)
+# Expenses and payouts can be backdated into a closed P&L period
+cache_bus.register("expenses", closed_periods_cache.invalidate)
+cache_bus.register("payouts", closed_periods_cache.invalidate)
+
 app = FastAPI()
 
 # CORS Middleware - MUST be added before routes
@@ -68,6 +130,30 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def profile_authorized(token: str) -> Optional[str]:
+    """Only owners may profile requests; returns their user id"""
+    try:
+        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+    except jwt.PyJWTError:
+        return None
+    return payload['user_id'] if payload.get('role') == UserRole.OWNER.value else None
+
+PROFILE_RETENTION_DAYS = int(os.environ.get('PROFILE_RETENTION_DAYS', '7'))
+
+async def store_profile(profile: dict):
+    if db is None:
+        return
+    profile['expires_at'] = profile['created_at'] + timedelta(days=PROFILE_RETENTION_DAYS)
+    profile['created_at'] = profile['created_at'].isoformat()
+    try:
+        await db.profiles.insert_one(profile)
+    except Exception as e:
+        logging.error(f"Failed to store profile {profile['id']}: {e}")
+
+app.add_middleware(ProfilerMiddleware, authorize=profile_authorized, store=store_profile)
+app.add_middleware(ServerTimingMiddleware, debug=os.environ.get('SERVER_TIMING_DEBUG', 'false').lower() == 'true')
+app.add_middleware(MetricsMiddleware, exclude_paths=(STREAM_PATH,))
+
 # Root route for health check
 @app.get("/")
 async def root():
@@ -77,7 +163,44 @@ async def root():
         "docs": "/docs"
     }
 
-api_router = APIRouter(prefix="/api")
+@app.get("/readyz", include_in_schema=False)
+async def readyz():
+    """Readiness probe: 200 only when the database answers and the pool is warm"""
+    if db is None:
+        return JSONResponse({"status": "unavailable", "database": "disabled"}, status_code=503)
+
+    start = asyncio.get_running_loop().time()
+    try:
+        await asyncio.wait_for(db.command("ping"), timeout=READY_TIMEOUT)
+        database = "ok"
+    except Exception as e:
+        database = f"error: {type(e).__name__}"
+    ping_ms = round((asyncio.get_running_loop().time() - start) * 1000, 1)
+
+    pool = pool_listener.snapshot()
+    pool["max_pool_size"] = db.client_kwargs.get("maxPoolSize", DEFAULT_MAX_POOL_SIZE)
+    pool["min_pool_size"] = db.client_kwargs.get("minPoolSize", DEFAULT_MIN_POOL_SIZE)
+    # The driver keeps topping the pool up, so a slow warm-up catches up later
+    pool["warm"] = pool_state["warm"] or pool["open"] >= pool["min_pool_size"]
+
+    ready = database == "ok" and pool["warm"]
+    status_text = "ready" if ready else ("warming" if database == "ok" else "unavailable")
+    return JSONResponse(
+        {"status": status_text, "database": database, "ping_ms": ping_ms, "pool": pool},
+        status_code=200 if ready else 503
+    )
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Prometheus scrape endpoint"""
+    return Response(content=metrics_registry.render(), media_type=METRICS_CONTENT_TYPE)
+
+class TimedRoute(APIRoute):
+    """Marks when the endpoint returns so Server-Timing can report serialization"""
+    def __init__(self, path, endpoint, **kwargs):
+        super().__init__(path, timed_endpoint(endpoint), **kwargs)
+
+api_router = APIRouter(prefix="/api", route_class=TimedRoute)
 
 # Enums
 class UserRole(str, Enum):
@@ -208,6 +331,7 @@ class Shift(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     kasir_id: str
     kasir_name: str
+    outlet_id: Optional[str] = None
     opening_balance: float
     opening_denominations: Optional[CashDenomination] = None
     
@@ -245,6 +369,8 @@ class Expense(BaseModel):
     description: Optional[str] = None
     payment_method: str = "transfer" # transfer, cash, etc
     created_by: str
+    outlet_id: Optional[str] = None
+    payout_id: Optional[str] = None  # Set on the expense recorded for a commission payout
 
 class PettyCashCreate(BaseModel):
     shift_id: str
@@ -260,6 +386,7 @@ class CommissionPayout(BaseModel):
     date: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     notes: Optional[str] = None
     created_by: str
+    outlet_id: Optional[str] = None
 
 class Customer(BaseModel):
     model_config = ConfigDict(extra="ignore")
@@ -344,6 +471,7 @@ class InventoryItem(BaseModel):
     unit_cost: float  # HPP
     supplier: Optional[str] = None
     last_purchase_date: Optional[datetime] = None
+    outlet_id: Optional[str] = None
     is_active: bool = True
 
 class InventoryItemCreate(BaseModel):
@@ -356,6 +484,7 @@ class InventoryItemCreate(BaseModel):
     max_stock: float
     unit_cost: float
     supplier: Optional[str] = None
+    outlet_id: Optional[str] = None  # Owners without an outlet pick one; staff get their own
 
 class InventoryItemUpdate(BaseModel):
     name: Optional[str] = None
@@ -465,6 +594,7 @@ class Transaction(BaseModel):
     invoice_number: str
     kasir_id: str
     kasir_name: str
+    outlet_id: Optional[str] = None
     customer_id: Optional[str] = None
     customer_name: Optional[str] = None
     shift_id: str
@@ -477,6 +607,8 @@ class Transaction(BaseModel):
     cogs: float = 0.0
     gross_margin: float = 0.0
     total_commission: float = 0.0  # Total commission for this transaction
+    promo_code: Optional[str] = None
+    discount_amount: float = 0.0
     notes: Optional[str] = None
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
@@ -485,6 +617,7 @@ class TransactionCreate(BaseModel):
     items: List[dict]
     payment_method: PaymentMethod
     payment_received: float
+    promo_code: Optional[str] = None
     notes: Optional[str] = None
 
 class Promotion(BaseModel):
@@ -533,21 +666,6 @@ class ValidatePromoRequest(BaseModel):
     code: str
     subtotal: float
 
-class NotificationService:
-    @staticmethod
-    async def send_whatsapp(phone: str, message: str):
-        # In production this would call an API like Twilio or WA Gateway
-        print(f"==========================================")
-        print(f"SIMULATED WA SEND to {phone}:")
-        print(f"{message}")
-        print(f"==========================================")
-        return True
-
-class SendReceiptRequest(BaseModel):
-    transaction_id: str
-    phone: str
-
-
 # Helper Functions
 def hash_password(password: str) -> str:
     return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
@@ -563,13 +681,41 @@ def create_token(user_id: str, role: str) -> str:
     }
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
+def create_stream_token(user_id: str) -> str:
+    payload = {
+        'user_id': user_id,
+        'purpose': STREAM_TOKEN_PURPOSE,
+        'exp': datetime.now(timezone.utc) + timedelta(seconds=STREAM_TOKEN_SECONDS)
+    }
+    return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    return await authenticate_token(credentials.credentials)
+
+async def outlet_scope(outlet_id: Optional[str] = None, current_user: User = Depends(get_current_user)) -> dict:
+    """
+    Outlet filter for list and report routes. Staff assigned to an outlet only
+    see that outlet; unassigned users (owners) see every outlet, or one with ?outlet_id=
+    """
+    scope = current_user.outlet_id or outlet_id
+    return {"outlet_id": scope} if scope else {}
+
+async def authenticate_token(token: str, purpose: Optional[str] = None) -> User:
+    """Resolve a token to its user; purpose-bound tokens (stream) are only accepted for that purpose"""
+    with timed_section("auth"):
+        return await _authenticate_token(token, purpose)
+
+async def _authenticate_token(token: str, purpose: Optional[str] = None) -> User:
     if db is None:
         raise HTTPException(status_code=503, detail="Database service unavailable")
     try:
-        token = credentials.credentials
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        user = await db.users.find_one({"id": payload['user_id']}, {"_id": 0})
+        if payload.get('purpose') != purpose:
+            raise HTTPException(status_code=401, detail="Invalid token")
+        user = await user_cache.get_or_compute(
+            payload['user_id'],
+            lambda: db.users.find_one({"id": payload['user_id']}, {"_id": 0, "password_hash": 0})
+        )
         if not user:
             raise HTTPException(status_code=401, detail="User not found")
         return User(**user)
@@ -578,6 +724,60 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     except Exception:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+async def get_active_services() -> list:
+    return await catalog_cache.get_or_compute(
+        "services", lambda: db.services.find({"is_active": True}, {"_id": 0}).to_list(1000)
+    )
+
+async def refresh_promotions():
+    """Reload the in-memory promotion index from the database"""
+    promotions = await db.promotions.find({"is_active": True}, {"_id": 0}).to_list(1000)
+    promotion_engine.load(promotions)
+
+async def check_promotion(code: str, subtotal: float):
+    if not promotion_engine.loaded:
+        await refresh_promotions()
+    try:
+        return promotion_engine.validate(code, subtotal)
+    except PromotionError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+async def redeem_promotion(promo: dict):
+    """Atomically count one use of a promotion, respecting usage_limit"""
+    redeemed = await db.promotions.find_one_and_update(
+        {
+            "id": promo['id'],
+            "is_active": True,
+            "$or": [
+                {"usage_limit": None},
+                {"$expr": {"$lt": ["$usage_count", "$usage_limit"]}}
+            ]
+        },
+        {"$inc": {"usage_count": 1}},
+        projection={"_id": 0, "usage_count": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if not redeemed:
+        # Deactivated or deleted since it was validated, or its last use taken
+        current = await db.promotions.find_one({"id": promo['id']}, {"_id": 0, "is_active": 1})
+        if current is None:
+            raise HTTPException(status_code=404, detail="Invalid promotion code")
+        if not current.get('is_active'):
+            raise HTTPException(status_code=400, detail="Promotion is no longer active")
+        raise HTTPException(status_code=400, detail="Promotion usage limit reached")
+    promotion_engine.record_usage(promo['code'], redeemed['usage_count'])
+
+async def release_promotion(promo: dict):
+    """Give back a use counted by redeem_promotion when the sale is not recorded"""
+    released = await db.promotions.find_one_and_update(
+        {"id": promo['id'], "usage_count": {"$gt": 0}},
+        {"$inc": {"usage_count": -1}},
+        projection={"_id": 0, "usage_count": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if released:
+        promotion_engine.record_usage(promo['code'], released['usage_count'])
+
 # Routes - Authentication
 @api_router.post("/auth/register", response_model=User)
 async def register(user_data: UserCreate):
@@ -600,6 +800,7 @@ async def register(user_data: UserCreate):
     doc['created_at'] = doc['created_at'].isoformat()
     
     await db.users.insert_one(doc)
+    await cache_bus.publish("users")
     return user
 
 @api_router.post("/auth/login", response_model=LoginResponse)
@@ -671,6 +872,7 @@ async def update_user(user_id: str, update_data: UserUpdate, current_user: User
     
     if filtered_data:
         await db.users.update_one({"id": user_id}, {"$set": filtered_data})
+        await cache_bus.publish("users")
         user.update(filtered_data)
     
     user.pop('password_hash', None)
@@ -714,6 +916,7 @@ async def delete_user(user_id: str, current_user: User = Depends(get_current_use
     result = await db.users.update_one({"id": user_id}, {"$set": {"is_active": False}})
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="User not found")
+    await cache_bus.publish("users")
     
     return {"message": "User deactivated successfully"}
 
@@ -781,6 +984,7 @@ async def open_shift(shift_data: ShiftOpen, current_user: User = Depends(get_cur
     shift = Shift(
         kasir_id=shift_data.kasir_id,
         kasir_name=current_user.full_name,
+        outlet_id=current_user.outlet_id,
         opening_balance=shift_data.opening_balance,
         opening_denominations=shift_data.denominations
     )
@@ -825,6 +1029,14 @@ async def add_petty_cash(data: PettyCashCreate, current_user: User = Depends(get
     
     return log
 
+async def shift_transactions(shift: dict) -> List[dict]:
+    """A shift's transactions, including archived ones (like get_shift_details)"""
+    opened_at = shift['opened_at']
+    return await find_transactions(
+        db, {"shift_id": shift['id']},
+        start=opened_at.isoformat() if isinstance(opened_at, datetime) else opened_at
+    )
+
 @api_router.post("/shifts/close", response_model=Shift)
 async def close_shift(shift_data: ShiftClose, current_user: User = Depends(get_current_user)):
     shift_doc = await db.shifts.find_one({"id": shift_data.shift_id}, {"_id": 0})
@@ -835,7 +1047,7 @@ async def close_shift(shift_data: ShiftClose, current_user: User = Depends(get_c
         raise HTTPException(status_code=400, detail="Shift already closed")
     
     # Calculate expected balance
-    transactions = await db.transactions.find({"shift_id": shift_data.shift_id}).to_list(1000)
+    transactions = await shift_transactions(shift_doc)
     cash_transactions = [t for t in transactions if t.get('payment_method') == 'cash']
     total_cash_sales = sum(t.get('total', 0) for t in cash_transactions)
     
@@ -873,7 +1085,7 @@ async def get_shift_summary(shift_id: str, current_user: User = Depends(get_curr
         raise HTTPException(status_code=404, detail="Shift not found")
     
     # Get all transactions for this shift
-    transactions = await db.transactions.find({"shift_id": shift_id}).to_list(1000)
+    transactions = await shift_transactions(shift)
     
     # Calculate payment breakdown
     payment_breakdown = {
@@ -922,8 +1134,8 @@ async def get_current_shift(current_user: User = Depends(get_current_user)):
     return shift
 
 @api_router.get("/shifts", response_model=List[Shift])
-async def get_shifts(current_user: User = Depends(get_current_user)):
-    shifts = await db.shifts.find({}, {"_id": 0}).sort("opened_at", -1).to_list(100)
+async def get_shifts(current_user: User = Depends(get_current_user), scope: dict = Depends(outlet_scope)):
+    shifts = await db.shifts.find(scope, {"_id": 0}).sort("opened_at", -1).to_list(100)
     for shift in shifts:
         if isinstance(shift.get('opened_at'), str):
             shift['opened_at'] = datetime.fromisoformat(shift['opened_at'])
@@ -992,11 +1204,15 @@ async def delete_customer(customer_id: str, current_user: User = Depends(get_cur
     return {"message": "Customer deleted successfully"}
 
 @api_router.get("/customers/{customer_id}/transactions")
-async def get_customer_transactions(customer_id: str, current_user: User = Depends(get_current_user)):
-    transactions = await db.transactions.find(
-        {"customer_id": customer_id}, 
-        {"_id": 0}
-    ).sort("created_at", -1).to_list(1000)
+async def get_customer_transactions(
+    customer_id: str,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    scope: dict = Depends(outlet_scope)
+):
+    """History including archived months; the last year unless a start/end (ISO) range is given"""
+    transactions = await find_transactions(db, {"customer_id": customer_id, **scope}, start, end)
     
     for t in transactions:
         if isinstance(t.get('created_at'), str):
@@ -1040,6 +1256,7 @@ async def create_membership(membership_data: MembershipCreate, current_user: Use
     doc['created_at'] = doc['created_at'].isoformat()
     
     await db.memberships.insert_one(doc)
+    await cache_bus.publish("memberships")
     return membership
 
 @api_router.get("/memberships", response_model=List[Membership])
@@ -1050,22 +1267,8 @@ async def get_memberships(current_user: User = Depends(get_current_user)):
     now = datetime.now(timezone.utc)
     
     for membership in memberships:
-        if isinstance(membership.get('start_date'), str):
-            membership['start_date'] = datetime.fromisoformat(membership['start_date'])
-        if isinstance(membership.get('end_date'), str):
-            membership['end_date'] = datetime.fromisoformat(membership['end_date'])
-        if isinstance(membership.get('created_at'), str):
-            membership['created_at'] = datetime.fromisoformat(membership['created_at'])
-        if isinstance(membership.get('last_used'), str):
-            membership['last_used'] = datetime.fromisoformat(membership['last_used'])
-        
         # Update status based on expiry
-        if membership['end_date'] < now:
-            membership['status'] = MembershipStatus.EXPIRED
-        elif (membership['end_date'] - now).days <= 7:
-            membership['status'] = MembershipStatus.EXPIRING_SOON
-        else:
-            membership['status'] = MembershipStatus.ACTIVE
+        refresh_membership(membership, now)
     
     return memberships
 
@@ -1085,27 +1288,12 @@ async def get_membership_detail(membership_id: str, current_user: User = Depends
         if isinstance(usage.get('used_at'), str):
             usage['used_at'] = datetime.fromisoformat(usage['used_at'])
     
-    # Convert dates
-    if isinstance(membership.get('start_date'), str):
-        membership['start_date'] = datetime.fromisoformat(membership['start_date'])
-    if isinstance(membership.get('end_date'), str):
-        membership['end_date'] = datetime.fromisoformat(membership['end_date'])
-    if isinstance(membership.get('created_at'), str):
-        membership['created_at'] = datetime.fromisoformat(membership['created_at'])
-    if isinstance(membership.get('last_used'), str):
-        membership['last_used'] = datetime.fromisoformat(membership['last_used'])
-    
-    # Update status
+    # Convert dates and update status
     now = datetime.now(timezone.utc)
-    if membership['end_date'] < now:
-        membership['status'] = MembershipStatus.EXPIRED
-    elif (membership['end_date'] - now).days <= 7:
-        membership['status'] = MembershipStatus.EXPIRING_SOON
-    else:
-        membership['status'] = MembershipStatus.ACTIVE
+    refresh_membership(membership, now)
     
     membership['usage_history'] = usage_history
-    membership['days_remaining'] = (membership['end_date'] - now).days if membership['end_date'] >= now else 0
+    membership['days_remaining'] = days_remaining(membership['end_date'], now)
     
     return membership
 
@@ -1123,6 +1311,7 @@ async def extend_membership(membership_id: str, days: int, current_user: User =
         {"id": membership_id},
         {"$set": {"end_date": new_end_date.isoformat()}}
     )
+    await cache_bus.publish("memberships")
     
     return {"message": f"Membership extended by {days} days", "new_end_date": new_end_date.isoformat()}
 
@@ -1137,6 +1326,7 @@ async def delete_membership(membership_id: str, current_user: User = Depends(get
     
     # Also delete usage history
     await db.membership_usage.delete_many({"membership_id": membership_id})
+    await cache_bus.publish("memberships")
     
     return {"message": "Membership deleted successfully"}
 
@@ -1156,30 +1346,22 @@ async def record_membership_usage(usage_data: MembershipUsage, current_user: Use
     
     active_membership = None
     for m in memberships:
-        end_date = datetime.fromisoformat(m['end_date']) if isinstance(m['end_date'], str) else m['end_date']
-        if end_date >= now and m['membership_type'] != 'regular':
+        if is_membership_active(parse_datetime(m['end_date']), now) and m['membership_type'] != 'regular':
             active_membership = m
             break
     
     if not active_membership:
         raise HTTPException(status_code=400, detail="Tidak ada membership All You Can Wash yang aktif")
     
-    # Check if already used today
-    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    today_usage = await db.membership_usage.find_one({
-        "membership_id": active_membership['id'],
-        "used_at": {"$gte": today_start.isoformat()}
-    })
-    
-    if today_usage:
-        raise HTTPException(status_code=400, detail="Membership sudah digunakan hari ini. Limit 1x per hari.")
-    
     # Get service info
     service = await db.services.find_one({"id": usage_data.service_id}, {"_id": 0})
     if not service:
         raise HTTPException(status_code=404, detail="Service not found")
+    bom_deductions = [(line['inventory_id'], line['quantity']) for line in service.get('bom') or []]
+    bom_items = await stock_items(bom_deductions)
     
-    # Record usage
+    # Record usage - the unique (membership_id, usage_day) index enforces
+    # the 1x per day limit atomically, even with concurrent scans
     usage_record = {
         "id": str(uuid.uuid4()),
         "membership_id": active_membership['id'],
@@ -1189,27 +1371,38 @@ async def record_membership_usage(usage_data: MembershipUsage, current_user: Use
         "service_name": service['name'],
         "kasir_id": current_user.id,
         "kasir_name": current_user.full_name,
-        "used_at": now.isoformat()
+        "outlet_id": current_user.outlet_id,
+        "used_at": now.isoformat(),
+        "usage_day": now.strftime("%Y-%m-%d"),
+        # Stock used by the wash at today's HPP, for the P&L
+        "cogs": stock_cost(bom_deductions, bom_items)
     }
     
-    await db.membership_usage.insert_one(usage_record)
+    try:
+        await db.membership_usage.insert_one(usage_record)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Membership sudah digunakan hari ini. Limit 1x per hari.")
     
     # Update membership usage count and last_used
-    await db.memberships.update_one(
+    updated_membership = await db.memberships.find_one_and_update(
         {"id": active_membership['id']},
         {
             "$inc": {"usage_count": 1},
             "$set": {"last_used": now.isoformat()}
-        }
+        },
+        projection={"_id": 0, "usage_count": 1},
+        return_document=ReturnDocument.AFTER
     )
+    usage_count = updated_membership['usage_count'] if updated_membership else active_membership.get('usage_count', 0) + 1
     
     # Deduct inventory if service has BOM
     if service.get('bom') and len(service['bom']) > 0:
-        for bom_item in service['bom']:
-            await db.inventory.update_one(
-                {"id": bom_item['inventory_id']},
-                {"$inc": {"current_stock": -bom_item['quantity']}}
-            )
+        await record_movements(db, [
+            movement(bom_item['inventory_id'], -bom_item['quantity'], MEMBERSHIP_USAGE, ref_id=usage_record['id'],
+                     user_id=current_user.id, outlet_id=bom_items.get(bom_item['inventory_id'], {}).get('outlet_id'),
+                     now=now)
+            for bom_item in service['bom']
+        ])
     
     end_date_obj = datetime.fromisoformat(active_membership['end_date']) if isinstance(active_membership['end_date'], str) else active_membership['end_date']
     
@@ -1219,7 +1412,7 @@ async def record_membership_usage(usage_data: MembershipUsage, current_user: Use
         "service_name": service['name'],
         "membership_type": active_membership['membership_type'],
         "remaining_days": (end_date_obj - now).days,
-        "usage_count": active_membership['usage_count'] + 1
+        "usage_count": usage_count
     }
 
 # Routes - Services
@@ -1228,12 +1421,12 @@ async def create_service(service_data: ServiceCreate, current_user: User = Depen
     service = Service(**service_data.model_dump())
     doc = service.model_dump()
     await db.services.insert_one(doc)
+    await cache_bus.publish("services")
     return service
 
 @api_router.get("/services", response_model=List[Service])
 async def get_services(current_user: User = Depends(get_current_user)):
-    services = await db.services.find({"is_active": True}, {"_id": 0}).to_list(1000)
-    return services
+    return await get_active_services()
 
 @api_router.get("/services/{service_id}", response_model=Service)
 async def get_service(service_id: str, current_user: User = Depends(get_current_user)):
@@ -1251,6 +1444,7 @@ async def update_service(service_id: str, service_data: ServiceUpdate, current_u
     update_data = {k: v for k, v in service_data.model_dump().items() if v is not None}
     if update_data:
         await db.services.update_one({"id": service_id}, {"$set": update_data})
+        await cache_bus.publish("services")
         service.update(update_data)
     
     return Service(**service)
@@ -1262,6 +1456,7 @@ async def delete_service(service_id: str, current_user: User = Depends(get_curre
     
     # Soft delete by setting is_active to False
     await db.services.update_one({"id": service_id}, {"$set": {"is_active": False}})
+    await cache_bus.publish("services")
     
     return {"message": "Service deactivated successfully"}
 
@@ -1271,11 +1466,15 @@ async def create_product(product_data: ProductCreate, current_user: User = Depen
     product = Product(**product_data.model_dump())
     doc = product.model_dump()
     await db.products.insert_one(doc)
+    await cache_bus.publish("products")
     return product
 
 @api_router.get("/products")
 async def get_products(current_user: User = Depends(get_current_user)):
-    products = await db.products.find({"is_active": True}, {"_id": 0}).to_list(1000)
+    # Copy the cached documents before adding stock info
+    products = [dict(p) for p in await catalog_cache.get_or_compute(
+        "products", lambda: db.products.find({"is_active": True}, {"_id": 0}).to_list(1000)
+    )]
     # Add stock info from inventory
     for product in products:
         if product.get('inventory_id'):
@@ -1307,6 +1506,7 @@ async def update_product(product_id: str, product_data: ProductUpdate, current_u
     update_data = {k: v for k, v in product_data.model_dump().items() if v is not None}
     if update_data:
         await db.products.update_one({"id": product_id}, {"$set": update_data})
+        await cache_bus.publish("products")
         product.update(update_data)
     
     return Product(**product)
@@ -1319,30 +1519,71 @@ async def delete_product(product_id: str, current_user: User = Depends(get_curre
     result = await db.products.update_one({"id": product_id}, {"$set": {"is_active": False}})
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Product not found")
+    await cache_bus.publish("products")
     
     return {"message": "Product deleted successfully"}
 
 # Routes - Inventory
 @api_router.post("/inventory", response_model=InventoryItem)
 async def create_inventory_item(item_data: InventoryItemCreate, current_user: User = Depends(get_current_user)):
-    item = InventoryItem(**item_data.model_dump())
+    item = InventoryItem(**{**item_data.model_dump(), "outlet_id": current_user.outlet_id or item_data.outlet_id})
     doc = item.model_dump()
+    doc['is_low_stock'] = item.current_stock <= item.min_stock
     await db.inventory.insert_one(doc)
+    await record_movements(db, [
+        movement(item.id, item.current_stock, OPENING, user_id=current_user.id, outlet_id=item.outlet_id)
+    ], apply=False)
+    notify_stock_change([item.outlet_id])
     return item
 
 @api_router.get("/inventory", response_model=List[InventoryItem])
-async def get_inventory(current_user: User = Depends(get_current_user)):
-    items = await db.inventory.find({}, {"_id": 0}).to_list(1000)
+async def get_inventory(current_user: User = Depends(get_current_user), scope: dict = Depends(outlet_scope)):
+    items = await db.inventory.find(scope, {"_id": 0}).to_list(1000)
     for item in items:
         if isinstance(item.get('last_purchase_date'), str):
             item['last_purchase_date'] = datetime.fromisoformat(item['last_purchase_date'])
     return items
 
 @api_router.get("/inventory/low-stock")
-async def get_low_stock(current_user: User = Depends(get_current_user)):
-    items = await db.inventory.find({}, {"_id": 0}).to_list(1000)
-    low_stock = [item for item in items if item['current_stock'] <= item['min_stock']]
-    return low_stock
+async def get_low_stock(current_user: User = Depends(get_current_user), scope: dict = Depends(outlet_scope)):
+    # is_low_stock is kept in step with every stock write (see stock_alerts)
+    return await db.inventory.find({"is_low_stock": True, **scope}, {"_id": 0}).to_list(1000)
+
+def query_datetime(value: str) -> str:
+    """ISO date or datetime from a query parameter, as a stored (UTC) ISO string"""
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid date: {value}")
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc).isoformat()
+
+@api_router.get("/inventory/stock-on")
+async def get_stock_on(date: str, current_user: User = Depends(get_current_user), scope: dict = Depends(outlet_scope)):
+    """Stock levels at a past moment (ISO date or datetime), from the stock ledger"""
+    at = query_datetime(date)
+    items = await db.inventory.find(scope, {"_id": 0, "id": 1, "sku": 1, "name": 1, "unit": 1}).to_list(1000)
+    try:
+        history = await stock_on(db, at, [item['id'] for item in items])
+    except LedgerError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return {
+        "as_of": at,
+        "snapshot_at": history['snapshot_at'],
+        "items": [{**item, "stock": history['levels'].get(item['id'], 0)} for item in items]
+    }
+
+@api_router.get("/inventory/consumption")
+async def get_weekly_consumption(start: str, end: str, current_user: User = Depends(get_current_user), scope: dict = Depends(outlet_scope)):
+    """Quantity used per item per week (Monday) by sales and membership washes"""
+    items = await db.inventory.find(scope, {"_id": 0, "id": 1, "name": 1, "unit": 1}).to_list(1000)
+    weeks = await weekly_consumption(db, query_datetime(start), query_datetime(end), [item['id'] for item in items])
+    names = {item['id']: item for item in items}
+    return [
+        {"week": week, "items": [{**names[i], "consumed": quantity} for i, quantity in consumed.items()]}
+        for week, consumed in weeks.items()
+    ]
 
 @api_router.get("/inventory/{item_id}", response_model=InventoryItem)
 async def get_inventory_item(item_id: str, current_user: User = Depends(get_current_user)):
@@ -1360,8 +1601,17 @@ async def update_inventory_item(item_id: str, item_data: InventoryItemUpdate, cu
         raise HTTPException(status_code=404, detail="Item not found")
     
     update_data = {k: v for k, v in item_data.model_dump().items() if v is not None}
+    # A new stock count goes through the ledger as a correction
+    new_stock = update_data.pop('current_stock', None)
+    if new_stock is not None and new_stock != item['current_stock']:
+        await record_movements(db, [
+            movement(item_id, new_stock - item['current_stock'], CORRECTION, user_id=current_user.id,
+                     outlet_id=item.get('outlet_id'), note="Stock edited")
+        ])
+        item['current_stock'] = new_stock
     if update_data:
-        await db.inventory.update_one({"id": item_id}, {"$set": update_data})
+        # Same write re-evaluates is_low_stock against a new min_stock
+        await stock_alerts.update_item(db, item_id, update_data)
         item.update(update_data)
     
     if isinstance(item.get('last_purchase_date'), str):
@@ -1371,9 +1621,10 @@ async def update_inventory_item(item_id: str, item_data: InventoryItemUpdate, cu
 
 @api_router.delete("/inventory/{item_id}")
 async def delete_inventory_item(item_id: str, current_user: User = Depends(get_current_user)):
-    result = await db.inventory.delete_one({"id": item_id})
-    if result.deleted_count == 0:
+    item = await db.inventory.find_one_and_delete({"id": item_id}, {"_id": 0, "outlet_id": 1})
+    if item is None:
         raise HTTPException(status_code=404, detail="Item not found")
+    notify_stock_change([item.get("outlet_id")])
     return {"message": "Item deleted successfully"}
 
 @api_router.post("/inventory/{item_id}/adjust")
@@ -1393,11 +1644,11 @@ async def adjust_stock(
     if new_stock < 0:
         raise HTTPException(status_code=400, detail="Stock cannot be negative")
         
-    # Update item
-    await db.inventory.update_one(
-        {"id": item_id},
-        {"$set": {"current_stock": new_stock}}
-    )
+    # Update item through the ledger
+    await record_movements(db, [
+        movement(item_id, change, ADJUSTMENT, user_id=current_user.id, outlet_id=item.get('outlet_id'),
+                 note=adjustment.reason)
+    ])
     
     # Create Log
     log = InventoryLog(
@@ -1419,6 +1670,22 @@ async def adjust_stock(
 
 
 # Routes - Transactions
+async def stock_items(deductions: List[tuple]) -> dict:
+    """id -> unit_cost and outlet_id of the items (inventory_id, quantity) stock deductions draw on"""
+    if not deductions:
+        return {}
+    return {
+        item['id']: item
+        for item in await db.inventory.find(
+            {"id": {"$in": list({inventory_id for inventory_id, _ in deductions})}},
+            {"_id": 0, "id": 1, "unit_cost": 1, "outlet_id": 1}
+        ).to_list(None)
+    }
+
+def stock_cost(deductions: List[tuple], items: dict) -> float:
+    """Cost of (inventory_id, quantity) stock deductions at the items' current unit_cost (HPP)"""
+    return sum(quantity * items.get(inventory_id, {}).get('unit_cost', 0) for inventory_id, quantity in deductions)
+
 @api_router.post("/transactions", response_model=Transaction)
 async def create_transaction(transaction_data: TransactionCreate, current_user: User = Depends(get_current_user)):
     # Get current shift
@@ -1428,7 +1695,11 @@ async def create_transaction(transaction_data: TransactionCreate, current_user:
     
     # Calculate totals
     subtotal = sum(item['price'] * item['quantity'] for item in transaction_data.items)
-    total = subtotal
+    promo = None
+    discount_amount = 0.0
+    if transaction_data.promo_code:
+        promo, discount_amount = await check_promotion(transaction_data.promo_code, subtotal)
+    total = subtotal - discount_amount
     change_amount = transaction_data.payment_received - total
     
     if change_amount < 0:
@@ -1441,35 +1712,14 @@ async def create_transaction(transaction_data: TransactionCreate, current_user:
         if customer:
             customer_name = customer['name']
     
-    # Calculate Commission
-    total_commission = 0.0
-    items_with_commission = []
-    
-    for item in transaction_data.items:
-        commission_amount = 0.0
-        
-        # If item has a service_id and a technician_id is provided in the item (needs updatting frontend/transactioncreate model)
-        # Assuming frontend sends: {..., "technician_id": "uuid", "technician_name": "Name"} for services
-        
-        # Check if service
-        if item.get('service_id'):
-            # Fetch service to get commission rate
-            service_item = await db.services.find_one({"id": item['service_id']}, {"_id": 0})
-            if service_item and service_item.get('commission_rate', 0) > 0:
-                # Calculate commission: Price * Rate / 100 * Quantity
-                # Note: Commission should probably be based on Price AFTER discount? 
-                # For now let's base on Item Price * Quantity. 
-                # If transaction has global discount, this might be standardized. 
-                # Let's effectively use item price.
-                
-                commission_amount = (item['price'] * item['quantity']) * (service_item['commission_rate'] / 100)
-        
-        # Add commission data to the item dict if valid
-        item['commission_amount'] = commission_amount
-        if commission_amount > 0:
-            total_commission += commission_amount
-            
-        items_with_commission.append(item)
+    # Calculate Commission (rate per service, looked up in one query)
+    service_ids = list({item['service_id'] for item in transaction_data.items if item.get('service_id')})
+    commission_rates = {
+        s['id']: s.get('commission_rate', 0)
+        for s in await db.services.find({"id": {"$in": service_ids}}, {"_id": 0, "id": 1, "commission_rate": 1}).to_list(None)
+    } if service_ids else {}
+    items_with_commission = transaction_data.items
+    total_commission = apply_commissions(items_with_commission, commission_rates)
     
     # Generate invoice number
     today = datetime.now(timezone.utc)
@@ -1486,10 +1736,29 @@ async def create_transaction(transaction_data: TransactionCreate, current_user:
     else:
         invoice_number = f"INV-{invoice_prefix}-0001"
     
+    # Stock used by the items; its cost (COGS) is fixed at sale time
+    deductions = []  # (inventory_id, quantity)
+    for item in transaction_data.items:
+        # Check if it's a service with BOM
+        if item.get('service_id'):
+            service = await db.services.find_one({"id": item['service_id']}, {"_id": 0})
+            if service and service.get('bom') and len(service['bom']) > 0:
+                for bom_item in service['bom']:
+                    deductions.append((bom_item['inventory_id'], bom_item['quantity'] * item['quantity']))
+        
+        # Check if it's a product linked to inventory
+        elif item.get('product_id'):
+            product = await db.products.find_one({"id": item['product_id']}, {"_id": 0})
+            if product and product.get('inventory_id'):
+                deductions.append((product['inventory_id'], item['quantity']))
+    deducted_items = await stock_items(deductions)
+    cogs = stock_cost(deductions, deducted_items)
+    
     transaction = Transaction(
         invoice_number=invoice_number,
         kasir_id=current_user.id,
         kasir_name=current_user.full_name,
+        outlet_id=shift.get('outlet_id') or current_user.outlet_id,
         customer_id=transaction_data.customer_id,
         customer_name=customer_name,
         shift_id=shift['id'],
@@ -1499,14 +1768,27 @@ async def create_transaction(transaction_data: TransactionCreate, current_user:
         payment_method=transaction_data.payment_method,
         payment_received=transaction_data.payment_received,
         change_amount=change_amount,
+        cogs=cogs,
+        gross_margin=total - cogs,
         total_commission=total_commission,
+        promo_code=promo['code'] if promo else None,
+        discount_amount=discount_amount,
         notes=transaction_data.notes
     )
     
     doc = transaction.model_dump()
     doc['created_at'] = doc['created_at'].isoformat()
     
-    await db.transactions.insert_one(doc)
+    # Redeem last, so a failure before the insert does not use up the promotion
+    if promo:
+        await redeem_promotion(promo)
+    try:
+        await db.transactions.insert_one(doc)
+    except Exception:
+        if promo:
+            await release_promotion(promo)
+        raise
+    await notify_transaction_change(doc['outlet_id'], doc)
     
     # Update customer stats if customer_id provided
     if transaction_data.customer_id:
@@ -1515,54 +1797,48 @@ async def create_transaction(transaction_data: TransactionCreate, current_user:
             {"$inc": {"total_visits": 1, "total_spending": total}}
         )
     
-    # Deduct inventory based on items
-    for item in transaction_data.items:
-        # Check if it's a service with BOM
-        if item.get('service_id'):
-            service = await db.services.find_one({"id": item['service_id']}, {"_id": 0})
-            if service and service.get('bom') and len(service['bom']) > 0:
-                for bom_item in service['bom']:
-                    quantity_to_deduct = bom_item['quantity'] * item['quantity']
-                    await db.inventory.update_one(
-                        {"id": bom_item['inventory_id']},
-                        {"$inc": {"current_stock": -quantity_to_deduct}}
-                    )
-        
-        # Check if it's a product linked to inventory
-        elif item.get('product_id'):
-            product = await db.products.find_one({"id": item['product_id']}, {"_id": 0})
-            if product and product.get('inventory_id'):
-                await db.inventory.update_one(
-                    {"id": product['inventory_id']},
-                    {"$inc": {"current_stock": -item['quantity']}}
-                )
+    # Deduct inventory based on items, through the stock ledger (under each item's own outlet)
+    movements = [
+        movement(inventory_id, -quantity, SALE, ref_id=transaction.id, user_id=current_user.id,
+                 outlet_id=deducted_items.get(inventory_id, {}).get('outlet_id'))
+        for inventory_id, quantity in deductions
+    ]
+    await record_movements(db, movements)
     
     return transaction
 
 @api_router.get("/transactions")
-async def get_transactions(current_user: User = Depends(get_current_user)):
+async def get_transactions(
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    limit: int = 1000,
+    skip: int = 0,
+    current_user: User = Depends(get_current_user),
+    scope: dict = Depends(outlet_scope)
+):
+    """Newest first (the last year by default); a start/end (ISO) range reaching past the hot data also reads archived months"""
     # Kasir only see their own transactions
     if current_user.role == UserRole.KASIR:
-        query = {"kasir_id": current_user.id}
+        query = {"kasir_id": current_user.id, **scope}
     else:
-        # Owner, Manager, Teknisi can see all
-        query = {}
+        # Owner, Manager, Teknisi can see all of their outlet(s)
+        query = dict(scope)
     
-    transactions = await db.transactions.find(query, {"_id": 0}).sort("created_at", -1).to_list(1000)
+    transactions = await find_transactions(db, query, start, end, limit=min(max(limit, 1), 5000), skip=max(skip, 0))
     for transaction in transactions:
         if isinstance(transaction.get('created_at'), str):
             transaction['created_at'] = datetime.fromisoformat(transaction['created_at'])
     return transactions
 
 @api_router.get("/transactions/today")
-async def get_today_transactions(current_user: User = Depends(get_current_user)):
+async def get_today_transactions(current_user: User = Depends(get_current_user), scope: dict = Depends(outlet_scope)):
     today_start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
     
     # Kasir only see their own transactions
     if current_user.role == UserRole.KASIR:
-        query = {"created_at": {"$gte": today_start.isoformat()}, "kasir_id": current_user.id}
+        query = {"created_at": {"$gte": today_start.isoformat()}, "kasir_id": current_user.id, **scope}
     else:
-        query = {"created_at": {"$gte": today_start.isoformat()}}
+        query = {"created_at": {"$gte": today_start.isoformat()}, **scope}
     
     transactions = await db.transactions.find(query, {"_id": 0}).to_list(1000)
     
@@ -1574,13 +1850,15 @@ async def get_today_transactions(current_user: User = Depends(get_current_user))
 
 @api_router.get("/transactions/{transaction_id}")
 async def get_transaction_detail(transaction_id: str, current_user: User = Depends(get_current_user)):
-    transaction = await db.transactions.find_one({"id": transaction_id}, {"_id": 0})
+    transaction = await find_transaction(db, {"id": transaction_id})
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaction not found")
     
-    # Kasir can only see their own transaction
+    # Kasir can only see their own transaction, outlet staff only their outlet's
     if current_user.role == UserRole.KASIR and transaction['kasir_id'] != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to view this transaction")
+    if current_user.outlet_id and transaction.get('outlet_id') != current_user.outlet_id:
+        raise HTTPException(status_code=403, detail="Not authorized to view this transaction")
     
     if isinstance(transaction.get('created_at'), str):
         transaction['created_at'] = datetime.fromisoformat(transaction['created_at'])
@@ -1588,34 +1866,39 @@ async def get_transaction_detail(transaction_id: str, current_user: User = Depen
     return transaction
 
 # Routes - Dashboard
-@api_router.get("/dashboard/stats")
-async def get_dashboard_stats(current_user: User = Depends(get_current_user)):
-    today_start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
-    
-    # Today's transactions
-    today_transactions = await db.transactions.find(
-        {"created_at": {"$gte": today_start.isoformat()}}
-    ).to_list(1000)
-    
-    today_revenue = sum(t.get('total', 0) for t in today_transactions)
-    today_count = len(today_transactions)
-    
-    # Active memberships
+def outlet_transaction_filter(outlet_id: Optional[str]) -> dict:
+    """Restrict transactions to one outlet (served by the outlet_id-led indexes)"""
+    return {"outlet_id": outlet_id} if outlet_id else {}
+
+async def count_memberships() -> dict:
     now = datetime.now(timezone.utc)
-    all_memberships = await db.memberships.find({}, {"_id": 0}).to_list(1000)
+    all_memberships = await db.memberships.find({}, {"_id": 0, "end_date": 1}).to_list(1000)
     active_count = 0
     expiring_count = 0
     
     for m in all_memberships:
-        end_date = datetime.fromisoformat(m['end_date']) if isinstance(m['end_date'], str) else m['end_date']
-        if end_date >= now:
+        status = membership_status(parse_datetime(m['end_date']), now)
+        if status != "expired":
             active_count += 1
-            if (end_date - now).days <= 7:
+            if status == "expiring_soon":
                 expiring_count += 1
     
-    # Low stock items
-    low_stock_items = await db.inventory.find({}, {"_id": 0}).to_list(1000)
-    low_stock_count = sum(1 for item in low_stock_items if item['current_stock'] <= item['min_stock'])
+    return {"active_memberships": active_count, "expiring_memberships": expiring_count}
+
+async def count_low_stock(outlet_id: Optional[str] = None) -> dict:
+    query = {"is_low_stock": True, **outlet_transaction_filter(outlet_id)}
+    return {"low_stock_items": await db.inventory.count_documents(query)}
+
+async def compute_dashboard(outlet_id: Optional[str] = None) -> dict:
+    today_start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    
+    # Today's transactions
+    query = {"created_at": {"$gte": today_start.isoformat()}}
+    query.update(outlet_transaction_filter(outlet_id))
+    today_transactions = await db.transactions.find(query, {"_id": 0}).sort("created_at", -1).to_list(1000)
+    
+    today_revenue = sum(t.get('total', 0) for t in today_transactions)
+    today_count = len(today_transactions)
     
     # Kasir performance today
     kasir_performance = {}
@@ -1626,14 +1909,85 @@ async def get_dashboard_stats(current_user: User = Depends(get_current_user)):
         kasir_performance[kasir_name]['count'] += 1
         kasir_performance[kasir_name]['revenue'] += t.get('total', 0)
     
-    return {
+    stats = {
         "today_revenue": today_revenue,
         "today_transactions": today_count,
-        "active_memberships": active_count,
-        "expiring_memberships": expiring_count,
-        "low_stock_items": low_stock_count,
+        **(await count_memberships()),
+        **(await count_low_stock(outlet_id)),
         "kasir_performance": kasir_performance
     }
+    recent = [summarize_transaction(t) for t in today_transactions[:RECENT_LIMIT]]
+    return {"stats": stats, "recent_transactions": recent}
+
+async def load_dashboard(outlet_id: Optional[str] = None) -> dict:
+    return await dashboard_cache.get_or_compute(outlet_id or "all", lambda: compute_dashboard(outlet_id))
+
+async def notify_transaction_change(outlet_id: Optional[str], doc: dict):
+    dashboard_hub.record_transaction(outlet_id, doc)
+    await cache_bus.publish("transactions")
+
+def reload_dashboards():
+    dashboard_cache.invalidate()
+    dashboard_hub.schedule_reload(load_dashboard)
+
+def notify_membership_change():
+    dashboard_cache.invalidate()
+    dashboard_hub.schedule_refresh("memberships", count_memberships)
+
+def notify_stock_change(outlet_ids):
+    """Low-stock counts changed for these outlets (None: items without one)"""
+    dashboard_cache.invalidate()
+    dashboard_hub.schedule_outlet_refresh("low_stock", outlet_ids, count_low_stock)
+
+async def publish_stock_alerts(events: List[dict]):
+    notify_stock_change({e["outlet_id"] for e in events})
+    await cache_bus.publish(ALERTS_COLLECTION)
+
+# Stock writes that don't cross a threshold leave the low-stock count as it is
+stock_alerts.subscribe(publish_stock_alerts)
+
+# Dashboard state is per worker: writes made by other workers reach it through
+# the bus (this worker's own writes are applied above and only re-checked)
+cache_bus.register("transactions", reload_dashboards)
+cache_bus.register("memberships", notify_membership_change)
+cache_bus.register(ALERTS_COLLECTION, lambda: notify_stock_change(dashboard_hub.outlets))
+
+@api_router.get("/dashboard/stats")
+async def get_dashboard_stats(current_user: User = Depends(get_current_user)):
+    dashboard = await load_dashboard(current_user.outlet_id)
+    return dashboard['stats']
+
+@api_router.post("/dashboard/stream-token")
+async def create_dashboard_stream_token(current_user: User = Depends(get_current_user)):
+    """Short-lived token for opening /dashboard/stream, so the login token never appears in a URL"""
+    return {"token": create_stream_token(current_user.id), "expires_in": STREAM_TOKEN_SECONDS}
+
+@api_router.get("/dashboard/stream")
+async def stream_dashboard(request: Request, token: str):
+    """Server-Sent Events feed of dashboard stats for the user's outlet"""
+    # EventSource cannot send headers, so a stream token comes as a query param
+    current_user = await authenticate_token(token, STREAM_TOKEN_PURPOSE)
+    outlet_id = current_user.outlet_id
+    queue, snapshot = await dashboard_hub.subscribe(outlet_id, load_dashboard)
+    
+    async def event_stream():
+        try:
+            yield format_event("snapshot", snapshot)
+            while not await request.is_disconnected():
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=15)
+                    yield message
+                except asyncio.TimeoutError:
+                    # Keep-alive comment so proxies do not close the stream
+                    yield ": ping\n\n"
+        finally:
+            dashboard_hub.unsubscribe(outlet_id, queue)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 # Public Routes (No Authentication Required)
 @api_router.post("/public/check-membership")
@@ -1652,26 +2006,9 @@ async def check_membership_public(phone: str):
     result_memberships = []
     
     for m in memberships:
-        if isinstance(m.get('start_date'), str):
-            m['start_date'] = datetime.fromisoformat(m['start_date'])
-        if isinstance(m.get('end_date'), str):
-            m['end_date'] = datetime.fromisoformat(m['end_date'])
-        if isinstance(m.get('created_at'), str):
-            m['created_at'] = datetime.fromisoformat(m['created_at'])
-        if isinstance(m.get('last_used'), str):
-            m['last_used'] = datetime.fromisoformat(m['last_used'])
-        
-        # Update status
-        if m['end_date'] < now:
-            m['status'] = MembershipStatus.EXPIRED
-        elif (m['end_date'] - now).days <= 7:
-            m['status'] = MembershipStatus.EXPIRING_SOON
-        else:
-            m['status'] = MembershipStatus.ACTIVE
-        
-        # Calculate days remaining
-        days_remaining = (m['end_date'] - now).days
-        m['days_remaining'] = days_remaining if days_remaining > 0 else 0
+        # Update status and days remaining
+        refresh_membership(m, now)
+        m['days_remaining'] = days_remaining(m['end_date'], now)
         
         result_memberships.append(m)
     
@@ -1685,8 +2022,7 @@ async def get_public_services():
     """Public endpoint untuk menampilkan services di landing page"""
     if db is None:
         raise HTTPException(status_code=503, detail="Database service unavailable")
-    services = await db.services.find({"is_active": True}, {"_id": 0}).to_list(1000)
-    return services
+    return await get_active_services()
 
 # Routes - Promotions
 @api_router.get("/promotions", response_model=List[Promotion])
@@ -1722,6 +2058,7 @@ async def create_promotion(promo_data: PromotionCreate, current_user: User = Dep
     doc['created_at'] = doc['created_at'].isoformat()
     
     await db.promotions.insert_one(doc)
+    await cache_bus.publish("promotions")
     return promo
 
 @api_router.put("/promotions/{promo_id}")
@@ -1746,6 +2083,7 @@ async def update_promotion(promo_id: str, update_data: PromotionUpdate, current_
         filtered_data['end_date'] = filtered_data['end_date'].isoformat()
         
     await db.promotions.update_one({"id": promo_id}, {"$set": filtered_data})
+    await cache_bus.publish("promotions")
     
     return {"message": "Promotion updated successfully"}
 
@@ -1757,59 +2095,13 @@ async def delete_promotion(promo_id: str, current_user: User = Depends(get_curre
     result = await db.promotions.delete_one({"id": promo_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Promotion not found")
+    await cache_bus.publish("promotions")
         
     return {"message": "Promotion deleted successfully"}
 
 @api_router.post("/promotions/validate")
 async def validate_promotion(request: ValidatePromoRequest, current_user: User = Depends(get_current_user)):
-    code = request.code
-    subtotal = request.subtotal
-    
-    promo = await db.promotions.find_one({"code": code, "is_active": True}, {"_id": 0})
-    if not promo:
-        raise HTTPException(status_code=404, detail="Invalid promotion code")
-        
-    # Check expiry
-    start_date = datetime.fromisoformat(promo['start_date']) if isinstance(promo['start_date'], str) else promo['start_date']
-    end_date = datetime.fromisoformat(promo['end_date']) if isinstance(promo['end_date'], str) else promo['end_date']
-    
-    # Fix: Ensure comparison works. 
-    # Use timezone.utc if dates are aware, or naive if naive. 
-    # Since we store as isoformat from datetime.now(timezone.utc), they are offset-aware if parsed correct.
-    # fromisoformat handles offsets.
-    
-    now_utc = datetime.now(timezone.utc)
-    
-    # Ensure start_date/end_date are aware
-    if start_date.tzinfo is None:
-        start_date = start_date.replace(tzinfo=timezone.utc)
-    if end_date.tzinfo is None:
-        end_date = end_date.replace(tzinfo=timezone.utc)
-    
-    if now_utc < start_date:
-        raise HTTPException(status_code=400, detail="Promotion has not started yet")
-    if now_utc > end_date:
-        raise HTTPException(status_code=400, detail="Promotion expired")
-        
-    # Check limit
-    if promo.get('usage_limit') is not None and promo['usage_count'] >= promo['usage_limit']:
-        raise HTTPException(status_code=400, detail="Promotion usage limit reached")
-        
-    # Check min purchase
-    if subtotal < promo['min_purchase']:
-        raise HTTPException(status_code=400, detail=f"Minimum purchase Rp {promo['min_purchase']} required")
-        
-    # Calculate discount
-    discount_amount = 0
-    if promo['promotion_type'] == PromotionType.FIXED_AMOUNT:
-        discount_amount = promo['value']
-    else:
-        discount_amount = (promo['value'] / 100) * subtotal
-        if promo.get('max_discount'):
-             discount_amount = min(discount_amount, promo['max_discount'])
-             
-    # Cap at subtotal
-    discount_amount = min(discount_amount, subtotal)
+    promo, discount_amount = await check_promotion(request.code, request.subtotal)
     
     return {
         "valid": True,
@@ -1817,63 +2109,12 @@ async def validate_promotion(request: ValidatePromoRequest, current_user: User =
         "discount_amount": discount_amount
     }
 
-# Include router
-# Routes - Notifications (WhatsApp)
-@api_router.post("/notifications/send-receipt")
-async def send_receipt_notification(request: SendReceiptRequest, current_user: User = Depends(get_current_user)):
-    transaction = await db.transactions.find_one({"id": request.transaction_id}, {"_id": 0})
-    if not transaction:
-        raise HTTPException(status_code=404, detail="Transaction not found")
-    
-    # Format message
-    items_str = "\n".join([f"- {item.get('name', 'Item')} x{item['quantity']}" for item in transaction['items']])
-    message = f"""*OTOPIA Car Wash*
-Invoice: {transaction['invoice_number']}
-Tanggal: {transaction['created_at'].strftime('%d/%m/%Y %H:%M') if isinstance(transaction['created_at'], datetime) else transaction['created_at']}
-
-Detail:
-{items_str}
-
-Total: Rp {transaction['total']:,}
-Metode: {transaction['payment_method']}
-
-Terima kasih atas kunjungan Anda!"""
-
-    await NotificationService.send_whatsapp(request.phone, message)
-    return {"message": "Receipt sent to WhatsApp"}
-
-@api_router.post("/notifications/check-expiring")
-async def check_expiring_memberships_notification(current_user: User = Depends(get_current_user)):
-    # Find memberships expiring in exactly 3 days
-    now = datetime.now(timezone.utc)
-    target_date = now + timedelta(days=3)
-    start_of_day = target_date.replace(hour=0, minute=0, second=0, microsecond=0)
-    end_of_day = target_date.replace(hour=23, minute=59, second=59, microsecond=999)
-    
-    # This query is simplified; in reality stored dates might be strings or objects
-    # Assuming ISO format strings for simplicity based on previous code
-    
-    memberships = await db.memberships.find({
-        "status": "active",
-        "end_date": {"$gte": start_of_day.isoformat(), "$lte": end_of_day.isoformat()}
-    }).to_list(100)
-    
-    count = 0
-    for m in memberships:
-        customer = await db.customers.find_one({"id": m['customer_id']}, {"_id": 0})
-        if customer and customer.get('phone'):
-            msg = f"Halo {customer['name']}, Membership {m['membership_type']} Anda di OTOPIA akan berakhir pada {m['end_date']}. Segera perpanjang!"
-            await NotificationService.send_whatsapp(customer['phone'], msg)
-            count += 1
-            
-    return {"message": f"Sent {count} reminders"}
-
 # Expenses Endpoints
 @api_router.get("/expenses", response_model=List[Expense])
-async def get_expenses():
+async def get_expenses(scope: dict = Depends(outlet_scope)):
     if db is None:
         raise HTTPException(status_code=503, detail="Database service unavailable")
-    expenses = await db.expenses.find().sort("date", -1).to_list(1000)
+    expenses = await db.expenses.find(scope).sort("date", -1).to_list(1000)
     for expense in expenses:
         if isinstance(expense.get('date'), str):
             expense['date'] = datetime.fromisoformat(expense['date'])
@@ -1881,10 +2122,12 @@ async def get_expenses():
 
 @api_router.post("/expenses", response_model=Expense)
 async def create_expense(expense: Expense, current_user: User = Depends(get_current_user)):
+    expense.created_by = current_user.full_name
+    expense.outlet_id = current_user.outlet_id or expense.outlet_id
     doc = expense.model_dump()
     doc['date'] = doc['date'].isoformat()
-    doc['created_by'] = current_user.full_name
     await db.expenses.insert_one(doc)
+    await cache_bus.publish("expenses")
     return expense
 
 @api_router.delete("/expenses/{expense_id}")
@@ -1892,14 +2135,15 @@ async def delete_expense(expense_id: str, current_user: User = Depends(get_curre
     result = await db.expenses.delete_one({"id": expense_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Expense not found")
+    await cache_bus.publish("expenses")
     return {"status": "success"}
 
 # Routes - Commission Payouts
 @api_router.get("/payouts", response_model=List[CommissionPayout])
-async def get_payouts():
+async def get_payouts(current_user: User = Depends(get_current_user), scope: dict = Depends(outlet_scope)):
     if db is None:
         raise HTTPException(status_code=503, detail="Database service unavailable")
-    payouts = await db.payouts.find().sort("date", -1).to_list(1000)
+    payouts = await db.payouts.find(scope, {"_id": 0}).sort("date", -1).to_list(1000)
     for p in payouts:
         if isinstance(p.get('date'), str):
             p['date'] = datetime.fromisoformat(p['date'])
@@ -1907,6 +2151,7 @@ async def get_payouts():
 
 @api_router.post("/payouts", response_model=CommissionPayout)
 async def create_payout(payout: CommissionPayout, current_user: User = Depends(get_current_user)):
+    payout.outlet_id = current_user.outlet_id or payout.outlet_id
     doc = payout.model_dump()
     doc['date'] = doc['date'].isoformat()
     doc['created_by'] = current_user.full_name
@@ -1924,11 +2169,14 @@ async def create_payout(payout: CommissionPayout, current_user: User = Depends(g
         amount=payout.amount,
         description=f"Commission Payout for {payout.user_id} - {payout.notes or ''}",
         created_by=current_user.full_name,
-        date=payout.date
+        outlet_id=payout.outlet_id,
+        date=payout.date,
+        payout_id=payout.id
     )
     exp_doc = expense.model_dump()
     exp_doc['date'] = exp_doc['date'].isoformat()
     await db.expenses.insert_one(exp_doc)
+    await cache_bus.publish("payouts")
     
     return payout
 
@@ -1953,7 +2201,9 @@ async def get_landing_config():
         # Better to return default so landing page works partially
         return LandingPageConfig()
     
-    config = await db.landing_config.find_one({"id": "default"}, {"_id": 0})
+    config = await landing_cache.get_or_compute(
+        "default", lambda: db.landing_config.find_one({"id": "default"}, {"_id": 0})
+    )
     if not config:
         # Return default defaults if not found
         return LandingPageConfig()
@@ -1972,92 +2222,10 @@ async def update_landing_config(config_data: LandingPageConfig, current_user: Us
         {"$set": config_dict},
         upsert=True
     )
+    await cache_bus.publish("landing_config")
     
     return config_data
 
-# ============================================
-# WhatsApp Endpoints
-# ============================================
-
-@api_router.get("/whatsapp/status")
-async def get_whatsapp_status(current_user: User = Depends(get_current_user)):
-    """Get WhatsApp service connection status"""
-    try:
-        status = whatsapp.get_status()
-        return status
-    except Exception as e:
-        return {
-            "status": "error",
-            "whatsapp_ready": False,
-            "error": str(e)
-        }
-
-@api_router.post("/whatsapp/send-test")
-async def send_test_whatsapp(
-    phone: str,
-    message: str = "Test message from OTOPIA Car Wash POS",
-    current_user: User = Depends(get_current_user)
-):
-    """Send test WhatsApp message"""
-    if current_user.role not in ['owner', 'manager']:
-        raise HTTPException(status_code=403, detail="Not authorized")
-    
-    try:
-        result = whatsapp.send_message(phone, message)
-        return result
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
-# Duplicate return statement issue (line 1877), keeping only the latest config_data return
-# Removed: return {"message": f"Sent reminders to {count} customers"}
-
-# ============================================
-# Notifications Endpoints
-# ============================================
-
-class SendReceiptRequest(BaseModel):
-    transaction_id: str
-    phone: str
-
-@api_router.post("/notifications/send-receipt")
-async def send_receipt_notification(
-    request: SendReceiptRequest,
-    current_user: User = Depends(get_current_user)
-):
-    """Send WhatsApp receipt for a transaction"""
-    try:
-        # Get transaction details
-        transaction = await db.transactions.find_one({"id": request.transaction_id}, {"_id": 0})
-        if not transaction:
-            raise HTTPException(status_code=404, detail="Transaction not found")
-        
-        # Prepare items for receipt
-        receipt_items = []
-        for item in transaction.get('items', []):
-            receipt_items.append({
-                'name': item.get('service_name', 'Unknown'),
-                'quantity': item.get('quantity', 1),
-                'price': item.get('price', 0)
-            })
-        
-        # Send via WhatsApp
-        result = whatsapp.send_receipt(
-            phone=request.phone,
-            transaction=transaction,
-            items=receipt_items
-        )
-        
-        if result.get('success'):
-            return {"success": True, "message": f"Receipt sent to {request.phone}"}
-        else:
-            raise HTTPException(status_code=500, detail=result.get('error', 'Failed to send WhatsApp'))
-            
-    except HTTPException:
-        raise
-    except Exception as e:
-        logging.error(f"Failed to send receipt: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
-
 @api_router.get("/shifts/{shift_id}/details")
 async def get_shift_details(shift_id: str, current_user: User = Depends(get_current_user)):
     shift = await db.shifts.find_one({"id": shift_id}, {"_id": 0})
@@ -2076,13 +2244,13 @@ async def get_shift_details(shift_id: str, current_user: User = Depends(get_curr
     else:
         end_time = datetime.now(timezone.utc)
         
-    # Query transactions
-    transactions = await db.transactions.find({
-        "created_at": {
-            "$gte": start_time.isoformat() if isinstance(start_time, datetime) else start_time,
-            "$lte": end_time.isoformat() if isinstance(end_time, datetime) else end_time
-        }
-    }, {"_id": 0}).sort("created_at", -1).to_list(1000)
+    # Query transactions (of the shift's outlet; old shifts read the archive)
+    transactions = await find_transactions(
+        db,
+        outlet_transaction_filter(shift.get('outlet_id')),
+        start=start_time.isoformat() if isinstance(start_time, datetime) else start_time,
+        end=end_time.isoformat() if isinstance(end_time, datetime) else end_time
+    )
     
     # Calculate summary from actual transactions
     total_revenue = 0
@@ -2109,17 +2277,88 @@ async def get_shift_details(shift_id: str, current_user: User = Depends(get_curr
 
 app.include_router(api_router)
 
+# Route groups kept out of the import path; see lazy_routes
+route_groups = [
+    LazyRoutes("/api/notifications", "notification_routes"),
+    LazyRoutes("/api/whatsapp", "notification_routes"),
+    LazyRoutes("/api/admin", "admin_routes"),
+    LazyRoutes("/api/reports", "report_routes"),
+]
+add_lazy_routes(app, route_groups)
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def create_indexes():
+    if db is None:
+        return
+    await ensure_indexes(db)
+    # Flag items written before is_low_stock existed
+    await stock_alerts.refresh_flags(db, publish=False)
+    await refresh_promotions()
+
+@app.on_event("startup")
+async def warm_db_pool():
+    # Serverless instances skip this: it would only add to the cold start
+    if db is None or SERVERLESS:
+        return
+    min_size = db.client_kwargs.get("minPoolSize", DEFAULT_MIN_POOL_SIZE)
+    try:
+        pool_state["warm"] = await warm_pool(db, pool_listener, min_size, timeout=POOL_WARMUP_TIMEOUT)
+    except Exception as e:
+        logger.error(f"Connection pool warm-up failed: {e}")
+        return
+    if pool_state["warm"]:
+        logger.info(f"Connection pool warm ({pool_listener.open} connections)")
+    else:
+        logger.warning(f"Connection pool reached {pool_listener.open}/{min_size} connections before warm-up timed out")
+
+@app.on_event("startup")
+async def load_route_groups():
+    if not SERVERLESS:
+        load_all(app, route_groups)
+
+@app.on_event("startup")
+async def start_cache_bus():
+    await cache_bus.start()
+
+@app.on_event("startup")
+async def start_slow_query_log():
+    slow_query_listener.start(db)
+
+# Daily stock snapshots (see stock_ledger); 0 disables
+stock_snapshots = SnapshotScheduler(db, interval=float(os.environ.get('STOCK_SNAPSHOT_INTERVAL', '3600')))
+
+@app.on_event("startup")
+async def start_stock_snapshots():
+    if not SERVERLESS:
+        stock_snapshots.start()
+
+loop_monitor = LoopMonitor(
+    interval=float(os.environ.get('LOOP_MONITOR_INTERVAL', '0.5')),
+    threshold=float(os.environ.get('LOOP_BLOCK_THRESHOLD_MS', '100')) / 1000
+)
+
+@app.on_event("startup")
+async def start_loop_monitor():
+    loop_monitor.start()
+    if os.environ.get('LOOP_BLOCKING_DEBUG', 'false').lower() == 'true':
+        install_blocking_call_detector()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
+    await cache_bus.stop()
+    await slow_query_listener.stop()
+    await loop_monitor.stop()
+    await stock_snapshots.stop()
+    if db is not None:
+        db.close()
 
 if __name__ == '__main__':
-    import uvicorn
-    print(' Starting OTOPIA Car Wash Backend...')
-    uvicorn.run(app, host='0.0.0.0', port=8000, log_level='info')
+    # Workers, uvloop/httptools and graceful shutdown are set up by the launcher
+    from run_server import main
+    main()
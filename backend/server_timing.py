@@ -0,0 +1,153 @@
+"""
+Server Timing Module
+Adds a Server-Timing header to every response, breaking request time into
+auth, database, handler and serialization, with the number of MongoDB
+round-trips the request made. Visible in the browser devtools network tab.
+"""
+
+import functools
+import json
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from pymongo import monitoring
+
+from metrics import command_collection
+
+DEBUG_HEADER = b"x-debug-timing"
+
+
+class RequestTiming:
+    """Timings collected while serving one request"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.handler_end: Optional[float] = None
+        self.sections: Dict[str, float] = {}  # name -> seconds
+        self.db_count = 0
+        self.db_seconds = 0.0
+        self.db_commands: Dict[str, int] = {}  # "collection.command" -> count
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float):
+        self.sections[name] = self.sections.get(name, 0.0) + seconds
+
+    def count_command(self, key: str):
+        # Commands run on driver threads, possibly several at once
+        with self._lock:
+            self.db_count += 1
+            self.db_commands[key] = self.db_commands.get(key, 0) + 1
+
+    def add_db_time(self, seconds: float):
+        with self._lock:
+            self.db_seconds += seconds
+
+    def header_value(self, now: float) -> str:
+        entries = [f'{name};dur={seconds * 1000:.2f}' for name, seconds in self.sections.items()]
+        entries.append(f'db;dur={self.db_seconds * 1000:.2f};desc="{self.db_count} round-trips"')
+        if self.handler_end is not None:
+            entries.append(f'handler;dur={(self.handler_end - self.start) * 1000:.2f}')
+            entries.append(f'serialize;dur={(now - self.handler_end) * 1000:.2f}')
+        entries.append(f'total;dur={(now - self.start) * 1000:.2f}')
+        return ", ".join(entries)
+
+    def debug_value(self, now: float) -> str:
+        return json.dumps({
+            "total_ms": round((now - self.start) * 1000, 2),
+            "sections_ms": {k: round(v * 1000, 2) for k, v in self.sections.items()},
+            "db_ms": round(self.db_seconds * 1000, 2),
+            "db_round_trips": self.db_count,
+            "db_commands": self.db_commands
+        })
+
+
+current_timing: ContextVar[Optional[RequestTiming]] = ContextVar("current_timing", default=None)
+
+
+class timed_section:
+    """Context manager adding elapsed time to a named section of the current request"""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        timing = current_timing.get()
+        if timing is not None:
+            timing.add(self.name, time.perf_counter() - self.started)
+        return False
+
+
+def timed_endpoint(endpoint):
+    """Wrap a route endpoint to mark when it returns, so serialization can be timed"""
+
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        try:
+            return await endpoint(*args, **kwargs)
+        finally:
+            timing = current_timing.get()
+            if timing is not None:
+                timing.handler_end = time.perf_counter()
+
+    return wrapper
+
+
+class ServerTimingMiddleware:
+    """ASGI middleware that adds the Server-Timing header (and optional debug JSON)"""
+
+    def __init__(self, app, debug: bool = False):
+        self.app = app
+        self.debug = debug
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timing = RequestTiming()
+        token = current_timing.set(timing)
+        debug = self.debug or any(name == DEBUG_HEADER for name, _ in scope["headers"])
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                now = time.perf_counter()
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timing.header_value(now).encode()))
+                if debug:
+                    headers.append((b"x-timing-debug", timing.debug_value(now).encode()))
+                message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_timing.reset(token)
+
+
+class TimingCommandListener(monitoring.CommandListener):
+    """Feeds MongoDB command counts and durations into the current request's timing"""
+
+    def started(self, event):
+        timing = current_timing.get()
+        if timing is not None:
+            timing.count_command(f"{command_collection(event.command_name, event.command)}.{event.command_name}")
+
+    def succeeded(self, event):
+        self._add_time(event)
+
+    def failed(self, event):
+        self._add_time(event)
+
+    def _add_time(self, event):
+        timing = current_timing.get()
+        if timing is not None:
+            timing.add_db_time(event.duration_micros / 1e6)
+
+
+timing_listener = TimingCommandListener()
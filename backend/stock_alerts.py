@@ -0,0 +1,152 @@
+"""
+Stock Alerts Module
+Maintains inventory.is_low_stock (current_stock <= min_stock) inside the same
+atomic update that changes the stock or the threshold, so low-stock lists
+and counts are reads of a small partial index instead of inventory scans.
+
+Every write that moves an item across its threshold publishes an event:
+    {"inventory_id", "name", "outlet_id", "direction": "low" | "restocked",
+     "current_stock", "min_stock", "created_at"}
+Events are stored in `stock_alerts` (kept 30 days), so an alerting process
+can follow them with a change stream (see watch) instead of polling, and are
+handed to in-process subscribers (the dashboard) straight away.
+"""
+
+import asyncio
+import inspect
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from pymongo import ReturnDocument
+
+ALERTS_COLLECTION = "stock_alerts"
+ALERT_RETENTION_DAYS = 30
+
+LOW = "low"
+RESTOCKED = "restocked"
+
+# Evaluated by the server against the updated document
+LOW_STOCK_EXPR = {"$lte": ["$current_stock", "$min_stock"]}
+SET_LOW_STOCK = {"$set": {"is_low_stock": LOW_STOCK_EXPR}}
+
+ITEM_PROJECTION = {"_id": 0, "id": 1, "name": 1, "outlet_id": 1, "current_stock": 1, "min_stock": 1, "is_low_stock": 1}
+
+logger = logging.getLogger(__name__)
+
+
+def literal_set(fields: Dict) -> Dict:
+    """
+    $set stage for an update pipeline that stores the values as given; a
+    pipeline would otherwise read "$5 wax" as a field path and a dict value
+    as an expression
+    """
+    return {"$set": {field: {"$literal": value} for field, value in fields.items()}}
+
+
+def is_low(item: Dict) -> bool:
+    return item.get("current_stock", 0) <= item.get("min_stock", 0)
+
+
+def crossing(before: Dict, after: Dict) -> Optional[Dict]:
+    """Alert event when an item moved across its threshold, else None"""
+    was_low = before.get("is_low_stock", is_low(before))
+    now_low = is_low(after)
+    if was_low == now_low:
+        return None
+    now = datetime.now(timezone.utc)
+    return {
+        "id": str(uuid.uuid4()),
+        "inventory_id": after["id"],
+        "name": after.get("name"),
+        "outlet_id": after.get("outlet_id"),
+        "direction": LOW if now_low else RESTOCKED,
+        "current_stock": after.get("current_stock", 0),
+        "min_stock": after.get("min_stock", 0),
+        "created_at": now.isoformat(),
+        "expires_at": now + timedelta(days=ALERT_RETENTION_DAYS)
+    }
+
+
+class StockAlerts:
+    """Applies stock and threshold changes and publishes threshold crossings"""
+
+    def __init__(self):
+        self._subscribers: List[Callable[[List[Dict]], Optional[Awaitable]]] = []
+
+    def subscribe(self, callback: Callable[[List[Dict]], Optional[Awaitable]]):
+        """
+        callback(events) runs in-process after each write that crossed a
+        threshold; coroutine callbacks are awaited
+        """
+        self._subscribers.append(callback)
+
+    async def publish(self, db, events: List[Dict]):
+        events = [e for e in events if e]
+        if not events:
+            return
+        await db[ALERTS_COLLECTION].insert_many([dict(e) for e in events])
+        for callback in self._subscribers:
+            try:
+                result = callback(events)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.error(f"Stock alert subscriber failed: {e}")
+
+    async def apply_changes(self, db, changes: Dict[str, float]) -> List[Dict]:
+        """$inc current_stock per item, updating is_low_stock in the same write"""
+        async def apply(inventory_id: str, change: float):
+            before = await db.inventory.find_one_and_update(
+                {"id": inventory_id},
+                [{"$set": {"current_stock": {"$add": ["$current_stock", change]}}}, SET_LOW_STOCK],
+                projection=ITEM_PROJECTION,
+                return_document=ReturnDocument.BEFORE
+            )
+            if before is None:
+                return None
+            return crossing(before, {**before, "current_stock": before["current_stock"] + change})
+
+        events = await asyncio.gather(*[apply(i, c) for i, c in changes.items() if c])
+        await self.publish(db, list(events))
+        return [e for e in events if e]
+
+    async def update_item(self, db, inventory_id: str, fields: Dict) -> Optional[Dict]:
+        """$set fields (e.g. min_stock) on an item, updating is_low_stock in the same write"""
+        before = await db.inventory.find_one_and_update(
+            {"id": inventory_id},
+            [literal_set(fields), SET_LOW_STOCK],
+            projection=ITEM_PROJECTION,
+            return_document=ReturnDocument.BEFORE
+        )
+        if before is None:
+            return None
+        event = crossing(before, {**before, **fields})
+        await self.publish(db, [event])
+        return event
+
+    async def refresh_flags(self, db, query: Optional[Dict] = None, publish: bool = True) -> int:
+        """
+        Recompute is_low_stock where it is missing or stale (bulk imports,
+        items written before the flag existed); returns how many changed
+        """
+        stale = {"$expr": {"$ne": [{"$ifNull": ["$is_low_stock", None]}, LOW_STOCK_EXPR]}, **(query or {})}
+        items = await db.inventory.find(stale, ITEM_PROJECTION).to_list(None)
+        if not items:
+            return 0
+        await db.inventory.update_many({"id": {"$in": [item["id"] for item in items]}}, [SET_LOW_STOCK])
+        if publish:
+            await self.publish(db, [crossing(item, item) for item in items if "is_low_stock" in item])
+        return len(items)
+
+
+async def watch(db):
+    """Follow alert events as they are published (change streams need a replica set)"""
+    async with db[ALERTS_COLLECTION].watch([{"$match": {"operationType": "insert"}}]) as stream:
+        async for change in stream:
+            yield change["fullDocument"]
+
+
+# Global instance
+stock_alerts = StockAlerts()
@@ -0,0 +1,257 @@
+"""
+Stock Ledger Module
+Append-only record of every stock movement (sales, membership washes,
+adjustments, corrections, opening stock) plus daily snapshots of every
+item's level, so historical stock can be answered without replaying the
+whole history.
+
+- stock_movements: one document per change, written before current_stock is $inc'ed
+- stock_snapshots: levels at each UTC midnight, with the consumption since
+  the previous snapshot; the first ("opening") snapshot is taken from
+  current_stock when the ledger starts
+
+"Stock on date X" reads the latest snapshot at or before X plus the
+movements after it (at most a day's worth). Weekly consumption sums the
+daily snapshots' consumption plus the movements since the last one.
+"""
+
+import asyncio
+import logging
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional
+
+from pymongo import DESCENDING
+from pymongo.errors import DuplicateKeyError
+
+from stock_alerts import stock_alerts
+
+MOVEMENTS_COLLECTION = "stock_movements"
+SNAPSHOTS_COLLECTION = "stock_snapshots"
+OPENING_SNAPSHOT = "opening"
+
+# Movement reasons
+SALE = "sale"
+MEMBERSHIP_USAGE = "membership_usage"
+ADJUSTMENT = "adjustment"
+CORRECTION = "correction"
+OPENING = "opening"
+
+# Movements that count as consumption (stock used up by washes and sales)
+CONSUMPTION_REASONS = (SALE, MEMBERSHIP_USAGE)
+
+logger = logging.getLogger(__name__)
+
+
+class LedgerError(Exception):
+    """Stock history that the ledger cannot answer"""
+
+
+def movement(inventory_id: str, change: float, reason: str, ref_id: Optional[str] = None,
+             user_id: Optional[str] = None, outlet_id: Optional[str] = None,
+             note: Optional[str] = None, now: Optional[datetime] = None) -> Dict:
+    """A ledger entry; change is signed (negative for stock used or removed)"""
+    return {
+        "id": str(uuid.uuid4()),
+        "inventory_id": inventory_id,
+        "change": change,
+        "reason": reason,
+        "ref_id": ref_id,
+        "user_id": user_id,
+        "outlet_id": outlet_id,
+        "note": note,
+        "created_at": (now or datetime.now(timezone.utc)).isoformat()
+    }
+
+
+async def record_movements(db, movements: List[Dict], apply: bool = True) -> List[Dict]:
+    """
+    Append movements to the ledger, then apply them to inventory.current_stock
+
+    The ledger is written first: if the $inc fails afterwards, current_stock
+    can be rebuilt from the last snapshot and the ledger, never the reverse.
+    apply=False only records stock that is already in current_stock (opening stock).
+    Returns the low-stock threshold crossings the movements caused (see stock_alerts).
+    """
+    if not movements:
+        return []
+    # insert_many adds _id to the documents it is given
+    await db[MOVEMENTS_COLLECTION].insert_many([dict(m) for m in movements], ordered=False)
+    if not apply:
+        return []
+    changes: Dict[str, float] = defaultdict(float)
+    for m in movements:
+        changes[m["inventory_id"]] += m["change"]
+    return await stock_alerts.apply_changes(db, changes)
+
+
+# Snapshots
+
+async def latest_snapshot(db, at: str) -> Optional[Dict]:
+    return await db[SNAPSHOTS_COLLECTION].find_one({"taken_at": {"$lte": at}}, sort=[("taken_at", DESCENDING)])
+
+
+async def movement_totals(db, after: str, until: str, inventory_ids: Optional[Iterable[str]] = None) -> Dict[str, Dict]:
+    """inventory id -> net change and consumption over (after, until]"""
+    match = {"created_at": {"$gt": after, "$lte": until}}
+    if inventory_ids is not None:
+        match["inventory_id"] = {"$in": list(inventory_ids)}
+    rows = await db[MOVEMENTS_COLLECTION].aggregate([
+        {"$match": match},
+        {"$group": {
+            "_id": "$inventory_id",
+            "change": {"$sum": "$change"},
+            "consumed": {"$sum": {"$cond": [{"$in": ["$reason", list(CONSUMPTION_REASONS)]}, {"$multiply": ["$change", -1]}, 0]}}
+        }}
+    ]).to_list(None)
+    return {row["_id"]: row for row in rows}
+
+
+async def opening_snapshot(db, now: Optional[datetime] = None) -> bool:
+    """Start the ledger from current_stock; does nothing once a ledger exists"""
+    items = await db.inventory.find({}, {"_id": 0, "id": 1, "current_stock": 1}).to_list(None)
+    try:
+        await db[SNAPSHOTS_COLLECTION].insert_one({
+            "_id": OPENING_SNAPSHOT,
+            "taken_at": (now or datetime.now(timezone.utc)).isoformat(),
+            "levels": {item["id"]: item.get("current_stock", 0) for item in items},
+            "consumed": {}
+        })
+        return True
+    except DuplicateKeyError:
+        return False
+
+
+async def take_snapshot(db, at: datetime) -> Dict:
+    """Levels at `at`: the previous snapshot plus the movements since (idempotent per instant)"""
+    at_iso = at.isoformat()
+    previous = await latest_snapshot(db, at_iso)
+    if previous is None:
+        raise LedgerError(f"No stock snapshot before {at_iso}")
+    if previous["taken_at"] == at_iso:
+        return previous
+
+    totals = await movement_totals(db, previous["taken_at"], at_iso)
+    levels = dict(previous["levels"])
+    for inventory_id, total in totals.items():
+        levels[inventory_id] = levels.get(inventory_id, 0) + total["change"]
+    snapshot = {
+        "_id": at_iso,
+        "taken_at": at_iso,
+        "levels": levels,
+        "consumed": {inventory_id: t["consumed"] for inventory_id, t in totals.items() if t["consumed"]}
+    }
+    try:
+        await db[SNAPSHOTS_COLLECTION].insert_one(snapshot)
+    except DuplicateKeyError:
+        # Another worker took the same snapshot
+        pass
+    return snapshot
+
+
+async def catch_up_snapshots(db, now: Optional[datetime] = None) -> int:
+    """Take the daily (UTC midnight) snapshots missing since the last one; returns how many"""
+    now = now or datetime.now(timezone.utc)
+    last = await db[SNAPSHOTS_COLLECTION].find_one({}, sort=[("taken_at", DESCENDING)])
+    if last is None:
+        await opening_snapshot(db, now)
+        return 0
+
+    last_at = datetime.fromisoformat(last["taken_at"])
+    day = last_at.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    taken = 0
+    while day <= now:
+        await take_snapshot(db, day)
+        day += timedelta(days=1)
+        taken += 1
+    return taken
+
+
+class SnapshotScheduler:
+    """Background task keeping the daily snapshots up to date"""
+
+    def __init__(self, db, interval: float = 3600):
+        self.db = db
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self.db is None or self.interval <= 0 or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                taken = await catch_up_snapshots(self.db)
+                if taken:
+                    logger.info(f"Took {taken} stock snapshot(s)")
+            except Exception as e:
+                logger.warning(f"Stock snapshot failed: {e}")
+            await asyncio.sleep(self.interval)
+
+
+# Queries
+
+async def stock_on(db, at: str, inventory_ids: Optional[Iterable[str]] = None) -> Dict:
+    """Stock levels at `at` (ISO): one snapshot plus the movements after it"""
+    snapshot = await latest_snapshot(db, at)
+    if snapshot is None:
+        raise LedgerError(f"No stock history before {at}")
+    ids = list(inventory_ids) if inventory_ids is not None else None
+    totals = await movement_totals(db, snapshot["taken_at"], at, ids)
+    levels = snapshot["levels"] if ids is None else {i: snapshot["levels"].get(i, 0) for i in ids}
+    levels = dict(levels)
+    for inventory_id, total in totals.items():
+        levels[inventory_id] = levels.get(inventory_id, 0) + total["change"]
+    return {"snapshot_at": snapshot["taken_at"], "levels": levels}
+
+
+def week_start(moment: datetime) -> str:
+    """Monday of the moment's (UTC) week"""
+    return (moment - timedelta(days=moment.weekday())).strftime("%Y-%m-%d")
+
+
+async def weekly_consumption(db, start: str, end: str, inventory_ids: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, float]]:
+    """
+    Week (Monday) -> inventory id -> quantity consumed in [start, end)
+
+    Built from the daily snapshots' consumption, so it is day-granular: a
+    snapshot taken at midnight holds the previous day's usage. Usage since
+    the last snapshot is read from the ledger.
+    """
+    ids = set(inventory_ids) if inventory_ids is not None else None
+    weeks: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+
+    def add(day: datetime, consumed: Dict[str, float]):
+        for inventory_id, quantity in consumed.items():
+            if ids is None or inventory_id in ids:
+                weeks[week_start(day)][inventory_id] += quantity
+
+    # Snapshot at D 00:00 covers day D-1, so the window shifts by a day
+    snapshots = db[SNAPSHOTS_COLLECTION].find(
+        {"taken_at": {"$gt": start, "$lte": end}, "_id": {"$ne": OPENING_SNAPSHOT}},
+        {"taken_at": 1, "consumed": 1}
+    ).sort("taken_at", 1)
+    last_taken = None
+    async for snapshot in snapshots:
+        last_taken = snapshot["taken_at"]
+        add(datetime.fromisoformat(last_taken) - timedelta(days=1), snapshot["consumed"])
+
+    # Today's usage, not in a snapshot yet
+    tail_from = last_taken or (await latest_snapshot(db, end) or {}).get("taken_at")
+    if tail_from and tail_from < end:
+        totals = await movement_totals(db, max(tail_from, start), end, ids)
+        add(datetime.fromisoformat(max(tail_from, start)), {i: t["consumed"] for i, t in totals.items() if t["consumed"]})
+
+    return {week: dict(items) for week, items in sorted(weeks.items())}
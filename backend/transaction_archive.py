@@ -0,0 +1,356 @@
+"""
+Transaction Archive Module
+Keeps the hot `transactions` collection down to recent history. Older
+transactions are moved into one archive collection per month
+(transactions_archive_2024_01) or into gzipped NDJSON files, and reads that
+reach past the hot data fan out to the archived months they cover.
+
+Archived months are listed in `archive_months`:
+    {"_id": "2024-01", "storage": "collection" | "ndjson", "collection" | "path": ..., "count": n}
+
+Queries hit the hot collection first and then each month, newest first, so
+results come back in created_at descending order without a merge: the
+archiver only ever moves documents older than everything left behind.
+Aggregations span archived collections with $unionWith; months stored as
+NDJSON must be restored to a collection before they can be aggregated.
+"""
+
+import asyncio
+import gzip
+import json
+import os
+import shutil
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import BulkWriteError
+
+from cache_helper import TTLCache
+
+HOT_COLLECTION = "transactions"
+MONTHS_COLLECTION = "archive_months"
+ARCHIVE_PREFIX = "transactions_archive_"
+
+# Reads without a start open archived months this far back only, not every
+# one (NDJSON months are decompressed and scanned in full)
+DEFAULT_LOOKBACK_DAYS = 365
+
+# Months change only when the archiver runs; it publishes MONTHS_COLLECTION
+# on the cache bus so every worker drops this straight away
+months_cache = TTLCache(ttl=300)
+
+
+class ArchiveError(Exception):
+    """An archive operation or query that cannot be carried out"""
+
+
+def archive_collection_name(month: str) -> str:
+    """'2024-01' -> 'transactions_archive_2024_01'"""
+    return ARCHIVE_PREFIX + month.replace("-", "_")
+
+
+def month_bounds(month: str):
+    """ISO strings for the first instant of the month and of the next month"""
+    year, number = int(month[:4]), int(month[5:7])
+    start = datetime(year, number, 1, tzinfo=timezone.utc)
+    end = datetime(year + number // 12, number % 12 + 1, 1, tzinfo=timezone.utc)
+    return start.isoformat(), end.isoformat()
+
+
+def in_range(month: str, start: Optional[str], end: Optional[str]) -> bool:
+    month_start, month_end = month_bounds(month)
+    return (start is None or start < month_end) and (end is None or end > month_start)
+
+
+async def archived_months(db) -> List[Dict]:
+    """Archived months, newest first"""
+    return await months_cache.get_or_compute(
+        "months", lambda: db[MONTHS_COLLECTION].find({}).sort("_id", DESCENDING).to_list(None)
+    )
+
+
+# Reading
+
+def matches(doc: Dict, query: Dict) -> bool:
+    """
+    Evaluate a find() filter against a document read from an NDJSON archive.
+    Supports equality and $gt/$gte/$lt/$lte/$in/$ne, which covers the
+    filters the API builds; anything else raises ArchiveError.
+    """
+    for field, condition in query.items():
+        value = doc.get(field)
+        if not isinstance(condition, dict):
+            if value != condition:
+                return False
+            continue
+        for op, arg in condition.items():
+            if op == "$in":
+                ok = value in arg
+            elif op == "$ne":
+                ok = value != arg
+            elif op in ("$gt", "$gte", "$lt", "$lte"):
+                if value is None:
+                    return False
+                ok = {"$gt": value > arg, "$gte": value >= arg, "$lt": value < arg, "$lte": value <= arg}[op]
+            else:
+                raise ArchiveError(f"Operator {op} is not supported on NDJSON archives")
+            if not ok:
+                return False
+    return True
+
+
+def read_ndjson(path: str, query: Dict) -> List[Dict]:
+    """Matching documents from an archive file, newest first (duplicates from a re-run dropped)"""
+    found = {}
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            doc = json.loads(line)
+            if matches(doc, query):
+                found[doc["id"]] = doc
+    return sorted(found.values(), key=lambda d: d["created_at"], reverse=True)
+
+
+def lookback_start(end: Optional[str] = None, now: Optional[datetime] = None) -> str:
+    """Start of the default window: DEFAULT_LOOKBACK_DAYS before end (or now)"""
+    until = datetime.fromisoformat(end) if end else (now or datetime.now(timezone.utc))
+    return (until - timedelta(days=DEFAULT_LOOKBACK_DAYS)).isoformat()
+
+
+def with_date_range(query: Dict, start: Optional[str], end: Optional[str]) -> Dict:
+    query = dict(query)
+    if start or end:
+        created_at = dict(query.get("created_at", {}))
+        if start:
+            created_at["$gte"] = start
+        if end:
+            created_at["$lt"] = end
+        query["created_at"] = created_at
+    return query
+
+
+async def find_transactions(db, query: Dict, start: Optional[str] = None, end: Optional[str] = None,
+                            limit: int = 1000, skip: int = 0) -> List[Dict]:
+    """
+    Transactions matching query, newest first, across the hot collection and
+    the archived months overlapping [start, end). Without a start, the hot
+    collection is read in full but only months from DEFAULT_LOOKBACK_DAYS
+    before end are opened.
+
+    skip/limit page through the combined result; whole partitions are
+    skipped by count, so deep pages do not read the documents they skip.
+    """
+    query = with_date_range(query, start, end)
+    months_from = start or lookback_start(end)
+    partitions = [{"_id": None, "storage": "collection", "collection": HOT_COLLECTION}]
+    partitions += [m for m in await archived_months(db) if in_range(m["_id"], months_from, end)]
+
+    results = []
+    for partition in partitions:
+        wanted = limit - len(results)
+        if wanted <= 0:
+            break
+        if partition["storage"] == "ndjson":
+            docs = await asyncio.to_thread(read_ndjson, partition["path"], query)
+            if skip >= len(docs):
+                skip -= len(docs)
+                continue
+            results += docs[skip:skip + wanted]
+            skip = 0
+            continue
+
+        collection = db[partition["collection"]]
+        if skip:
+            count = await collection.count_documents(query)
+            if skip >= count:
+                skip -= count
+                continue
+        cursor = collection.find(query, {"_id": 0}).sort("created_at", DESCENDING).skip(skip).limit(wanted)
+        results += await cursor.to_list(wanted)
+        skip = 0
+    return results
+
+
+async def find_transaction(db, query: Dict) -> Optional[Dict]:
+    """One transaction (e.g. by id), looking in the archive when it is not hot"""
+    doc = await db[HOT_COLLECTION].find_one(query, {"_id": 0})
+    if doc:
+        return doc
+    for month in await archived_months(db):
+        if month["storage"] == "ndjson":
+            docs = await asyncio.to_thread(read_ndjson, month["path"], query)
+            if docs:
+                return docs[0]
+        else:
+            doc = await db[month["collection"]].find_one(query, {"_id": 0})
+            if doc:
+                return doc
+    return None
+
+
+async def union_pipeline(db, match: Dict, start: Optional[str] = None, end: Optional[str] = None) -> List[Dict]:
+    """
+    Leading stages for an aggregation over hot and archived transactions in
+    [start, end); run the result on the hot collection
+    """
+    match = with_date_range(match, start, end)
+    stages = [{"$match": match}]
+    for month in await archived_months(db):
+        if not in_range(month["_id"], start, end):
+            continue
+        if month["storage"] != "collection":
+            raise ArchiveError(
+                f"Transactions for {month['_id']} are archived to a file; "
+                f"restore them first (python archive_transactions.py restore {month['_id']})"
+            )
+        stages.append({"$unionWith": {"coll": month["collection"], "pipeline": [{"$match": match}]}})
+    return stages
+
+
+# Archiving
+
+async def ensure_archive_indexes(collection):
+    """The hot collection's read paths, on an archive collection"""
+    # Unique, so re-copying a batch after an interrupted run is harmless
+    await collection.create_index("id", unique=True)
+    await collection.create_index([("created_at", DESCENDING)])
+    await collection.create_index([("outlet_id", ASCENDING), ("created_at", DESCENDING)])
+    await collection.create_index([("outlet_id", ASCENDING), ("kasir_id", ASCENDING), ("created_at", DESCENDING)])
+    await collection.create_index([("outlet_id", ASCENDING), ("customer_id", ASCENDING), ("created_at", DESCENDING)])
+    await collection.create_index([("kasir_id", ASCENDING), ("created_at", DESCENDING)])
+    await collection.create_index([("customer_id", ASCENDING), ("created_at", DESCENDING)])
+    await collection.create_index("shift_id")
+    await collection.create_index(
+        [("items.technician_id", ASCENDING), ("outlet_id", ASCENDING), ("created_at", DESCENDING)]
+    )
+
+
+async def insert_ignoring_duplicates(collection, docs: List[Dict]) -> int:
+    """Insert, skipping documents already copied by an interrupted run"""
+    try:
+        result = await collection.insert_many(docs, ordered=False)
+        return len(result.inserted_ids)
+    except BulkWriteError as e:
+        if any(error["code"] != 11000 for error in e.details["writeErrors"]):
+            raise
+        return e.details["nInserted"]
+
+
+def ndjson_ids(path: Path) -> Set[str]:
+    """ids of the documents in an archive file (none if it does not exist yet)"""
+    if not path.exists():
+        return set()
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return {json.loads(line)["id"] for line in f}
+
+
+def append_ndjson(path: Path, docs: List[Dict], known_ids: Optional[Set[str]] = None) -> int:
+    """
+    Append the documents whose id is not in the file yet; returns how many
+    were written. known_ids (the file's ids, read from it when not given) is
+    updated in place.
+
+    The new gzip member is added to a copy that then replaces the file, so a
+    run killed mid-write leaves the previous file intact.
+    """
+    if known_ids is None:
+        known_ids = ndjson_ids(path)
+    new = [doc for doc in docs if doc["id"] not in known_ids]
+    if not new:
+        return 0
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp = path.with_name(path.name + ".tmp")
+    if path.exists():
+        shutil.copyfile(path, temp)
+    else:
+        temp.unlink(missing_ok=True)
+    # Appending adds a gzip member; readers see one continuous stream
+    with gzip.open(temp, "at", encoding="utf-8") as f:
+        for doc in new:
+            doc = {k: v for k, v in doc.items() if k != "_id"}
+            f.write(json.dumps(doc, default=str) + "\n")
+    os.replace(temp, path)
+    known_ids.update(doc["id"] for doc in new)
+    return len(new)
+
+
+async def archive_transactions(db, cutoff: datetime, batch_size: int = 1000,
+                               directory: Optional[Path] = None) -> Dict[str, int]:
+    """
+    Move transactions created before cutoff into their month's archive
+
+    Each batch is copied before it is deleted from the hot collection, so an
+    interrupted run loses nothing and can simply be run again: documents
+    already copied are skipped, and each month's count is taken from what
+    its archive holds rather than added up per batch.
+    Returns month -> documents moved.
+    """
+    storage = "ndjson" if directory else "collection"
+    moved = defaultdict(int)
+    prepared = set()
+    file_ids: Dict[str, Set[str]] = {}
+    query = {"created_at": {"$lt": cutoff.isoformat()}}
+
+    while True:
+        batch = await db[HOT_COLLECTION].find(query).sort("created_at", ASCENDING).limit(batch_size).to_list(batch_size)
+        if not batch:
+            break
+        by_month = defaultdict(list)
+        for doc in batch:
+            by_month[doc["created_at"][:7]].append(doc)
+
+        for month, docs in by_month.items():
+            if month not in prepared:
+                location = {"path": str(directory / f"transactions-{month}.ndjson.gz")} if directory \
+                    else {"collection": archive_collection_name(month)}
+                existing = await db[MONTHS_COLLECTION].find_one({"_id": month})
+                if existing and existing["storage"] != storage:
+                    raise ArchiveError(f"{month} is already archived as {existing['storage']}")
+                await db[MONTHS_COLLECTION].update_one(
+                    {"_id": month}, {"$setOnInsert": {"storage": storage, "count": 0, **location}}, upsert=True
+                )
+                if directory:
+                    file_ids[month] = await asyncio.to_thread(ndjson_ids, Path(location["path"]))
+                else:
+                    await ensure_archive_indexes(db[location["collection"]])
+                prepared.add(month)
+
+            if directory:
+                await asyncio.to_thread(
+                    append_ndjson, directory / f"transactions-{month}.ndjson.gz", docs, file_ids[month]
+                )
+                count = len(file_ids[month])
+            else:
+                collection = db[archive_collection_name(month)]
+                await insert_ignoring_duplicates(collection, docs)
+                count = await collection.count_documents({})
+            await db[MONTHS_COLLECTION].update_one(
+                {"_id": month},
+                {"$set": {"count": count, "archived_at": datetime.now(timezone.utc).isoformat()}}
+            )
+            moved[month] += len(docs)
+
+        await db[HOT_COLLECTION].delete_many({"_id": {"$in": [doc["_id"] for doc in batch]}})
+    return dict(moved)
+
+
+async def restore_month(db, month: str) -> int:
+    """Load an NDJSON month into its archive collection so it can be aggregated"""
+    entry = await db[MONTHS_COLLECTION].find_one({"_id": month})
+    if not entry:
+        raise ArchiveError(f"{month} is not archived")
+    if entry["storage"] == "collection":
+        return 0
+    docs = await asyncio.to_thread(read_ndjson, entry["path"], {})
+    collection = db[archive_collection_name(month)]
+    await ensure_archive_indexes(collection)
+    if docs:
+        await insert_ignoring_duplicates(collection, docs)
+    await db[MONTHS_COLLECTION].update_one(
+        {"_id": month},
+        {"$set": {"storage": "collection", "collection": collection.name, "count": len(docs)}, "$unset": {"path": ""}}
+    )
+    Path(entry["path"]).rename(entry["path"] + ".restored")
+    return len(docs)
@@ -1,3 +1,8 @@
+import os
+
+# Serverless: optional route groups are imported on their first request
+os.environ.setdefault("SERVERLESS", "true")
+
 from server import app
 
 # Vercel needs the app object to be available at module level
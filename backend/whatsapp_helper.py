@@ -8,6 +8,8 @@ from typing import Optional, Dict
 import os
 from dotenv import load_dotenv
 
+from domain import format_receipt
+
 load_dotenv()
 
 WHATSAPP_SERVICE_URL = os.getenv('WHATSAPP_SERVICE_URL', 'http://localhost:3001')
@@ -82,41 +84,7 @@ class WhatsAppService:
         Returns:
             Formatted message string
         """
-        # Header
-        message = "🧼 *OTOPIA CAR WASH*\n"
-        message += "━━━━━━━━━━━━━━━━━━━━\n\n"
-        
-        # Transaction info
-        from datetime import datetime
-        date_str = datetime.now().strftime("%d/%m/%Y %H:%M")
-        message += f"📅 {date_str}\n"
-        message += f"🎫 Invoice: {transaction.get('invoice_number', 'N/A')}\n\n"
-        
-        # Items
-        message += "*LAYANAN:*\n"
-        for item in items:
-            name = item.get('name', 'Unknown')
-            qty = item.get('quantity', 1)
-            price = item.get('price', 0)
-            total = price * qty
-            message += f"• {name} x{qty}\n"
-            message += f"  Rp {total:,.0f}\n"
-        
-        message += "\n━━━━━━━━━━━━━━━━━━━━\n"
-        
-        # Total
-        total_amount = transaction.get('total', 0)
-        payment_method = transaction.get('payment_method', 'cash').upper()
-        message += f"*TOTAL:* Rp {total_amount:,.0f}\n"
-        message += f"💳 Pembayaran: {payment_method}\n\n"
-        
-        # Footer
-        message += "Terima kasih atas kunjungan Anda!\n"
-        message += "Simpan struk ini sebagai bukti.\n\n"
-        message += "📍 Jl. Sukun Raya No.47C, Semarang\n"
-        message += "📞 0822-2702-5335"
-        
-        return message
+        return format_receipt(transaction, items)
     
     def send_receipt(self, phone: str, transaction: dict, items: list) -> Dict:
         """
@@ -32,12 +32,64 @@ export const Dashboard = () => {
   const [recentTransactions, setRecentTransactions] = useState([]);
 
   useEffect(() => {
-    fetchStats();
     fetchShiftStatus();
-    fetchRecentTransactions();
+
+    // Live stats pushed by the server; fall back to one-off fetches if unsupported.
+    // The stream URL carries a short-lived stream token (never the login token),
+    // so every (re)connect asks for a fresh one.
+    let source = null;
+    let retry = null;
+    let closed = false;
+    const BACKEND_URL = process.env.REACT_APP_BACKEND_URL || '';
+
+    const connect = async () => {
+      let streamToken;
+      try {
+        const response = await api.post('/dashboard/stream-token');
+        streamToken = response.data.token;
+      } catch (error) {
+        fetchStats();
+        fetchRecentTransactions();
+        return;
+      }
+      if (closed) return;
+      source = new EventSource(`${BACKEND_URL}/api/dashboard/stream?token=${encodeURIComponent(streamToken)}`);
+      source.addEventListener('snapshot', (event) => {
+        const data = JSON.parse(event.data);
+        setStats(data.stats);
+        setRecentTransactions(data.recent_transactions || []);
+        setLoading(false);
+      });
+      source.addEventListener('delta', (event) => {
+        const data = JSON.parse(event.data);
+        if (data.stats) {
+          setStats((prev) => ({ ...prev, ...data.stats }));
+        }
+        if (data.recent_transactions) {
+          setRecentTransactions(data.recent_transactions);
+        }
+      });
+      source.onerror = () => {
+        // The browser would retry with the same, by then expired, token
+        source.close();
+        if (!closed) retry = setTimeout(connect, 3000);
+      };
+    };
+
+    if (window.EventSource) {
+      connect();
+    } else {
+      fetchStats();
+      fetchRecentTransactions();
+    }
 
     const timer = setInterval(() => setCurrentTime(new Date()), 1000);
-    return () => clearInterval(timer);
+    return () => {
+      closed = true;
+      clearInterval(timer);
+      clearTimeout(retry);
+      if (source) source.close();
+    };
   }, []);
 
   const fetchStats = async () => {
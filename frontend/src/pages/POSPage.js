@@ -334,6 +334,7 @@ export const POSPage = () => {
         })),
         payment_method: total === 0 && isMemberTransaction ? 'subscription' : paymentMethod,
         payment_received: total === 0 ? 0 : received,
+        promo_code: appliedPromo?.code || null,
         notes: notes || null,
       };
 
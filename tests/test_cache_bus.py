@@ -0,0 +1,71 @@
+"""
+Test suite for cross-worker cache invalidation (cache_bus.InvalidationBus)
+
+Needs a local single-node replica set for change streams, e.g.:
+    mongod --replSet rs0 --port 27017 --dbpath /tmp/rs0
+    mongosh --eval "rs.initiate()"
+    MONGO_REPLSET_URL="mongodb://127.0.0.1:27017/?replicaSet=rs0" pytest tests/test_cache_bus.py
+"""
+import asyncio
+import os
+import uuid
+
+import pytest
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from cache_bus import InvalidationBus
+
+MONGO_REPLSET_URL = os.environ.get('MONGO_REPLSET_URL')
+
+pytestmark = pytest.mark.skipif(not MONGO_REPLSET_URL, reason="MONGO_REPLSET_URL not set")
+
+
+async def wait_for(condition, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        if asyncio.get_running_loop().time() > deadline:
+            return False
+        await asyncio.sleep(0.05)
+    return True
+
+
+async def run_two_workers(use_change_streams):
+    """Two buses on one database stand in for two worker processes"""
+    client = AsyncIOMotorClient(MONGO_REPLSET_URL)
+    db = client[f"test_cache_bus_{uuid.uuid4().hex[:8]}"]
+    evicted = {"worker_a": [], "worker_b": []}
+    buses = []
+    try:
+        for name in evicted:
+            bus = InvalidationBus(db, poll_interval=0.1, use_change_streams=use_change_streams)
+            for collection in ["services", "products", "users", "promotions", "landing_config"]:
+                bus.register(collection, lambda name=name, collection=collection: evicted[name].append(collection))
+            await bus.start()
+            buses.append(bus)
+
+        # Worker A writes a service and announces it
+        await db.services.insert_one({"id": str(uuid.uuid4()), "name": "TEST_Service", "is_active": True})
+        await buses[0].publish("services")
+
+        assert "services" in evicted["worker_a"]
+        assert await wait_for(lambda: "services" in evicted["worker_b"]), "worker B was not invalidated"
+        return buses[0].mode
+    finally:
+        for bus in buses:
+            await bus.stop()
+        await client.drop_database(db.name)
+        client.close()
+
+
+class TestInvalidationBus:
+    """Cache eviction across workers"""
+
+    def test_change_stream_invalidation(self):
+        mode = asyncio.run(run_two_workers(use_change_streams=True))
+        assert mode == "change_stream"
+        print("✓ Change stream evicted caches on the other worker")
+
+    def test_version_polling_fallback(self):
+        mode = asyncio.run(run_two_workers(use_change_streams=False))
+        assert mode == "polling"
+        print("✓ Version stamp polling evicted caches on the other worker")
@@ -0,0 +1,43 @@
+"""
+Test suite for the in-process TTL cache (cache_helper.TTLCache)
+"""
+import asyncio
+
+from cache_helper import TTLCache
+
+
+class TestInvalidate:
+    def test_load_started_before_invalidate_is_not_shared(self):
+        async def scenario():
+            cache = TTLCache(ttl=60)
+            data = {"value": "old"}
+            release = asyncio.Event()
+            loads = []
+
+            async def compute():
+                loads.append(data["value"])
+                read = data["value"]
+                if len(loads) == 1:
+                    await release.wait()
+                return read
+
+            early = asyncio.ensure_future(cache.get_or_compute("stats", compute))
+            while not loads:
+                await asyncio.sleep(0)
+
+            # A write lands while the first load is still reading
+            data["value"] = "new"
+            cache.invalidate("stats")
+            late = asyncio.ensure_future(cache.get_or_compute("stats", compute))
+            for _ in range(5):
+                await asyncio.sleep(0)
+            release.set()
+
+            assert await late == "new"
+            assert await early == "old"
+            # The stale load neither replaced the fresh entry nor dropped it from the cache
+            assert await cache.get_or_compute("stats", compute) == "new"
+            assert loads == ["old", "new"]
+
+        asyncio.run(scenario())
+        print("✓ Callers after invalidate() start a fresh load; the stale one is not cached")
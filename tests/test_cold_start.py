@@ -0,0 +1,50 @@
+"""
+Test suite for serverless cold start (vercel_entry.py)
+
+Imports the entry point in a fresh interpreter, the way a cold start does,
+and checks that the import stays within budget and leaves the lazily loaded
+parts (Motor client, WhatsApp helper, optional route groups) untouched.
+COLD_START_BUDGET (seconds) can tighten the budget on a known machine.
+"""
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / 'backend'
+BUDGET = float(os.environ.get('COLD_START_BUDGET', '2.0'))
+
+LAZY_MODULES = ["motor.motor_asyncio", "whatsapp_helper", "requests", "notification_routes", "admin_routes"]
+
+PROBE = f"""
+import json, sys, time
+start = time.perf_counter()
+import vercel_entry
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {LAZY_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def cold_import():
+    env = dict(os.environ, MONGO_URL="mongodb://127.0.0.1:27017", DB_NAME="cold_start_test")
+    env.pop("SERVERLESS", None)
+    result = subprocess.run([sys.executable, "-c", PROBE], cwd=BACKEND_DIR, env=env,
+                            capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+class TestColdStart:
+    """Import cost of the serverless entry point"""
+
+    def test_import_within_budget(self):
+        # Best of three, so one slow run on a busy machine does not fail the suite
+        seconds = min(cold_import()["seconds"] for _ in range(3))
+        assert seconds < BUDGET, f"cold import took {seconds:.2f}s (budget {BUDGET}s)"
+        print(f"✓ Cold import in {seconds:.2f}s (budget {BUDGET}s)")
+
+    def test_lazy_parts_not_imported(self):
+        loaded = cold_import()["loaded"]
+        assert loaded == [], f"imported at cold start: {loaded}"
+        print("✓ Motor, WhatsApp helper and optional routes load on demand")
@@ -0,0 +1,101 @@
+"""
+Test suite for the live dashboard state (dashboard_stream.py)
+"""
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import dashboard_stream
+from dashboard_stream import ALL_OUTLETS, DashboardHub
+
+
+async def loader(outlet_id):
+    return {"stats": {"today_revenue": 0, "today_transactions": 0, "kasir_performance": {}, "low_stock_items": 0},
+            "recent_transactions": []}
+
+
+class TestOutletRefresh:
+    def test_low_stock_refreshed_per_outlet(self, monkeypatch):
+        monkeypatch.setattr(dashboard_stream, "REFRESH_DELAY", 0.01)
+        counts = {"outlet-1": 3, "outlet-2": 5, ALL_OUTLETS: 8}
+
+        async def scenario():
+            hub = DashboardHub()
+            queues = {outlet: (await hub.subscribe(outlet, loader))[0] for outlet in counts}
+            refreshed = []
+
+            async def refresh(outlet_id):
+                refreshed.append(outlet_id)
+                return {"low_stock_items": counts[outlet_id]}
+
+            # Two alerts for outlet-1 within the delay: one refresh of it and of the all-outlets view
+            hub.schedule_outlet_refresh("low_stock", ["outlet-1"], refresh)
+            hub.schedule_outlet_refresh("low_stock", ["outlet-1"], refresh)
+            await asyncio.sleep(0.05)
+
+            assert sorted(refreshed, key=str) == [None, "outlet-1"]
+            stats = {outlet: hub._states[outlet].stats["low_stock_items"] for outlet in counts}
+            assert stats == {"outlet-1": 3, "outlet-2": 0, ALL_OUTLETS: 8}
+            assert queues["outlet-2"].empty()
+
+        asyncio.run(scenario())
+        print("✓ Low-stock count refreshed only for the alerting outlet and the all-outlets view")
+
+
+class TestReload:
+    def test_reload_pushes_only_changed_states(self, monkeypatch):
+        monkeypatch.setattr(dashboard_stream, "REFRESH_DELAY", 0.01)
+
+        async def scenario():
+            hub = DashboardHub()
+            queue, _ = await hub.subscribe("outlet-1", loader)
+
+            # Nothing changed in the database: nothing is pushed
+            hub.schedule_reload(loader)
+            await asyncio.sleep(0.05)
+            assert queue.empty()
+
+            # A sale recorded by another worker
+            async def after_sale(outlet_id):
+                loaded = await loader(outlet_id)
+                loaded["stats"].update(today_revenue=50000, today_transactions=1)
+                return loaded
+
+            hub.schedule_reload(after_sale)
+            await asyncio.sleep(0.05)
+            assert queue.qsize() == 1
+            assert hub._states["outlet-1"].stats["today_revenue"] == 50000
+
+        asyncio.run(scenario())
+        print("✓ Reload picks up other workers' writes")
+
+
+class TestStreamToken:
+    def test_stream_and_login_tokens_are_not_interchangeable(self, monkeypatch):
+        import server
+
+        class Users:
+            async def find_one(self, query, projection=None):
+                return {"id": query["id"], "username": "owner", "full_name": "Owner", "role": "owner"}
+
+        class Database:
+            users = Users()
+
+        monkeypatch.setattr(server, "db", Database())
+        server.user_cache.invalidate()
+
+        async def scenario():
+            stream_token = server.create_stream_token("user-1")
+            login_token = server.create_token("user-1", "owner")
+            assert (await server.authenticate_token(stream_token, server.STREAM_TOKEN_PURPOSE)).id == "user-1"
+            for token, purpose in ((login_token, server.STREAM_TOKEN_PURPOSE), (stream_token, None)):
+                with pytest.raises(HTTPException) as e:
+                    await server.authenticate_token(token, purpose)
+                assert e.value.status_code == 401
+
+        try:
+            asyncio.run(scenario())
+        finally:
+            server.user_cache.invalidate()
+        print("✓ The stream only accepts stream tokens, and the API never does")
@@ -0,0 +1,35 @@
+"""
+Test suite for connection pool settings and stats (db_pool.py)
+"""
+from types import SimpleNamespace
+
+from db_pool import PoolStatsListener, client_options_from_env
+
+
+class TestClientOptions:
+    def test_only_set_variables_are_passed(self):
+        options = client_options_from_env({
+            "MONGO_MAX_POOL_SIZE": "50", "MONGO_MIN_POOL_SIZE": "10",
+            "MONGO_COMPRESSORS": "zstd,zlib", "MONGO_SOCKET_TIMEOUT_MS": ""
+        })
+        assert options == {"maxPoolSize": 50, "minPoolSize": 10, "compressors": "zstd,zlib"}
+        assert client_options_from_env({}) == {}
+        print("✓ Pool options read from env")
+
+
+class TestPoolStatsListener:
+    def test_counts_connections(self):
+        listener = PoolStatsListener()
+        event = SimpleNamespace(reason="timeout")
+        for _ in range(3):
+            listener.connection_created(event)
+        listener.connection_check_out_started(event)
+        listener.connection_checked_out(event)
+        listener.connection_check_out_started(event)
+        listener.connection_check_out_failed(event)
+        listener.connection_closed(event)
+
+        assert listener.snapshot() == {
+            "open": 2, "in_use": 1, "waiting": 0, "checkout_failures": 1, "cleared": 0
+        }
+        print("✓ Pool listener tracks open, in-use and failed check-outs")
@@ -0,0 +1,68 @@
+"""
+Test suite for the pure domain rules (domain.py)
+"""
+from datetime import datetime, timedelta, timezone
+
+import domain
+
+NOW = datetime(2026, 1, 15, 10, 0, tzinfo=timezone.utc)
+
+
+class TestMembership:
+    def test_status_boundaries(self):
+        assert domain.membership_status(NOW - timedelta(seconds=1), NOW) == "expired"
+        assert domain.membership_status(NOW, NOW) == "expiring_soon"
+        assert domain.membership_status(NOW + timedelta(days=7, hours=23), NOW) == "expiring_soon"
+        assert domain.membership_status(NOW + timedelta(days=8), NOW) == "active"
+
+    def test_days_remaining_never_negative(self):
+        assert domain.days_remaining(NOW + timedelta(days=10, hours=2), NOW) == 10
+        assert domain.days_remaining(NOW - timedelta(days=3), NOW) == 0
+
+    def test_refresh_parses_stored_dates(self):
+        membership = domain.refresh_membership({
+            "start_date": (NOW - timedelta(days=20)).isoformat(),
+            "end_date": (NOW + timedelta(days=10)).isoformat(),
+            "created_at": (NOW - timedelta(days=20)).isoformat(),
+            "last_used": None
+        }, NOW)
+        assert membership["end_date"] == NOW + timedelta(days=10)
+        assert membership["last_used"] is None
+        assert membership["status"] == "active"
+
+
+class TestCommission:
+    def test_apply_commissions(self):
+        items = [
+            {"service_id": "a", "price": 100000, "quantity": 2},
+            {"service_id": "b", "price": 50000, "quantity": 1},
+            {"product_id": "p", "price": 20000, "quantity": 1},
+        ]
+        total = domain.apply_commissions(items, {"a": 10.0})
+        assert [item["commission_amount"] for item in items] == [20000.0, 0.0, 0.0]
+        assert total == 20000.0
+
+
+class TestPromotion:
+    def test_percentage_capped_by_max_discount(self):
+        assert domain.promotion_discount(True, 20, 100000) == 20000
+        assert domain.promotion_discount(True, 20, 500000, max_discount=50000) == 50000
+
+    def test_fixed_amount_capped_by_subtotal(self):
+        assert domain.promotion_discount(False, 30000, 100000) == 30000
+        assert domain.promotion_discount(False, 30000, 20000) == 20000
+
+
+class TestReceipt:
+    def test_format_receipt(self):
+        message = domain.format_receipt(
+            {"invoice_number": "INV-20260115-0001", "total": 150000, "payment_method": "qr"},
+            [{"name": "Cuci Eksterior", "quantity": 2, "price": 50000}, {"name": "Semir Ban", "price": 50000}],
+            now=datetime(2026, 1, 15, 17, 30)
+        )
+        assert "📅 15/01/2026 17:30" in message
+        assert "🎫 Invoice: INV-20260115-0001" in message
+        assert "• Cuci Eksterior x2\n  Rp 100,000" in message
+        assert "• Semir Ban x1\n  Rp 50,000" in message
+        assert "*TOTAL:* Rp 150,000" in message
+        assert "💳 Pembayaran: QR" in message
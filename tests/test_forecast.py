@@ -0,0 +1,63 @@
+"""
+Test suite for consumption forecasting and reorder suggestions (forecast.py)
+"""
+import math
+from datetime import datetime, timezone
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from forecast import bom_matrix, daily_usage, day_range, reorder_plan, scatter
+
+DAYS = {day: i for i, day in enumerate(day_range(datetime(2026, 3, 1, tzinfo=timezone.utc), 4))}
+SELLABLES = {"service:wash": 0, "service:wax": 1, "product:towel": 2}
+ITEMS = {"shampoo": 0, "wax": 1, "towel": 2}
+
+
+class TestConsumption:
+    def test_sales_times_bom_plus_adjustments(self):
+        sales = scatter([
+            ("2026-03-01", "service:wash", 10), ("2026-03-01", "service:wash", 2),  # a membership wash row
+            ("2026-03-02", "service:wax", 3), ("2026-03-03", "product:towel", 4),
+            ("2026-03-03", "service:deleted", 99), ("2026-02-28", "service:wash", 99),  # dropped
+        ], DAYS, SELLABLES)
+        bom = bom_matrix(SELLABLES, ITEMS, [
+            ("service:wash", "shampoo", 0.1), ("service:wax", "shampoo", 0.1), ("service:wax", "wax", 0.05),
+            ("product:towel", "towel", 1.0), ("service:wash", "other-outlet-item", 5.0),
+        ])
+        adjustments = scatter([("2026-03-04", "shampoo", 0.5)], DAYS, ITEMS)
+
+        usage = daily_usage(sales, bom, adjustments)
+        expected = [[1.2, 0, 0], [0.3, 0.15, 0], [0, 0, 4], [0.5, 0, 0]]
+        assert np.allclose(usage, expected)
+        print("✓ Daily usage from sales x BOM plus adjustments")
+
+
+class TestReorderPlan:
+    def test_steady_usage(self):
+        usage = np.tile([2.0, 0.0, 1.0], (30, 1))
+        current = np.array([10.0, 5.0, 100.0])
+        plan = reorder_plan(usage, current, lead_time_days=7, cover_days=14)
+
+        assert np.allclose(plan["avg_daily_usage"], [2, 0, 1])
+        assert np.allclose(plan["usage_std"], 0)
+        assert np.allclose(plan["days_of_cover"][[0, 2]], [5, 100])
+        assert math.isinf(plan["days_of_cover"][1])
+        # Shampoo is below its reorder point (14): order up to 14 + 28
+        assert np.allclose(plan["reorder_point"], [14, 0, 7])
+        assert plan["suggested_order"].tolist() == [32, 0, 0]
+        print("✓ Reorder point and order quantity for steady usage")
+
+    def test_variable_usage_adds_safety_stock(self):
+        steady = reorder_plan(np.full((28, 1), 2.0), np.array([0.0]))
+        bursty = reorder_plan(np.tile([[0.0], [4.0]], (14, 1)), np.array([0.0]))
+        assert bursty["reorder_point"][0] > steady["reorder_point"][0]
+        assert bursty["suggested_order"][0] > steady["suggested_order"][0]
+        print("✓ Safety stock grows with usage variability")
+
+    def test_recent_days_weigh_more(self):
+        usage = np.concatenate([np.full((60, 1), 1.0), np.full((30, 1), 3.0)])
+        plan = reorder_plan(usage, np.array([50.0]))
+        assert plan["avg_daily_usage"][0] > usage.mean()
+        print("✓ Recent usage weighted more")
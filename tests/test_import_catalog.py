@@ -0,0 +1,91 @@
+"""
+Test suite for the catalog importer (import_catalog.py)
+
+The re-import tests need a local MongoDB:
+    MONGO_TEST_URL="mongodb://127.0.0.1:27017" pytest tests/test_import_catalog.py
+"""
+import asyncio
+import os
+import uuid
+
+import pytest
+
+import import_catalog
+from import_catalog import CatalogImport, prepare_inventory, prepare_product, prepare_service
+
+MONGO_TEST_URL = os.environ.get('MONGO_TEST_URL')
+
+INDEX = {"CHEM-001": {"id": "item-1", "sku": "CHEM-001", "name": "Shampoo", "unit": "liter"}}
+
+
+class TestPartialRows:
+    def test_missing_columns_are_not_set(self):
+        key, fields, on_insert = prepare_service(
+            {"name": "Cuci Mobil", "price": 50000, "duration_minutes": 30, "category": "exterior"}, INDEX
+        )
+        assert key == "Cuci Mobil"
+        assert "commission_rate" not in fields and "image_url" not in fields and "bom" not in fields
+        # New services still get the model defaults
+        assert on_insert["commission_rate"] == 0.0 and on_insert["bom"] == []
+        print("✓ Service columns left out are not overwritten")
+
+    def test_product_keeps_inventory_link_and_threshold(self):
+        _, fields, on_insert = prepare_product({"name": "Pewangi", "price": 15000, "category": "aksesoris"}, INDEX)
+        assert "inventory_id" not in fields and "min_stock_level" not in fields
+        assert on_insert["min_stock_level"] == 5
+
+        _, fields, _ = prepare_product(
+            {"name": "Pewangi", "price": 15000, "category": "aksesoris", "inventory_sku": "CHEM-001"}, INDEX
+        )
+        assert fields["inventory_id"] == "item-1"
+        print("✓ Product columns left out are not overwritten")
+
+    def test_inventory_stock_only_on_insert(self):
+        _, fields, on_insert = prepare_inventory({
+            "sku": "CHEM-002", "name": "Wax", "category": "chemicals", "unit": "liter", "current_stock": 10,
+            "min_stock": 2, "max_stock": 20, "unit_cost": 75000
+        }, INDEX)
+        assert "current_stock" not in fields and "supplier" not in fields
+        assert on_insert["current_stock"] == 10
+        print("✓ Stock and missing columns only set on new items")
+
+
+SHAMPOO = {"sku": "CHEM-001", "name": "Shampoo", "category": "chemicals", "unit": "liter", "current_stock": 50,
+           "min_stock": 10, "max_stock": 100, "unit_cost": 30000}
+
+
+async def import_inventory(rows):
+    importer = CatalogImport(dry_run=False, batch_size=100, show=0)
+    await importer.import_rows("inventory", [("test.csv", n, dict(row)) for n, row in enumerate(rows, start=2)])
+    return importer
+
+
+@pytest.mark.skipif(not MONGO_TEST_URL, reason="MONGO_TEST_URL not set")
+class TestReimport:
+    def test_reimport_keeps_outlet_assignment(self, monkeypatch):
+        async def scenario():
+            from motor.motor_asyncio import AsyncIOMotorClient
+            client = AsyncIOMotorClient(MONGO_TEST_URL)
+            db = client[f"test_import_catalog_{uuid.uuid4().hex[:8]}"]
+            monkeypatch.setattr(import_catalog, "db", db)
+            try:
+                await db.inventory.insert_one({**SHAMPOO, "id": "item-1", "outlet_id": "outlet-1", "current_stock": 7})
+
+                # No outlet_id column: the outlet's item is updated, not unassigned or duplicated
+                importer = await import_inventory([{**SHAMPOO, "unit_cost": 32000}])
+                assert importer.stats["inventory"]["changed"] == 1
+                items = await db.inventory.find({"sku": "CHEM-001"}).to_list(None)
+                assert len(items) == 1
+                assert (items[0]["outlet_id"], items[0]["unit_cost"], items[0]["current_stock"]) == ("outlet-1", 32000, 7)
+
+                # The same SKU for another outlet is its own item
+                importer = await import_inventory([{**SHAMPOO, "outlet_id": "outlet-2"}])
+                assert importer.stats["inventory"]["new"] == 1
+                outlets = sorted(i["outlet_id"] for i in await db.inventory.find({"sku": "CHEM-001"}).to_list(None))
+                assert outlets == ["outlet-1", "outlet-2"]
+            finally:
+                await client.drop_database(db.name)
+                client.close()
+
+        asyncio.run(scenario())
+        print("✓ Re-import keeps outlet assignments; SKUs are per outlet")
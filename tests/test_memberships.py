@@ -0,0 +1,60 @@
+"""
+Test suite for membership wash usage (server.record_membership_usage)
+
+Needs a local MongoDB:
+    MONGO_TEST_URL="mongodb://127.0.0.1:27017" pytest tests/test_memberships.py
+"""
+import asyncio
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from indexes import ensure_indexes
+
+MONGO_TEST_URL = os.environ.get('MONGO_TEST_URL')
+
+
+@pytest.mark.skipif(not MONGO_TEST_URL, reason="MONGO_TEST_URL not set")
+class TestDailyLimit:
+    def test_concurrent_same_day_scans_count_once(self, monkeypatch):
+        from fastapi import HTTPException
+        from motor.motor_asyncio import AsyncIOMotorClient
+        import server
+
+        async def scenario():
+            client = AsyncIOMotorClient(MONGO_TEST_URL)
+            db = client[f"test_memberships_{uuid.uuid4().hex[:8]}"]
+            monkeypatch.setattr(server, "db", db)
+            try:
+                await ensure_indexes(db)
+                now = datetime.now(timezone.utc)
+                await db.customers.insert_one({"id": "cust-1", "name": "Andi", "phone": "081234567890"})
+                await db.memberships.insert_one({
+                    "id": "member-1", "customer_id": "cust-1", "membership_type": "monthly", "usage_count": 0,
+                    "start_date": (now - timedelta(days=1)).isoformat(), "end_date": (now + timedelta(days=29)).isoformat()
+                })
+                await db.services.insert_one({"id": "wash", "name": "Cuci Mobil", "price": 50000, "bom": []})
+                kasir = server.User(username="kasir", full_name="Kasir", role=server.UserRole.KASIR, outlet_id="outlet-1")
+                scan = server.MembershipUsage(phone="081234567890", service_id="wash")
+
+                # Two scans of the same card at once
+                results = await asyncio.gather(
+                    server.record_membership_usage(scan, kasir), server.record_membership_usage(scan, kasir),
+                    return_exceptions=True
+                )
+                succeeded = [r for r in results if isinstance(r, dict)]
+                refused = [r for r in results if isinstance(r, HTTPException)]
+                assert len(succeeded) == 1 and len(refused) == 1
+                assert refused[0].status_code == 400
+                assert refused[0].detail == "Membership sudah digunakan hari ini. Limit 1x per hari."
+
+                assert (await db.memberships.find_one({"id": "member-1"}))["usage_count"] == 1
+                assert await db.membership_usage.count_documents({"membership_id": "member-1"}) == 1
+            finally:
+                await client.drop_database(db.name)
+                client.close()
+
+        asyncio.run(scenario())
+        print("✓ Second same-day scan refused; usage counted once")
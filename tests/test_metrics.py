@@ -0,0 +1,40 @@
+"""
+Test suite for the HTTP metrics middleware (metrics.py)
+"""
+import asyncio
+
+import metrics
+from metrics import MetricsMiddleware
+
+
+def in_progress():
+    return metrics.http_requests_in_progress._values.get((), 0)
+
+
+def request(middleware, path):
+    """Serve a GET through the middleware; returns the in-flight gauge seen while it was served"""
+    seen = []
+
+    async def send(message):
+        pass
+
+    async def app(scope, receive, send):
+        seen.append(in_progress())
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+
+    middleware.app = app
+    asyncio.run(middleware({"type": "http", "method": "GET", "path": path}, None, send))
+    return seen[0]
+
+
+class TestExcludedPaths:
+    def test_streams_are_not_recorded(self):
+        middleware = MetricsMiddleware(None, exclude_paths=("/api/dashboard/stream",))
+        before = metrics.registry.render()
+
+        assert request(middleware, "/api/dashboard/stream") == in_progress()
+        assert metrics.registry.render() == before
+
+        assert request(middleware, "/api/dashboard/stats") == in_progress() + 1
+        assert metrics.registry.render() != before
+        print("✓ Excluded paths skip the in-flight gauge and latency histogram")
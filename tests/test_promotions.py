@@ -0,0 +1,163 @@
+"""
+Test suite for promotion validation (promotion_engine.py) and redemption
+(server.redeem_promotion / release_promotion)
+
+The redemption tests need a local MongoDB:
+    MONGO_TEST_URL="mongodb://127.0.0.1:27017" pytest tests/test_promotions.py
+"""
+import asyncio
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from cache_bus import InvalidationBus
+from promotion_engine import PromotionEngine, PromotionError
+
+MONGO_TEST_URL = os.environ.get('MONGO_TEST_URL')
+
+NOW = datetime(2026, 1, 15, 10, 0, tzinfo=timezone.utc)
+
+
+def promotion(code="HEMAT10", **extra):
+    return {
+        "id": f"promo-{code}", "code": code, "name": code, "promotion_type": "percentage", "value": 10,
+        "min_purchase": 50000, "start_date": (NOW - timedelta(days=1)).isoformat(),
+        "end_date": (NOW + timedelta(days=1)).isoformat(), "usage_limit": None, "usage_count": 0, "is_active": True,
+        **extra
+    }
+
+
+def rejection(engine, code, subtotal, now=NOW):
+    with pytest.raises(PromotionError) as e:
+        engine.validate(code, subtotal, now)
+    return e.value.status_code, e.value.detail
+
+
+class TestValidate:
+    def test_validity_window_boundaries(self):
+        engine = PromotionEngine()
+        engine.load([promotion()])
+        start, end = NOW - timedelta(days=1), NOW + timedelta(days=1)
+
+        assert engine.validate("HEMAT10", 100000, start)[1] == 10000
+        assert engine.validate("HEMAT10", 100000, end)[1] == 10000
+        assert rejection(engine, "HEMAT10", 100000, start - timedelta(seconds=1)) == (400, "Promotion has not started yet")
+        assert rejection(engine, "HEMAT10", 100000, end + timedelta(seconds=1)) == (400, "Promotion expired")
+        print("✓ Valid from start to end inclusive")
+
+    def test_min_purchase_boundary(self):
+        engine = PromotionEngine()
+        engine.load([promotion()])
+        assert engine.validate("HEMAT10", 50000, NOW)[1] == 5000
+        assert rejection(engine, "HEMAT10", 49999, NOW)[0] == 400
+        print("✓ Minimum purchase is inclusive")
+
+    def test_usage_limit_and_unknown_codes(self):
+        engine = PromotionEngine()
+        engine.load([promotion(usage_limit=2, usage_count=1), promotion("OFF", is_active=False)])
+        assert engine.validate("HEMAT10", 100000, NOW)[0]["code"] == "HEMAT10"
+
+        engine.record_usage("HEMAT10", 2)
+        assert rejection(engine, "HEMAT10", 100000) == (400, "Promotion usage limit reached")
+        # Inactive promotions are not indexed
+        assert rejection(engine, "OFF", 100000) == (404, "Invalid promotion code")
+        assert rejection(engine, "NOPE", 100000) == (404, "Invalid promotion code")
+        print("✓ Usage limit and unknown codes rejected")
+
+
+class TestReload:
+    def test_promotion_writes_invalidate_and_reload(self):
+        engine = PromotionEngine()
+        engine.load([promotion(), promotion("WEEKEND")])
+        bus = InvalidationBus(None)
+        bus.register("promotions", engine.invalidate)
+
+        # Any promotion write is published on the bus (see server)
+        asyncio.run(bus.publish("promotions"))
+        assert not engine.loaded
+
+        # The reload sees the edit and the deletion
+        engine.load([promotion(min_purchase=200000)])
+        assert engine.loaded
+        assert rejection(engine, "HEMAT10", 100000)[0] == 400
+        assert rejection(engine, "WEEKEND", 100000) == (404, "Invalid promotion code")
+        print("✓ Promotion writes reload the index")
+
+
+async def with_server_db(monkeypatch, scenario):
+    from motor.motor_asyncio import AsyncIOMotorClient
+    import server
+    client = AsyncIOMotorClient(MONGO_TEST_URL)
+    db = client[f"test_promotions_{uuid.uuid4().hex[:8]}"]
+    monkeypatch.setattr(server, "db", db)
+    server.promotion_engine.invalidate()
+    try:
+        return await scenario(server, db)
+    finally:
+        server.promotion_engine.invalidate()
+        await client.drop_database(db.name)
+        client.close()
+
+
+@pytest.mark.skipif(not MONGO_TEST_URL, reason="MONGO_TEST_URL not set")
+class TestRedemption:
+    def test_refused_at_limit_inactive_or_deleted(self, monkeypatch):
+        from fastapi import HTTPException
+
+        async def scenario(server, db):
+            promo = promotion(usage_limit=1, usage_count=1)
+            await db.promotions.insert_one(dict(promo))
+
+            async def refusal():
+                with pytest.raises(HTTPException) as e:
+                    await server.redeem_promotion(promo)
+                return e.value.status_code, e.value.detail
+
+            assert await refusal() == (400, "Promotion usage limit reached")
+            await db.promotions.update_one({"id": promo["id"]}, {"$set": {"is_active": False, "usage_count": 0}})
+            assert await refusal() == (400, "Promotion is no longer active")
+            await db.promotions.delete_one({"id": promo["id"]})
+            assert await refusal() == (404, "Invalid promotion code")
+
+        asyncio.run(with_server_db(monkeypatch, scenario))
+        print("✓ Redemption refused at the limit, and for inactive or deleted promotions")
+
+    def test_parallel_redemptions_against_a_limit_of_one(self, monkeypatch):
+        from fastapi import HTTPException
+
+        async def scenario(server, db):
+            promo = promotion(usage_limit=1)
+            await db.promotions.insert_one(dict(promo))
+
+            results = await asyncio.gather(*[server.redeem_promotion(promo) for _ in range(10)], return_exceptions=True)
+            assert sum(1 for r in results if r is None) == 1
+            assert all(isinstance(r, HTTPException) and r.status_code == 400 for r in results if r is not None)
+            assert (await db.promotions.find_one({"id": promo["id"]}))["usage_count"] == 1
+
+        asyncio.run(with_server_db(monkeypatch, scenario))
+        print("✓ Ten parallel redemptions, one use")
+
+    def test_failed_insert_gives_the_use_back(self, monkeypatch):
+        from pymongo.errors import WriteError
+
+        async def scenario(server, db):
+            promo = promotion(usage_limit=5, start_date=(datetime.now(timezone.utc) - timedelta(days=1)).isoformat(),
+                              end_date=(datetime.now(timezone.utc) + timedelta(days=1)).isoformat())
+            await db.promotions.insert_one(dict(promo))
+            kasir = server.User(username="kasir", full_name="Kasir", role=server.UserRole.KASIR, outlet_id="outlet-1")
+            await db.shifts.insert_one({"id": "shift-1", "kasir_id": kasir.id, "outlet_id": "outlet-1", "status": "open"})
+            # Every transaction insert is rejected
+            await db.create_collection("transactions", validator={"$jsonSchema": {"required": ["never_set"]}})
+
+            sale = server.TransactionCreate(
+                items=[{"service_id": "wash", "price": 100000, "quantity": 1}],
+                payment_method="cash", payment_received=100000, promo_code=promo["code"]
+            )
+            with pytest.raises(WriteError):
+                await server.create_transaction(sale, kasir)
+            assert (await db.promotions.find_one({"id": promo["id"]}))["usage_count"] == 0
+
+        asyncio.run(with_server_db(monkeypatch, scenario))
+        print("✓ A failed transaction insert gives the promotion use back")
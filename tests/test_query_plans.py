@@ -0,0 +1,177 @@
+"""
+Test suite for query plans of the hot query shapes in server.py
+
+Each shape is run through explain() on a seeded throwaway database with the
+indexes from indexes.ensure_indexes. A shape must use an index (IXSCAN, no
+COLLSCAN) and examine no more documents than it returns, so a changed filter
+or a dropped index fails here instead of in production.
+
+Needs a local MongoDB:
+    MONGO_TEST_URL="mongodb://127.0.0.1:27017" pytest tests/test_query_plans.py
+"""
+import asyncio
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from indexes import ensure_indexes
+from query_log import plan_stages
+
+MONGO_TEST_URL = os.environ.get('MONGO_TEST_URL')
+
+pytestmark = pytest.mark.skipif(not MONGO_TEST_URL, reason="MONGO_TEST_URL not set")
+
+NOW = datetime.now(timezone.utc)
+TODAY_START = NOW.replace(hour=0, minute=0, second=0, microsecond=0)
+
+KASIRS = [f"kasir-{k}" for k in range(5)]
+OUTLETS = ["outlet-0", "outlet-1"]
+DAYS = 30
+TX_PER_SHIFT = 20
+CUSTOMERS = 500
+
+
+def seed_documents():
+    """Deterministic history: one shift per kasir per day, the last one still open"""
+    shifts, transactions, expenses = [], [], []
+    for day in range(DAYS):
+        day_start = TODAY_START - timedelta(days=DAYS - 1 - day)
+        for k, kasir in enumerate(KASIRS):
+            shift_id = f"shift-{kasir}-{day}"
+            outlet_id = OUTLETS[k % len(OUTLETS)]
+            shifts.append({
+                "id": shift_id, "kasir_id": kasir, "kasir_name": kasir, "outlet_id": outlet_id,
+                "status": "open" if day == DAYS - 1 else "closed",
+                "opened_at": day_start.isoformat()
+            })
+            for t in range(TX_PER_SHIFT):
+                transactions.append({
+                    "id": str(uuid.uuid4()), "shift_id": shift_id, "kasir_id": kasir, "outlet_id": outlet_id,
+                    "customer_id": f"customer-{(day * TX_PER_SHIFT + t) % CUSTOMERS}",
+                    "total": 50000, "payment_method": "cash",
+                    # Every fourth wash has a technician on commission
+                    "items": [{"service_id": "service-1", "price": 50000, "quantity": 1,
+                               "technician_id": f"teknisi-{t % 3}" if t % 4 == 0 else None,
+                               "commission_amount": 5000 if t % 4 == 0 else 0}],
+                    "created_at": (day_start + timedelta(minutes=t)).isoformat()
+                })
+        for outlet_id in OUTLETS:
+            expenses.append({
+                "id": str(uuid.uuid4()), "outlet_id": outlet_id, "category": "Operasional",
+                "amount": 100000, "date": (day_start + timedelta(hours=12)).isoformat()
+            })
+
+    customers = [{"id": f"customer-{c}", "name": f"Customer {c}", "phone": f"0812{c:08d}"} for c in range(CUSTOMERS)]
+    memberships = [{
+        "id": f"membership-{c}", "customer_id": f"customer-{c}", "membership_type": "monthly",
+        "end_date": (NOW + timedelta(days=c % 60 - 30)).isoformat()
+    } for c in range(CUSTOMERS)]
+    usage = [{
+        "id": str(uuid.uuid4()), "membership_id": f"membership-{c}",
+        "used_at": (TODAY_START - timedelta(days=d)).isoformat(),
+        "usage_day": (TODAY_START - timedelta(days=d)).strftime("%Y-%m-%d")
+    } for c in range(CUSTOMERS) for d in range(5)]
+    promotions = [{"id": f"promo-{p}", "code": f"PROMO{p}", "is_active": p % 2 == 0} for p in range(50)]
+    inventory = [{
+        "id": f"item-{i}", "outlet_id": OUTLETS[i % len(OUTLETS)], "sku": f"SKU-{i}", "name": f"Item {i}",
+        "current_stock": 5 if i % 10 == 0 else 100, "min_stock": 10, "is_low_stock": i % 10 == 0
+    } for i in range(200)]
+
+    return {
+        "shifts": shifts, "transactions": transactions, "customers": customers,
+        "memberships": memberships, "membership_usage": usage, "promotions": promotions,
+        "expenses": expenses, "inventory": inventory
+    }
+
+
+# (name, collection, filter, sort, limit) - keep in step with the queries in server.py
+QUERY_SHAPES = [
+    ("open shift by kasir", "shifts", {"kasir_id": "kasir-1", "status": "open"}, None, 1),
+    ("transactions by shift", "transactions", {"shift_id": f"shift-kasir-2-{DAYS - 2}"}, None, 0),
+    ("today's transactions", "transactions", {"created_at": {"$gte": TODAY_START.isoformat()}}, {"created_at": -1}, 0),
+    ("kasir's today's transactions", "transactions",
+     {"created_at": {"$gte": TODAY_START.isoformat()}, "kasir_id": "kasir-3"}, None, 0),
+    ("kasir's transactions", "transactions", {"kasir_id": "kasir-3"}, {"created_at": -1}, 0),
+    ("customer transactions", "transactions", {"customer_id": "customer-7"}, {"created_at": -1}, 0),
+    ("customer by phone", "customers", {"phone": "081200000042"}, None, 1),
+    ("memberships by customer", "memberships", {"customer_id": "customer-42"}, None, 0),
+    ("usage by membership/day", "membership_usage",
+     {"membership_id": "membership-42", "usage_day": TODAY_START.strftime("%Y-%m-%d")}, None, 1),
+    ("usage history", "membership_usage", {"membership_id": "membership-42"}, {"used_at": -1}, 0),
+    ("promo by code", "promotions", {"code": "PROMO4", "is_active": True}, None, 1),
+    # Outlet-scoped lists and reports
+    ("outlet's shifts", "shifts", {"outlet_id": "outlet-1"}, {"opened_at": -1}, 0),
+    ("outlet's today's transactions", "transactions",
+     {"created_at": {"$gte": TODAY_START.isoformat()}, "outlet_id": "outlet-1"}, {"created_at": -1}, 0),
+    ("outlet kasir's transactions", "transactions",
+     {"kasir_id": "kasir-3", "outlet_id": "outlet-1"}, {"created_at": -1}, 0),
+    ("outlet customer transactions", "transactions",
+     {"customer_id": "customer-7", "outlet_id": "outlet-1"}, {"created_at": -1}, 0),
+    ("outlet's expenses", "expenses", {"outlet_id": "outlet-0"}, {"date": -1}, 0),
+    ("outlet's inventory", "inventory", {"outlet_id": "outlet-0"}, None, 0),
+    ("outlet's low stock", "inventory", {"is_low_stock": True, "outlet_id": "outlet-0"}, None, 0),
+    ("low stock", "inventory", {"is_low_stock": True}, None, 0),
+    # Reports
+    ("technician's commissions", "transactions",
+     {"items.technician_id": "teknisi-1", "created_at": {"$gte": TODAY_START.isoformat()}}, None, 0),
+    ("commissions", "transactions",
+     {"items.technician_id": {"$type": "string"}, "created_at": {"$gte": TODAY_START.isoformat()}}, None, 0),
+    ("outlet's commissions", "transactions",
+     {"items.technician_id": {"$type": "string"}, "outlet_id": "outlet-1",
+      "created_at": {"$gte": TODAY_START.isoformat()}}, None, 0),
+]
+
+
+@pytest.fixture(scope="module")
+def seeded_db():
+    db_name = f"test_query_plans_{uuid.uuid4().hex[:8]}"
+
+    async def seed():
+        client = AsyncIOMotorClient(MONGO_TEST_URL)
+        db = client[db_name]
+        await ensure_indexes(db)
+        for collection, docs in seed_documents().items():
+            await db[collection].insert_many(docs)
+        client.close()
+
+    async def drop():
+        client = AsyncIOMotorClient(MONGO_TEST_URL)
+        await client.drop_database(db_name)
+        client.close()
+
+    asyncio.run(seed())
+    yield db_name
+    asyncio.run(drop())
+
+
+async def explain(db_name, collection, query, sort, limit):
+    client = AsyncIOMotorClient(MONGO_TEST_URL)
+    try:
+        command = {"find": collection, "filter": query}
+        if sort:
+            command["sort"] = sort
+        if limit:
+            command["limit"] = limit
+        return await client[db_name].command({"explain": command, "verbosity": "executionStats"})
+    finally:
+        client.close()
+
+
+class TestQueryPlans:
+    """Hot query shapes must be served by an index"""
+
+    @pytest.mark.parametrize("name,collection,query,sort,limit", QUERY_SHAPES, ids=[s[0] for s in QUERY_SHAPES])
+    def test_uses_index(self, seeded_db, name, collection, query, sort, limit):
+        result = asyncio.run(explain(seeded_db, collection, query, sort, limit))
+        stages = plan_stages(result)
+        stats = result["executionStats"]
+
+        assert "COLLSCAN" not in stages, f"{name}: collection scan ({stages})"
+        assert "IXSCAN" in stages, f"{name}: no index scan ({stages})"
+        assert stats["nReturned"] > 0, f"{name}: seed data does not cover this shape"
+        assert stats["totalDocsExamined"] <= stats["nReturned"], \
+            f"{name}: examined {stats['totalDocsExamined']} docs for {stats['nReturned']} results"
+        print(f"✓ {name}: {stats['nReturned']} docs via {' <- '.join(stages)}")
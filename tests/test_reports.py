@@ -0,0 +1,131 @@
+"""
+Test suite for the report pipelines (reports.py)
+
+The aggregation tests need a local MongoDB (5.0+ for weekly periods):
+    MONGO_TEST_URL="mongodb://127.0.0.1:27017" pytest tests/test_reports.py
+"""
+import asyncio
+import os
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+
+import reports
+from reports import commission_report, next_period, period_expr, period_key, period_start, profit_and_loss
+
+MONGO_TEST_URL = os.environ.get('MONGO_TEST_URL')
+
+
+def transaction(created_at, outlet_id, *items):
+    return {"id": str(uuid.uuid4()), "outlet_id": outlet_id, "created_at": created_at, "items": [
+        {"service_id": "wash", "price": price, "quantity": 1, "technician_id": technician, "commission_amount": commission}
+        for technician, price, commission in items
+    ]}
+
+
+class TestPeriods:
+    def test_day_and_month_cut_from_iso_string(self):
+        assert period_expr("created_at", "month") == {"$substrCP": ["$created_at", 0, 7]}
+        assert period_expr("date", "day") == {"$substrCP": ["$date", 0, 10]}
+        assert "$dateTrunc" in str(period_expr("created_at", "week"))
+        print("✓ Period keys")
+
+    def test_period_bounds(self):
+        # A Thursday
+        moment = datetime(2026, 12, 17, 15, 30, tzinfo=timezone.utc)
+        assert period_start(moment, "week") == datetime(2026, 12, 14, tzinfo=timezone.utc)
+        assert next_period(period_start(moment, "month"), "month") == datetime(2027, 1, 1, tzinfo=timezone.utc)
+        assert period_key(period_start(moment, "month"), "month") == "2026-12"
+        assert period_key(period_start(moment, "day"), "day") == "2026-12-17"
+        print("✓ Period bounds")
+
+
+async def with_db(scenario):
+    from motor.motor_asyncio import AsyncIOMotorClient
+    client = AsyncIOMotorClient(MONGO_TEST_URL)
+    db = client[f"test_reports_{uuid.uuid4().hex[:8]}"]
+    try:
+        return await scenario(db)
+    finally:
+        await client.drop_database(db.name)
+        client.close()
+
+
+@pytest.mark.skipif(not MONGO_TEST_URL, reason="MONGO_TEST_URL not set")
+class TestCommissionReport:
+    def test_earned_per_technician_and_month_less_payouts(self):
+        async def scenario(db):
+            await db.users.insert_many([{"id": "tech-1", "full_name": "Budi"}, {"id": "tech-2", "full_name": "Sari"}])
+            await db.transactions.insert_many([
+                transaction("2026-03-02T09:00:00+00:00", "outlet-1", ("tech-1", 100000, 10000), ("tech-2", 50000, 5000)),
+                transaction("2026-03-20T09:00:00+00:00", "outlet-1", ("tech-1", 100000, 10000), (None, 20000, 0)),
+                transaction("2026-04-01T09:00:00+00:00", "outlet-2", ("tech-2", 50000, 5000)),
+                transaction("2026-04-02T09:00:00+00:00", "outlet-1", (None, 20000, 0)),
+            ])
+            await db.payouts.insert_many([
+                {"id": "p1", "user_id": "tech-1", "amount": 15000, "date": "2026-03-31T17:00:00+00:00"},
+                {"id": "p2", "user_id": "tech-2", "amount": 5000, "date": "2026-04-30T17:00:00+00:00"},
+            ])
+
+            report = await commission_report(db, "2026-03-01T00:00:00+00:00", "2026-05-01T00:00:00+00:00")
+            by_id = {t["technician_id"]: t for t in report["technicians"]}
+            assert by_id["tech-1"]["technician_name"] == "Budi"
+            assert (by_id["tech-1"]["earned"], by_id["tech-1"]["paid"], by_id["tech-1"]["balance"]) == (20000, 15000, 5000)
+            assert [(p["period"], p["earned"], p["paid"]) for p in by_id["tech-2"]["periods"]] == [
+                ("2026-03", 5000, 0), ("2026-04", 5000, 5000)
+            ]
+            assert report["totals"] == {"earned": 30000, "paid": 20000, "balance": 10000}
+
+            outlet = await commission_report(
+                db, "2026-03-01T00:00:00+00:00", "2026-05-01T00:00:00+00:00", "day", {"outlet_id": "outlet-2"}
+            )
+            assert [t["technician_id"] for t in outlet["technicians"]] == ["tech-2"]
+            assert outlet["technicians"][0]["periods"][0]["period"] == "2026-04-01"
+
+        asyncio.run(with_db(scenario))
+        print("✓ Commission per technician and period less payouts")
+
+
+@pytest.mark.skipif(not MONGO_TEST_URL, reason="MONGO_TEST_URL not set")
+class TestProfitAndLoss:
+    def test_revenue_cogs_expenses_and_payouts_per_month(self):
+        async def scenario(db):
+            reports.closed_periods_cache.invalidate()
+            await db.transactions.insert_many([
+                {"id": "t1", "outlet_id": "outlet-1", "total": 100000, "discount_amount": 0, "cogs": 20000,
+                 "created_at": "2026-03-02T09:00:00+00:00"},
+                {"id": "t2", "outlet_id": "outlet-2", "total": 50000, "discount_amount": 5000, "cogs": 10000,
+                 "created_at": "2026-04-02T09:00:00+00:00"},
+            ])
+            await db.membership_usage.insert_one(
+                {"id": "u1", "outlet_id": "outlet-1", "cogs": 3000, "used_at": "2026-03-05T09:00:00+00:00"}
+            )
+            await db.expenses.insert_many([
+                {"id": "e1", "outlet_id": "outlet-1", "category": "Listrik", "amount": 30000, "date": "2026-03-10T00:00:00+00:00"},
+                # Recorded for a payout; counted once, under payouts
+                {"id": "e2", "outlet_id": "outlet-1", "category": "Gaji & Komisi", "amount": 15000, "payout_id": "p1",
+                 "date": "2026-03-31T00:00:00+00:00"},
+            ])
+            await db.payouts.insert_one(
+                {"id": "p1", "outlet_id": "outlet-1", "user_id": "tech-1", "amount": 15000, "date": "2026-03-31T00:00:00+00:00"}
+            )
+
+            now = datetime(2026, 4, 15, tzinfo=timezone.utc)
+            report = await profit_and_loss(
+                db, datetime(2026, 3, 1, tzinfo=timezone.utc), datetime(2026, 5, 1, tzinfo=timezone.utc), now=now
+            )
+            march, april = report["periods"]
+            assert march["closed"] and not april["closed"]
+            assert (march["revenue"], march["cogs"], march["expenses"], march["payouts"]) == (100000, 23000, 30000, 15000)
+            assert march["net_profit"] == 32000 and march["expense_categories"] == {"Listrik": 30000}
+            assert report["totals"]["net_profit"] == 32000 + 40000
+
+            outlet = await profit_and_loss(
+                db, datetime(2026, 3, 1, tzinfo=timezone.utc), datetime(2026, 5, 1, tzinfo=timezone.utc),
+                scope={"outlet_id": "outlet-2"}, now=now
+            )
+            assert outlet["totals"]["revenue"] == 50000 and outlet["totals"]["payouts"] == 0
+
+        asyncio.run(with_db(scenario))
+        print("✓ Profit and loss per month")
@@ -0,0 +1,99 @@
+"""
+Test suite for the low-stock flag and threshold alerts (stock_alerts.py)
+
+The flag maintenance tests need a local MongoDB:
+    MONGO_TEST_URL="mongodb://127.0.0.1:27017" pytest tests/test_stock_alerts.py
+"""
+import asyncio
+import os
+import uuid
+
+import pytest
+
+from stock_alerts import ALERTS_COLLECTION, LOW, RESTOCKED, StockAlerts, crossing, literal_set
+from stock_ledger import ADJUSTMENT, SALE, movement, record_movements
+
+MONGO_TEST_URL = os.environ.get('MONGO_TEST_URL')
+
+
+def item(current_stock, min_stock=10.0, **extra):
+    return {"id": "shampoo", "name": "Shampoo", "current_stock": current_stock, "min_stock": min_stock, **extra}
+
+
+class TestCrossing:
+    def test_only_threshold_crossings_are_events(self):
+        assert crossing(item(12.0), item(11.0)) is None
+        assert crossing(item(12.0), item(10.0))["direction"] == LOW
+        assert crossing(item(4.0), item(2.0)) is None
+        assert crossing(item(4.0), item(15.0))["direction"] == RESTOCKED
+        print("✓ Events only when the threshold is crossed")
+
+    def test_stored_flag_wins_over_recomputing(self):
+        # A stale flag (written before min_stock changed) is what the crossing is measured from
+        assert crossing(item(12.0, is_low_stock=True), item(12.0))["direction"] == RESTOCKED
+        assert crossing(item(12.0, 20.0, is_low_stock=False), item(12.0, 20.0))["direction"] == LOW
+        print("✓ Crossings measured from the stored flag")
+
+
+class TestLiteralSet:
+    def test_values_are_not_expressions(self):
+        assert literal_set({"name": "$5 wax", "supplier": {"$toUpper": "x"}}) == {"$set": {
+            "name": {"$literal": "$5 wax"}, "supplier": {"$literal": {"$toUpper": "x"}}
+        }}
+        print("✓ Pipeline $set stores values literally")
+
+
+async def with_db(scenario):
+    from motor.motor_asyncio import AsyncIOMotorClient
+    client = AsyncIOMotorClient(MONGO_TEST_URL)
+    db = client[f"test_stock_alerts_{uuid.uuid4().hex[:8]}"]
+    try:
+        return await scenario(db)
+    finally:
+        await client.drop_database(db.name)
+        client.close()
+
+
+@pytest.mark.skipif(not MONGO_TEST_URL, reason="MONGO_TEST_URL not set")
+class TestLowStockFlag:
+    def test_flag_follows_stock_and_threshold(self):
+        async def scenario(db):
+            alerts = StockAlerts()
+            await db.inventory.insert_one(item(12.0, is_low_stock=False))
+
+            # Two sales in one transaction: a single write, a single crossing
+            events = await record_movements(db, [movement("shampoo", -1.0, SALE), movement("shampoo", -1.0, SALE)])
+            stored = await db.inventory.find_one({"id": "shampoo"})
+            assert stored["current_stock"] == 10.0 and stored["is_low_stock"] is True
+            assert [e["direction"] for e in events] == [LOW]
+
+            events = await record_movements(db, [movement("shampoo", 5.0, ADJUSTMENT)])
+            assert [e["direction"] for e in events] == [RESTOCKED]
+
+            # Raising min_stock re-evaluates the flag in the same write
+            event = await alerts.update_item(db, "shampoo", {"min_stock": 20.0})
+            assert event["direction"] == LOW
+            assert await db.inventory.count_documents({"is_low_stock": True}) == 1
+            assert await db[ALERTS_COLLECTION].count_documents({}) == 3
+
+            # Items from before the flag are backfilled without alerting
+            await db.inventory.insert_one({"id": "wax", "current_stock": 1.0, "min_stock": 5.0})
+            assert await alerts.refresh_flags(db, publish=False) == 1
+            assert await db.inventory.count_documents({"is_low_stock": True}) == 2
+            assert await db[ALERTS_COLLECTION].count_documents({}) == 3
+
+        asyncio.run(with_db(scenario))
+        print("✓ is_low_stock maintained by stock and threshold writes")
+
+    def test_update_stores_dollar_values_unchanged(self):
+        async def scenario(db):
+            await db.inventory.insert_one(item(12.0, is_low_stock=False, supplier="Toko Kimia"))
+            fields = {"name": "$5 wax", "supplier": "$name", "unit": "liter", "min_stock": 15.0}
+            event = await StockAlerts().update_item(db, "shampoo", fields)
+
+            stored = await db.inventory.find_one({"id": "shampoo"}, {"_id": 0})
+            assert {k: stored[k] for k in fields} == fields
+            assert stored["is_low_stock"] is True and event["direction"] == LOW
+
+        asyncio.run(with_db(scenario))
+        print("✓ Item fields starting with $ round-trip unchanged")
@@ -0,0 +1,98 @@
+"""
+Test suite for the stock ledger (stock_ledger.py)
+
+The snapshot and history tests need a local MongoDB:
+    MONGO_TEST_URL="mongodb://127.0.0.1:27017" pytest tests/test_stock_ledger.py
+"""
+import asyncio
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import stock_ledger
+from stock_ledger import MEMBERSHIP_USAGE, SALE, ADJUSTMENT, movement, week_start
+
+MONGO_TEST_URL = os.environ.get('MONGO_TEST_URL')
+
+# A Thursday
+START = datetime(2026, 3, 5, tzinfo=timezone.utc)
+
+
+class TestWeeks:
+    def test_week_starts_on_monday(self):
+        assert week_start(START) == "2026-03-02"
+        assert week_start(START + timedelta(days=4)) == "2026-03-09"
+        print("✓ Weeks start on Monday")
+
+
+async def with_db(scenario):
+    from motor.motor_asyncio import AsyncIOMotorClient
+    client = AsyncIOMotorClient(MONGO_TEST_URL)
+    db = client[f"test_stock_ledger_{uuid.uuid4().hex[:8]}"]
+    try:
+        return await scenario(db)
+    finally:
+        await client.drop_database(db.name)
+        client.close()
+
+
+@pytest.mark.skipif(not MONGO_TEST_URL, reason="MONGO_TEST_URL not set")
+class TestLedger:
+    def test_stock_on_and_weekly_consumption(self):
+        async def scenario(db):
+            await db.inventory.insert_one({"id": "shampoo", "current_stock": 100.0})
+            await stock_ledger.opening_snapshot(db, START)
+
+            # Ten days: 2 liters sold and 1 used by a member every day at noon
+            for day in range(10):
+                noon = START + timedelta(days=day, hours=12)
+                await stock_ledger.record_movements(db, [
+                    movement("shampoo", -2.0, SALE, now=noon),
+                    movement("shampoo", -1.0, MEMBERSHIP_USAGE, now=noon + timedelta(minutes=5)),
+                ])
+            # A delivery, which is not consumption
+            await stock_ledger.record_movements(db, [movement("shampoo", 50.0, ADJUSTMENT, now=START + timedelta(days=3, hours=9))])
+
+            taken = await stock_ledger.catch_up_snapshots(db, START + timedelta(days=10, hours=1))
+            assert taken == 10
+            assert (await db.inventory.find_one({"id": "shampoo"}))["current_stock"] == 120.0
+
+            at = (START + timedelta(days=3, hours=10)).isoformat()
+            history = await stock_ledger.stock_on(db, at)
+            assert history["snapshot_at"] == (START + timedelta(days=3)).isoformat()
+            assert history["levels"]["shampoo"] == 100 - 3 * 3 + 50
+
+            # Live tail after the last snapshot is included
+            await stock_ledger.record_movements(db, [movement("shampoo", -4.0, SALE, now=START + timedelta(days=10, hours=2))])
+            weeks = await stock_ledger.weekly_consumption(
+                db, START.isoformat(), (START + timedelta(days=10, hours=3)).isoformat()
+            )
+            # Thu-Sun (4 days) in the first week, Mon-Sat (6 days + the tail) in the next
+            assert weeks == {"2026-03-02": {"shampoo": 12.0}, "2026-03-09": {"shampoo": 22.0}}
+
+        asyncio.run(with_db(scenario))
+        print("✓ Stock on date and weekly consumption from snapshots plus ledger")
+
+
+@pytest.mark.skipif(not MONGO_TEST_URL, reason="MONGO_TEST_URL not set")
+class TestMovementOutlet:
+    def test_owner_adjustment_is_booked_to_the_items_outlet(self, monkeypatch):
+        import server
+        from server import StockAdjustmentRequest, User, UserRole
+
+        async def scenario(db):
+            monkeypatch.setattr(server, "db", db)
+            await db.inventory.insert_one(
+                {"id": "shampoo", "name": "Shampoo", "outlet_id": "outlet-1", "current_stock": 20.0, "min_stock": 5.0}
+            )
+            # Owners have no outlet of their own
+            owner = User(username="owner", full_name="Owner", role=UserRole.OWNER)
+            await server.adjust_stock("shampoo", StockAdjustmentRequest(amount=5, type="add", reason="Delivery"), owner)
+
+            moved = await db[stock_ledger.MOVEMENTS_COLLECTION].find_one({"inventory_id": "shampoo"})
+            assert moved["outlet_id"] == "outlet-1" and moved["change"] == 5
+
+        asyncio.run(with_db(scenario))
+        print("✓ Owner adjustments are booked to the item's outlet")
@@ -0,0 +1,65 @@
+"""
+Test suite for the transaction archive helpers (transaction_archive.py)
+"""
+import gzip
+from datetime import datetime, timezone
+
+import pytest
+
+from transaction_archive import (
+    ArchiveError, append_ndjson, archive_collection_name, in_range, lookback_start, matches, month_bounds, ndjson_ids,
+    read_ndjson
+)
+
+
+def transaction(n, created_at, outlet_id="outlet-1"):
+    return {"id": f"tx-{n}", "outlet_id": outlet_id, "kasir_id": "kasir-1", "total": 50000, "created_at": created_at}
+
+
+class TestMonths:
+    def test_names_and_bounds(self):
+        assert archive_collection_name("2024-01") == "transactions_archive_2024_01"
+        assert month_bounds("2024-12") == ("2024-12-01T00:00:00+00:00", "2025-01-01T00:00:00+00:00")
+        print("✓ Month names and bounds")
+
+    def test_range_overlap(self):
+        assert in_range("2024-03", None, None)
+        assert in_range("2024-03", "2024-03-31T23:00:00+00:00", None)
+        assert not in_range("2024-03", "2024-04-01T00:00:00+00:00", None)
+        assert not in_range("2024-03", None, "2024-03-01T00:00:00+00:00")
+        assert in_range("2024-03", "2024-01-01", "2024-06-01")
+        print("✓ Months selected by date range")
+
+    def test_open_ended_reads_look_back_a_year(self):
+        assert lookback_start("2025-03-01T00:00:00+00:00") == "2024-03-01T00:00:00+00:00"
+        assert lookback_start(now=datetime(2025, 6, 1, tzinfo=timezone.utc)) == "2024-06-01T00:00:00+00:00"
+        # Older archived months are not opened
+        assert not in_range("2024-02", lookback_start("2025-03-01T00:00:00+00:00"), None)
+        print("✓ Default window for open-ended reads")
+
+
+class TestNdjson:
+    def test_matches_api_filters(self):
+        doc = transaction(1, "2024-03-10T08:00:00+00:00")
+        assert matches(doc, {"outlet_id": "outlet-1", "created_at": {"$gte": "2024-03-01", "$lt": "2024-04-01"}})
+        assert not matches(doc, {"outlet_id": "outlet-2"})
+        assert matches(doc, {"kasir_id": {"$in": ["kasir-1", "kasir-2"]}})
+        with pytest.raises(ArchiveError):
+            matches(doc, {"total": {"$mod": [2, 0]}})
+        print("✓ NDJSON filter matching")
+
+    def test_round_trip_newest_first_without_duplicates(self, tmp_path):
+        path = tmp_path / "transactions-2024-03.ndjson.gz"
+        batch = [transaction(n, f"2024-03-{n:02d}T08:00:00+00:00", f"outlet-{n % 2}") for n in range(1, 11)]
+        assert append_ndjson(path, batch[:6]) == 6
+        # An interrupted run re-appends part of a batch: only the new ones are written
+        assert append_ndjson(path, batch[4:]) == 4
+        assert len(ndjson_ids(path)) == 10
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            assert sum(1 for _ in f) == 10
+        assert not (tmp_path / "transactions-2024-03.ndjson.gz.tmp").exists()
+
+        docs = read_ndjson(str(path), {"outlet_id": "outlet-0"})
+        assert [d["id"] for d in docs] == ["tx-10", "tx-8", "tx-6", "tx-4", "tx-2"]
+        assert len(read_ndjson(str(path), {})) == 10
+        print("✓ NDJSON archive round trip")